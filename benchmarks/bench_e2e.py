@@ -0,0 +1,167 @@
+"""
+Offline end-to-end benchmark: scripted multi-turn sessions through Core with a
+replay llm and a stub manim, for history sizes from 1 to 500 messages.
+
+Reports per-stage latency percentiles and turns per second. Save a run with
+--output and check a later commit against it with --compare.
+
+usage:
+    python benchmarks/bench_e2e.py --output base.json
+    python benchmarks/bench_e2e.py --compare base.json --tolerance 0.2
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from rich.console import Console
+
+from ez_manim.core import Core
+from ez_manim.core.mwrapper import MWrapper
+from ez_manim.llm import ReplayLLM
+from ez_manim.utils import tracer
+
+
+FAKE_MANIM = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_manim.py")
+STAGES = ["turn", "core.ask_llm", "llm.windowed_history", "tokens.count", "llm.generate", "render"]
+
+CODE = """Manim code:
+```python
+from manim import *
+
+class Trial(Scene):
+    def construct(self):
+        shape = {shape}(color={color})
+        self.play(Create(shape), run_time=1)
+        self.wait()
+```"""
+TRANSCRIPTS = [
+    {"prompt": f"draw a {color.lower()} {shape.lower()}", "response": CODE.format(shape=shape, color=color)}
+    for shape in ("Square", "Circle", "Triangle")
+    for color in ("BLUE", "RED", "GREEN")
+]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(int(round(q * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def run_size(size: int, turns: int, llm_latency: float, stream: bool):
+    llm = ReplayLLM(TRANSCRIPTS, system_prompt="replay", latency=llm_latency)
+    for i in range(size):
+        transcript = TRANSCRIPTS[i // 2 % len(TRANSCRIPTS)]
+        if i % 2 == 0:
+            llm.add_to_history("user", transcript["prompt"])
+        else:
+            llm.add_to_history("assistant", transcript["response"])
+
+    mwrapper = MWrapper(
+        quality="l", preview=False, manim_command=[sys.executable, FAKE_MANIM]
+    )
+    core = Core(
+        console=Console(file=io.StringIO()), llm=llm, mwrapper=mwrapper, stream=stream
+    )
+
+    tracer.clear()
+    start = time.perf_counter()
+    for turn in range(turns):
+        _, err = core.run_turn(TRANSCRIPTS[turn % len(TRANSCRIPTS)]["prompt"])
+        if err:
+            raise RuntimeError(f"turn {turn} failed to render")
+    elapsed = time.perf_counter() - start
+
+    stages = {}
+    for name in STAGES:
+        # total per turn, a stage can run several times in one turn
+        per_turn = {}
+        for span in tracer.spans:
+            if span.name == name:
+                per_turn[span.turn] = per_turn.get(span.turn, 0.0) + span.seconds
+        values = list(per_turn.values())
+        stages[name] = {
+            "p50": percentile(values, 0.5),
+            "p90": percentile(values, 0.9),
+            "p99": percentile(values, 0.99),
+            "mean": statistics.mean(values) if values else 0.0,
+        }
+
+    return {"turns_per_second": turns / elapsed, "stages": stages}
+
+
+def compare(results, baseline, tolerance: float) -> bool:
+    """
+    Prints the stages whose p50 regressed by more than `tolerance`, returns True if any did
+    """
+    regressed = False
+    for size, result in results.items():
+        old = baseline.get(size)
+        if old is None:
+            continue
+        for name, stats in result["stages"].items():
+            before = old["stages"].get(name, {}).get("p50", 0.0)
+            if before and stats["p50"] > before * (1 + tolerance):
+                regressed = True
+                print(
+                    f"REGRESSION size={size} {name}: "
+                    f"p50 {before * 1e3:.2f}ms -> {stats['p50'] * 1e3:.2f}ms"
+                )
+        if result["turns_per_second"] < old["turns_per_second"] / (1 + tolerance):
+            regressed = True
+            print(
+                f"REGRESSION size={size} turns/s: "
+                f"{old['turns_per_second']:.1f} -> {result['turns_per_second']:.1f}"
+            )
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1,10,50,100,250,500")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--render-seconds", type=float, default=0.0)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    os.environ["FAKE_MANIM_SECONDS"] = str(args.render_seconds)
+    tracer.enabled = True
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        for size in (int(size) for size in args.sizes.split(",")):
+            results[str(size)] = run_size(size, args.turns, args.llm_latency, args.stream)
+
+    header = f"{'history':>8} {'turns/s':>9} " + " ".join(f"{name + ' p50/p90 (ms)':>34}" for name in STAGES)
+    print(header)
+    for size, result in results.items():
+        cells = " ".join(
+            f"{result['stages'][name]['p50'] * 1e3:>16.2f}/{result['stages'][name]['p90'] * 1e3:<17.2f}"
+            for name in STAGES
+        )
+        print(f"{size:>8} {result['turns_per_second']:>9.1f} {cells}")
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=2)
+
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Per-turn cost of BaseLLM.get_windowed_history as the chat history grows.
+
+The cached history should stay flat, re-encoding every message grows with the history.
+Also compares counting a whole history one message at a time, batched and approximated.
+
+usage: python benchmarks/bench_history.py [--turns 400] [--step 50]
+"""
+import argparse
+import time
+
+from ez_manim.llm import BaseLLM, ChatHistory
+from ez_manim.utils import num_tokens_from_messages
+
+
+CODE_TURN = "Manim code:\n```python\nfrom manim import *\n\nclass Trial(Scene):\n" + (
+    "    def construct(self):\n"
+    + "        square = Square(side_length=2, color=BLUE)\n" * 20
+    + "        self.play(Create(square), run_time=2)\n"
+) + "```"
+USER_TURN = "make the square blue, then rotate it by 45 degrees and fade it out"
+
+
+def naive_windowed_history(llm: BaseLLM, num_tokens: int = 1500):
+    """
+    the old behaviour: re-encode every message on every turn
+    """
+    selected, total = [], 0
+    for message in reversed(list(llm.chat_history)):
+        if message["role"] == "system":
+            continue
+        length = num_tokens_from_messages([message])
+        if total + length <= num_tokens:
+            selected.append(dict(message))
+            total += length
+    return selected
+
+
+def time_call(func, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=400)
+    parser.add_argument("--step", type=int, default=50)
+    args = parser.parse_args()
+
+    llm = BaseLLM(system_prompt="You are an expert at writing manim code in Python.")
+
+    print(f"{'messages':>10} {'cached (ms)':>14} {'naive (ms)':>14}")
+    for turn in range(1, args.turns + 1):
+        llm.add_to_history("user", f"{USER_TURN} ({turn})")
+        llm.add_to_history("assistant", CODE_TURN)
+
+        if turn % args.step == 0:
+            cached = time_call(llm.get_windowed_history)
+            naive = time_call(lambda: naive_windowed_history(llm), repeat=1)
+            print(f"{len(llm.chat_history):>10} {cached * 1e3:>14.3f} {naive * 1e3:>14.3f}")
+
+    # counting a whole history at once, e.g. when resuming a session
+    messages = list(llm.chat_history)[1:]
+    one_by_one = time_call(lambda: [num_tokens_from_messages([m]) for m in messages], repeat=1)
+    batch = time_call(lambda: ChatHistory().extend(messages), repeat=1)
+    approx = time_call(lambda: ChatHistory(approximate=True).extend(messages), repeat=1)
+    print(
+        f"\ncounting {len(messages)} messages: one by one {one_by_one * 1e3:.1f}ms, "
+        f"batch {batch * 1e3:.1f}ms, approximate {approx * 1e3:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Cold start cost of `from ez_manim import Core`, measured with `python -X importtime`.
+
+Exits with 1 when the import takes longer than --max-ms over a bare interpreter,
+so a heavy import sneaking back to module level fails the check.
+
+usage: python benchmarks/bench_import.py [--max-ms 150] [--runs 5]
+"""
+import argparse
+import subprocess
+import sys
+
+
+STATEMENT = "from ez_manim import Core"
+
+
+def import_times(statement: str):
+    """
+    Cumulative microseconds of every top level import
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True, text=True, check=True
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # nested imports are indented further
+        if not name.startswith("  "):
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-ms", type=float, default=150.0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    best, best_times = float("inf"), {}
+    for _ in range(args.runs):
+        baseline = import_times("pass")
+        times = import_times(STATEMENT)
+        added = {name: us for name, us in times.items() if name not in baseline}
+        total = sum(added.values()) / 1e3
+        if total < best:
+            best, best_times = total, added
+
+    print(f"{STATEMENT}: {best:.1f}ms over a bare interpreter (best of {args.runs})")
+    for name, us in sorted(best_times.items(), key=lambda item: -item[1])[:10]:
+        print(f"  {us / 1e3:>8.1f}ms  {name}")
+
+    if best > args.max_ms:
+        print(f"FAIL: cold start is over {args.max_ms:.0f}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
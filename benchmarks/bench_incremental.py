@@ -0,0 +1,79 @@
+"""
+Iterative refinement: a scene with --animations animations where every turn
+changes the color of one of them. With reused segments only that animation is
+rendered again, without them the whole scene is.
+
+Uses the stub manim by default, --real renders with manim.
+
+usage: python benchmarks/bench_incremental.py [--turns 6] [--animations 8] [--real]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from ez_manim.core.mwrapper import MWrapper
+
+
+FAKE_MANIM = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_manim.py")
+COLORS = ["BLUE", "RED", "GREEN", "YELLOW", "PURPLE", "ORANGE"]
+
+
+def scene(animations: int, changed: int, color: str) -> str:
+    lines = ["from manim import *", "", "class Refine(Scene):", "    def construct(self):"]
+    for i in range(animations):
+        lines.append(f"        shape{i} = Square(side_length=0.5, color={color if i == changed else 'WHITE'})")
+        lines.append(f"        shape{i}.shift(RIGHT * {i % 4 - 1.5} + UP * {i // 4 - 1})")
+        lines.append(f"        self.play(Create(shape{i}), run_time=0.5)")
+    return "\n".join(lines) + "\n"
+
+
+def bench(reuse: bool, turns: int, animations: int, manim_command):
+    mwrapper = MWrapper(
+        code_file_name="refine", quality="l", preview=False,
+        manim_command=manim_command, reuse_segments=reuse
+    )
+
+    timings, reused = [], []
+    try:
+        for turn in range(turns):
+            code = scene(animations, turn % animations, COLORS[turn % len(COLORS)])
+            start = time.perf_counter()
+            response, err = mwrapper.render_from_string(code)
+            if err:
+                raise RuntimeError(response)
+            timings.append(time.perf_counter() - start)
+            reused.append(len(mwrapper.last_segments.reused) if mwrapper.last_segments else 0)
+    finally:
+        mwrapper.close()
+
+    return timings, reused
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--animations", type=int, default=8)
+    parser.add_argument("--animation-seconds", type=float, default=0.1, help="stub manim only")
+    parser.add_argument("--real", action="store_true", help="render with manim")
+    args = parser.parse_args()
+
+    manim_command = None if args.real else [sys.executable, FAKE_MANIM]
+    os.environ.setdefault("FAKE_MANIM_ANIMATION_SECONDS", str(args.animation_seconds))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        for reuse in (False, True):
+            timings, reused = bench(reuse, args.turns, args.animations, manim_command)
+            later = timings[1:] or timings
+            print(
+                f"reuse_segments={reuse!s:<5}  first turn {timings[0] * 1000:8.1f} ms  "
+                f"later turns median {statistics.median(later) * 1000:8.1f} ms  "
+                f"reused per turn {reused}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+OpenAIManim against the local mock server with injected errors and stalls:
+success rate and latency percentiles with no retries, with retries, and with
+retries plus hedging.
+
+usage:
+    python benchmarks/bench_llm.py --requests 50 --error-rate 0.2 --slow-rate 0.1
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_openai_server import serve
+
+from ez_manim.llm import OpenAIManim
+
+
+MESSAGES = [{"role": "user", "content": "draw a blue square"}]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(int(round(q * (len(values) - 1))), len(values) - 1)]
+
+
+def run(llm: OpenAIManim, requests: int, stream: bool):
+    latencies, failures = [], 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        try:
+            if stream:
+                "".join(llm.stream(MESSAGES))
+            else:
+                llm.generate(MESSAGES)
+        except Exception:
+            failures += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    return latencies, failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--slow-rate", type=float, default=0.1)
+    parser.add_argument("--slow-latency", type=float, default=3.0)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--hedge-after", type=float, default=0.25)
+    parser.add_argument("--stream", action="store_true")
+    args = parser.parse_args()
+
+    server = serve(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency,
+    )
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+
+    configs = {
+        "no retries": dict(max_retries=0),
+        "retries": dict(max_retries=3),
+        "retries + hedging": dict(max_retries=3, hedge_after=args.hedge_after),
+    }
+
+    print(f"{'client':<20}{'ok':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'requests':>10}")
+    for name, config in configs.items():
+        llm = OpenAIManim(
+            openai_api_key="mock", base_url=base_url, timeout=args.timeout, **config
+        )
+        llm.retry_policy.base_delay = 0.05
+
+        before = server.RequestHandlerClass.options.requests
+        latencies, failures = run(llm, args.requests, args.stream)
+        sent = server.RequestHandlerClass.options.requests - before
+
+        print(
+            f"{name:<20}{args.requests - failures:>6}"
+            f"{percentile(latencies, 0.5) * 1000:>10.1f}"
+            f"{percentile(latencies, 0.95) * 1000:>10.1f}"
+            f"{percentile(latencies, 0.99) * 1000:>10.1f}"
+            f"{sent:>10}"
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
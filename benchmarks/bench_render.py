@@ -0,0 +1,68 @@
+"""
+Per-render latency of the manim cli subprocess against a warm render worker.
+
+Needs manim installed. Renders a small scene `--runs` times with each backend.
+
+usage: python benchmarks/bench_render.py [--runs 5] [--quality l]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from ez_manim.core.mwrapper import MWrapper
+
+
+SCENE = """\
+from manim import *
+
+class BenchScene(Scene):
+    def construct(self):
+        square = Square(side_length=2, color=BLUE)
+        self.play(Create(square), run_time=0.5)
+"""
+
+
+def bench(backend: str, runs: int, quality: str):
+    mwrapper = MWrapper(
+        code_file_name="benchScene", quality=quality, preview=False, backend=backend
+    )
+
+    # the worker pays its startup once, outside of the timed renders
+    if mwrapper.workers is not None:
+        mwrapper.workers.start()
+
+    timings = []
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            response, err = mwrapper.render_from_string(SCENE)
+            timings.append(time.perf_counter() - start)
+            if err:
+                raise RuntimeError(response)
+    finally:
+        mwrapper.close()
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--quality", default="l")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        print(f"{'backend':>12} {'mean (s)':>10} {'median (s)':>12} {'min (s)':>10}")
+        for backend in ("subprocess", "worker"):
+            timings = bench(backend, args.runs, args.quality)
+            print(
+                f"{backend:>12} {statistics.mean(timings):>10.3f} "
+                f"{statistics.median(timings):>12.3f} {min(timings):>10.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
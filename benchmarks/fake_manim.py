@@ -0,0 +1,104 @@
+"""
+Stand-in for the manim cli: writes an empty video where manim would.
+
+FAKE_MANIM_SECONDS: seconds to "render" (default 0.05)
+FAKE_MANIM_ANIMATION_SECONDS: extra seconds for every animation not in the
+    partial movie cache (default 0), shown with a progress bar on stderr
+FAKE_MANIM_FAIL: set to 1 to fail with a traceback
+
+Every `self.play(` line is an animation, hashed with the lines since the
+previous one; with a --config_file setting partial_movie_dir, animations whose
+hash is already there are reused and logged like manim does.
+"""
+import os
+import hashlib
+import sys
+import time
+
+
+QUALITY_DIRS = {"l": "480p15", "m": "720p30", "h": "1080p60", "p": "1440p60", "k": "2160p60"}
+
+
+def main(argv):
+    flags, positional, options = [], [], {}
+
+    args = iter(argv)
+    for arg in args:
+        if arg.startswith("--"):
+            options[arg[2:]] = next(args)
+        elif arg.startswith("-"):
+            flags.append(arg)
+        else:
+            positional.append(arg)
+
+    fpath, scene = positional[0], positional[1]
+    quality = "h"
+    for flag in flags:
+        if "q" in flag:
+            quality = flag[flag.index("q") + 1]
+
+    print("Manim Community v0.0.0 (fake)")
+    time.sleep(float(os.environ.get("FAKE_MANIM_SECONDS", "0.05")))
+
+    if os.environ.get("FAKE_MANIM_FAIL") == "1":
+        sys.stderr.write(
+            "Traceback (most recent call last):\n"
+            f'  File "{fpath}", line 1, in construct\n'
+            "NameError: name 'Sqaure' is not defined\n"
+        )
+        return 1
+
+    media_dir = options.get("media_dir", "media")
+    module_name = os.path.splitext(os.path.basename(fpath))[0]
+    output = os.path.join(media_dir, "videos", module_name, QUALITY_DIRS[quality], f"{scene}.mp4")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "wb"):
+        pass
+
+    render_animations(fpath, scene, options.get("config_file"))
+
+    print(f"File ready at {output}")
+    return 0
+
+
+def render_animations(fpath, scene, config_file):
+    partial_dir = None
+    if config_file is not None:
+        with open(config_file) as fp:
+            for line in fp:
+                key, _, value = line.partition("=")
+                if key.strip() == "partial_movie_dir":
+                    partial_dir = value.strip().replace("{scene_name}", scene)
+
+    seconds = float(os.environ.get("FAKE_MANIM_ANIMATION_SECONDS", "0"))
+    setup = []
+    num = 0
+    with open(fpath) as fp:
+        for line in fp:
+            setup.append(line.strip())
+            if "self.play(" not in line:
+                continue
+
+            digest = hashlib.sha256("\n".join(setup).encode()).hexdigest()[:16]
+            setup = []
+            partial = os.path.join(partial_dir, f"{digest}.mp4") if partial_dir else None
+
+            if partial is not None and os.path.exists(partial):
+                print(f"Animation {num} : Using cached data (hash : {digest})", flush=True)
+            else:
+                # a progress bar like manim's, redrawn with carriage returns
+                for percent in (0, 25, 50, 75, 100):
+                    sys.stderr.write(f"\rAnimation {num}: Play(Mobject): {percent:3d}%|{'#' * (percent // 10):<10}|")
+                    sys.stderr.flush()
+                    time.sleep(seconds / 4 if percent < 100 else 0)
+                sys.stderr.write("\n")
+                if partial is not None:
+                    os.makedirs(partial_dir, exist_ok=True)
+                    with open(partial, "wb"):
+                        pass
+                print(f"Animation {num} : Partial movie file written in '{partial}'", flush=True)
+            num += 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,204 @@
+"""
+Local stand-in for the chat completions endpoint, with injectable latency,
+stalls and errors. Answers both plain and streamed (SSE) requests.
+
+usage:
+    python benchmarks/mock_openai_server.py --port 8765 --error-rate 0.2 --slow-rate 0.1
+    OpenAIManim(openai_api_key="mock", base_url="http://127.0.0.1:8765/v1")
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+RESPONSE = """Manim code:
+```python
+from manim import *
+
+class Trial(Scene):
+    def construct(self):
+        self.play(Create(Square(color=BLUE)))
+```"""
+
+
+class MockOptions:
+    def __init__(
+            self,
+            latency: float = 0.05,
+            chunk_delay: float = 0.005,
+            chunk_size: int = 8,
+            slow_rate: float = 0.0,
+            slow_latency: float = 5.0,
+            error_rate: float = 0.0,
+            error_status: int = 503,
+            retry_after: float = 0.0,
+            slow_first: int = 0,
+            error_first: int = 0,
+            response: str = RESPONSE
+        ) -> None:
+        # seconds before the response, or before the first streamed chunk
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.chunk_size = chunk_size
+
+        # a fraction of the requests stall for `slow_latency` instead
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+
+        # a fraction of the requests fail with `error_status`
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+
+        # the first requests always stall or fail, for deterministic tests
+        self.slow_first = slow_first
+        self.error_first = error_first
+
+        self.response = response
+
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    options: MockOptions = MockOptions()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        options = self.options
+        with options.lock:
+            options.requests += 1
+            number = options.requests
+
+        if not self.path.endswith("/chat/completions"):
+            return self._json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+        if number <= options.error_first or random.random() < options.error_rate:
+            headers = {"Retry-After": f"{options.retry_after:g}"} if options.error_status == 429 else {}
+            return self._json(options.error_status, {"error": {"message": "injected error"}}, headers)
+
+        slow = number <= options.slow_first or random.random() < options.slow_rate
+        time.sleep(options.slow_latency if slow else options.latency)
+
+        model = body.get("model", "mock")
+        usage = {
+            "prompt_tokens": sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4,
+            "completion_tokens": len(options.response) // 4,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if not body.get("stream"):
+            return self._json(200, {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": options.response},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(choices, usage=None):
+            data = {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": choices,
+            }
+            if usage is not None:
+                data["usage"] = usage
+            self._send_chunk(f"data: {json.dumps(data)}\n\n")
+
+        try:
+            text = options.response
+            for i in range(0, len(text), options.chunk_size):
+                delta = {"content": text[i:i + options.chunk_size]}
+                if i == 0:
+                    delta["role"] = "assistant"
+                chunk([{"index": 0, "delta": delta, "finish_reason": None}])
+                time.sleep(options.chunk_delay)
+            chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if body.get("stream_options", {}).get("include_usage"):
+                chunk([], usage)
+            self._send_chunk("data: [DONE]\n\n")
+            self._send_chunk("")
+        except (BrokenPipeError, ConnectionResetError):
+            # the client cancelled, e.g. a hedged request that lost
+            self.close_connection = True
+
+    def _send_chunk(self, data: str):
+        raw = data.encode()
+        self.wfile.write(f"{len(raw):x}\r\n".encode() + raw + b"\r\n")
+        self.wfile.flush()
+
+    def _json(self, status, data, headers=None):
+        raw = json.dumps(data).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(raw)
+        except (BrokenPipeError, ConnectionResetError):
+            # the client gave up, e.g. it timed out on a stalled request
+            self.close_connection = True
+
+
+def serve(port: int = 0, **options) -> ThreadingHTTPServer:
+    """
+    Starts the server in a daemon thread, `server.server_port` is the bound port
+    """
+    handler = type("Handler", (MockHandler,), {"options": MockOptions(**options)})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--chunk-delay", type=float, default=0.005)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-latency", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+
+    server = serve(
+        args.port,
+        latency=args.latency,
+        chunk_delay=args.chunk_delay,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+    )
+    print(f"mock chat completions on http://127.0.0.1:{server.server_port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
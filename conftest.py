@@ -0,0 +1 @@
+# lets `pytest` import ez_manim from the checkout
@@ -7,11 +7,16 @@ from .utils.imports import LazyModule
 _import_structure = {
     "llm": {
         "base" : ["BaseLLM"],
-        "openai": ["OpenAIManim"]
+        "history": ["ChatHistory"],
+        "openai": ["OpenAIManim"],
+        "replay": ["ReplayLLM"]
     },
     "core": {
         "base": ["Core"],        
+        "cache": ["RenderCache"],
     },
+    "batch": ["BatchRunner", "run_batch"],
+    "server": ["ManimServer"],
     "utils": {
         "imports" : ["check_import", "build_all_paths", "build_top_paths", "get_all_attribues"],
     },
@@ -23,8 +28,10 @@ if TYPE_CHECKING:
     # Core
     # from .base import Formatter, Core, MetaLLM
 
-    from .core import Core
-    from .llm import BaseLLM, OpenAIManim
+    from .core import Core, RenderCache
+    from .llm import BaseLLM, ChatHistory, OpenAIManim, ReplayLLM
+    from .batch import BatchRunner, run_batch
+    from .server import ManimServer
 
 else:
     
@@ -0,0 +1,256 @@
+import sys
+import time
+import argparse
+
+from .core import Core
+from .core.watchdog import RenderLimits, RenderScheduler
+from .llm import OpenAIManim
+from .llm.response_cache import DEFAULT_CACHE_PATH, ResponseCache
+from .llm.session_log import DEFAULT_SESSIONS_DIR, SessionLog, list_sessions, prune_sessions
+from .utils import tracer
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--llm-cache", nargs="?", const=DEFAULT_CACHE_PATH, metavar="PATH",
+        help="reuse the responses of identical requests, stored in PATH"
+    )
+    parser.add_argument(
+        "--llm-cache-sampled", action="store_true",
+        help="use the response cache even when the temperature is above zero"
+    )
+
+
+def add_limit_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = RenderLimits()
+    parser.add_argument(
+        "--render-timeout", type=float, default=defaults.wall_seconds, metavar="SECONDS",
+        help="kill a render running longer than this, 0 for no limit"
+    )
+    parser.add_argument(
+        "--render-cpu", type=int, default=defaults.cpu_seconds, metavar="SECONDS",
+        help="cpu time limit of a render, 0 for no limit"
+    )
+    parser.add_argument(
+        "--render-memory", type=int, default=defaults.memory_bytes // 1024 ** 2, metavar="MIB",
+        help="address space limit of a render, 0 for no limit"
+    )
+
+
+def render_limits(args: argparse.Namespace) -> RenderLimits:
+    return RenderLimits(
+        wall_seconds=args.render_timeout or None,
+        cpu_seconds=args.render_cpu or None,
+        memory_bytes=args.render_memory * 1024 ** 2 or None,
+    )
+
+
+def report_cache(cache: ResponseCache) -> None:
+    stats = cache.stats()
+    print(
+        f"llm cache: {stats['hits']} hits, {stats['misses']} misses, "
+        f"{stats['bypassed']} bypassed, hit rate {stats['hit_rate']:.0%}, "
+        f"saved {stats['saved_seconds']:.1f}s"
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="ez_manim", description="LLM-powered manim animations"
+    )
+    parser.add_argument("-q", "--quality", default="h", choices=["l", "m", "h", "p", "k"])
+    parser.add_argument("--stream", action="store_true", help="show the code while it is generated")
+    parser.add_argument("--backend", default="subprocess", choices=["subprocess", "worker"])
+    parser.add_argument("--progressive", action="store_true", help="low quality preview first")
+    parser.add_argument("--auto-repair", action="store_true", help="send render errors back to the llm")
+    parser.add_argument("--compact", action="store_true", help="send only the latest code in full")
+    parser.add_argument("--edit", action="store_true", help="ask for edits instead of whole programs")
+    parser.add_argument("--candidates", type=int, default=1, help="keep the first of N responses that renders")
+    parser.add_argument("--background", action="store_true", help="run prompts and renders as jobs")
+    parser.add_argument("--base-url", help="openai compatible endpoint, e.g. a local mock server")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds per llm request")
+    parser.add_argument("--retries", type=int, default=3, help="retries on 429, 5xx and timeouts")
+    parser.add_argument("--hedge-after", type=float, help="send a second request after this many seconds without an answer")
+    parser.add_argument("--max-renders", type=int, help="manim processes at once, the cpu count by default")
+    add_limit_arguments(parser)
+    add_cache_arguments(parser)
+    parser.add_argument("--save-session", action="store_true", help="log the conversation so it can be resumed")
+    parser.add_argument("--resume", metavar="ID", help="continue a saved session, \"last\" for the latest one")
+    parser.add_argument("--sessions-dir", default=DEFAULT_SESSIONS_DIR)
+    parser.add_argument("--profile", action="store_true", help="print a timing breakdown of every turn")
+    parser.add_argument("--trace-file", help="append the timing spans to this JSONL file on exit")
+    parser.add_argument("--metrics-file", help="write a prometheus text snapshot on exit")
+    return parser
+
+
+def build_serve_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="ez_manim serve", description="HTTP/JSON server with one Core per session"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workdir", help="parent of the session directories")
+    parser.add_argument("-q", "--quality", default="l", choices=["l", "m", "h", "p", "k"])
+    parser.add_argument("--llm-workers", type=int, default=8, help="llm calls at once, all sessions")
+    parser.add_argument("--render-workers", type=int, help="renders at once, all sessions")
+    parser.add_argument("--max-sessions", type=int, default=1000)
+    parser.add_argument("--max-pending", type=int, default=4, help="queued prompts per session")
+    parser.add_argument(
+        "--session-timeout", type=float, default=3600.0, help="seconds before an idle session is deleted"
+    )
+    add_limit_arguments(parser)
+    return parser
+
+
+def serve_main(argv):
+    from .server import serve
+
+    args = build_serve_parser().parse_args(argv)
+    print(f"serving on http://{args.host}:{args.port}")
+    serve(
+        args.host,
+        args.port,
+        workdir=args.workdir,
+        quality=args.quality,
+        llm_workers=args.llm_workers,
+        render_workers=args.render_workers,
+        max_sessions=args.max_sessions,
+        max_pending=args.max_pending,
+        session_timeout=args.session_timeout,
+        render_limits=render_limits(args),
+    )
+
+
+def build_batch_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="ez_manim batch",
+        description="render a JSONL file of prompts, one {\"prompt\": ..., \"id\": ...} per line"
+    )
+    parser.add_argument("input", help="JSONL file of prompts")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file the results are appended to")
+    parser.add_argument("--workdir", help="where the code and videos of the items go")
+    parser.add_argument("-q", "--quality", default="l", choices=["l", "m", "h", "p", "k"])
+    parser.add_argument("--api-concurrency", type=int, default=8, help="llm calls at once")
+    parser.add_argument("--render-concurrency", type=int, help="renders at once, the cpu count by default")
+    parser.add_argument("--auto-repair", action="store_true", help="send render errors back to the llm")
+    add_limit_arguments(parser)
+    add_cache_arguments(parser)
+    parser.add_argument("--no-resume", action="store_true", help="start over instead of skipping finished items")
+    return parser
+
+
+def batch_main(argv):
+    from .batch import run_batch
+
+    args = build_batch_parser().parse_args(argv)
+    cache = ResponseCache(args.llm_cache) if args.llm_cache else None
+    counts = run_batch(
+        args.input,
+        args.output,
+        resume=not args.no_resume,
+        workdir=args.workdir,
+        quality=args.quality,
+        api_concurrency=args.api_concurrency,
+        render_concurrency=args.render_concurrency,
+        auto_repair=args.auto_repair,
+        render_limits=render_limits(args),
+        response_cache=cache,
+        cache_sampled=args.llm_cache_sampled,
+    )
+    if cache is not None:
+        report_cache(cache)
+    print(", ".join(f"{status}: {count}" for status, count in sorted(counts.items())) or "nothing to do")
+
+
+def build_sessions_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="ez_manim sessions", description="saved sessions")
+    parser.add_argument("action", nargs="?", default="list", choices=["list", "prune"])
+    parser.add_argument("--sessions-dir", default=DEFAULT_SESSIONS_DIR)
+    parser.add_argument("--older-than", type=float, metavar="DAYS", help="prune sessions unused for DAYS days")
+    parser.add_argument("--keep", type=int, help="prune all but the KEEP most recent sessions")
+    return parser
+
+
+def sessions_main(argv):
+    args = build_sessions_parser().parse_args(argv)
+
+    if args.action == "prune":
+        if args.older_than is None and args.keep is None:
+            sys.exit("ez_manim sessions prune: give --older-than and/or --keep")
+        max_age = args.older_than * 24 * 3600 if args.older_than is not None else None
+        removed = prune_sessions(args.sessions_dir, max_age=max_age, keep=args.keep)
+        print(f"removed {len(removed)} sessions, {sum(session.size for session in removed)} bytes")
+        return
+
+    for session in list_sessions(args.sessions_dir):
+        prompt = (session.first_prompt or "").replace("\n", " ")
+        print(
+            f"{session.session_id}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(session.modified))}  "
+            f"{session.size:>9} B  {prompt[:50]}"
+        )
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "serve":
+        return serve_main(argv[1:])
+    if argv and argv[0] == "batch":
+        return batch_main(argv[1:])
+    if argv and argv[0] == "sessions":
+        return sessions_main(argv[1:])
+
+    args = build_parser().parse_args(argv)
+
+    if args.trace_file or args.metrics_file:
+        tracer.enabled = True
+
+    llm = OpenAIManim(
+        base_url=args.base_url,
+        timeout=args.timeout,
+        max_retries=args.retries,
+        hedge_after=args.hedge_after,
+    )
+
+    cache = ResponseCache(args.llm_cache) if args.llm_cache else None
+
+    session_log = None
+    if args.resume:
+        try:
+            session_log = SessionLog.open(args.resume, args.sessions_dir)
+        except FileNotFoundError as e:
+            sys.exit(f"ez_manim: {e}")
+    elif args.save_session:
+        session_log = SessionLog.create(args.sessions_dir)
+
+    core = Core(
+        llm=llm,
+        response_cache=cache,
+        cache_sampled=args.llm_cache_sampled,
+        session_log=session_log,
+        render_scheduler=RenderScheduler(args.max_renders, render_limits(args)),
+        quality=args.quality,
+        stream=args.stream,
+        render_backend=args.backend,
+        progressive=args.progressive,
+        auto_repair=args.auto_repair,
+        background=args.background,
+        compact_history=args.compact,
+        edit_mode=args.edit,
+        candidates=args.candidates,
+        profile=args.profile,
+    )
+
+    try:
+        core.run()
+    finally:
+        if cache is not None:
+            report_cache(cache)
+        if args.trace_file:
+            tracer.export_jsonl(args.trace_file)
+        if args.metrics_file:
+            with open(args.metrics_file, "w") as fp:
+                fp.write(tracer.prometheus())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+from typing import *
+
+from .core import Core
+from .core.jobs import JobQueue
+from .core.mwrapper import CANCELLED, MWrapper
+from .core.watchdog import LIMIT_EXCEEDED, RenderLimits, RenderScheduler
+from .llm import BaseLLM, OpenAIManim
+from .llm.response_cache import ResponseCache
+from .utils import lazy_import
+
+rich_console = lazy_import("rich.console")
+
+
+# statuses of items that are not run again when resuming
+FINISHED = ("done", "failed", "invalid")
+
+
+def read_prompts(path: str) -> List[Dict[str, Any]]:
+    """
+    Items of a JSONL file with one {"prompt": ..., "id": ...} per line,
+    the id defaults to the line number
+    """
+    items = []
+    with open(path) as fp:
+        for num, line in enumerate(fp, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"prompt": item}
+            item["id"] = str(item.get("id", num))
+            items.append(item)
+    return items
+
+
+def read_finished(path: str) -> Set[str]:
+    """
+    Ids already finished in an output file, a line cut short by a crash is ignored
+    """
+    finished = set()
+    try:
+        with open(path) as fp:
+            for line in fp:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    continue
+                if result.get("status") in FINISHED:
+                    finished.add(str(result["id"]))
+    except FileNotFoundError:
+        pass
+    return finished
+
+
+class BatchRunner:
+    """
+    Runs every prompt of a JSONL file as its own conversation; llm calls and renders
+    run in separate pools so they overlap, each with its own concurrency limit.
+    Results are appended to the output JSONL as they finish.
+    """
+
+    def __init__(
+            self,
+            llm_factory: Callable[[], BaseLLM] = None,
+            workdir: str = None,
+            quality: str = "l",
+            api_concurrency: int = 8,
+            render_concurrency: int = None,
+            auto_repair: bool = False,
+            manim_command: List[str] = None,
+            render_limits: RenderLimits = None,
+            response_cache: ResponseCache = None,
+            cache_sampled: bool = False
+        ) -> None:
+        self.llm_factory = llm_factory or OpenAIManim.factory()
+        self.workdir = os.path.abspath(workdir or os.path.join(os.getcwd(), "ez_manim_batch"))
+        self.quality = quality
+        self.auto_repair = auto_repair
+        self.manim_command = manim_command
+
+        # reruns of a batch answer the prompts they already sent from the cache
+        self.response_cache = response_cache
+        self.cache_sampled = cache_sampled
+
+        # api calls wait on the network, renders are cpu bound
+        self.api_concurrency = api_concurrency
+        self.render_concurrency = render_concurrency or os.cpu_count() or 1
+
+        # a hanging or runaway scene is killed instead of holding a render slot
+        self.render_scheduler = RenderScheduler(self.render_concurrency, render_limits)
+
+        self._write_lock = threading.Lock()
+
+    def run(self, input_path: str, output_path: str, resume: bool = True) -> Dict[str, int]:
+        """
+        Runs the prompts not finished in `output_path` yet, returns the count of every status
+        """
+        items = read_prompts(input_path)
+        if resume:
+            finished = read_finished(output_path)
+            items = [item for item in items if item["id"] not in finished]
+        elif os.path.exists(output_path):
+            os.remove(output_path)
+
+        counts: Dict[str, int] = {}
+        if not items:
+            return counts
+
+        remaining = len(items)
+        all_done = threading.Event()
+
+        jobs = JobQueue(workers={
+            "llm": self.api_concurrency,
+            "render": self.render_concurrency,
+        }, keep_finished=0)
+
+        with open(output_path, "a") as out:
+
+            def finish(item: Dict[str, Any], result: Dict[str, Any]) -> None:
+                nonlocal remaining
+                # one write per line, flushed, so an interrupted run loses at most the items in flight
+                with self._write_lock:
+                    out.write(json.dumps(result) + "\n")
+                    out.flush()
+                    counts[result["status"]] = counts.get(result["status"], 0) + 1
+                    remaining -= 1
+                    if remaining == 0:
+                        all_done.set()
+
+            def fail(item: Dict[str, Any], result: Dict[str, Any], e: Exception) -> None:
+                # not finished, run again on resume
+                logging.error(f"batch item {item['id']} failed: {e}")
+                result.update(status="error", error=f"{type(e).__name__}: {e}")
+                finish(item, self._finalize(result))
+
+            def render(item, result, core, code, cancel=None):
+                try:
+                    start = time.perf_counter()
+                    result["response"], result["returncode"] = core.render_code(code, cancel=cancel)
+                    result["timings"]["render"] = time.perf_counter() - start
+
+                    mwrapper = core.mwrapper
+                    result["status"] = "failed" if result["returncode"] else "done"
+                    if result["returncode"] == CANCELLED:
+                        # interrupted, run again on resume
+                        result["status"] = "cancelled"
+                    limit = getattr(result["response"], "limit", None)
+                    if result["returncode"] == LIMIT_EXCEEDED and limit is not None:
+                        result["limit"] = limit.to_dict()
+                    if not result["returncode"] and mwrapper.scene_to_render is not None:
+                        video = mwrapper.output_path(mwrapper.code_path, mwrapper.scene_to_render)
+                        result["video"] = video if os.path.exists(video) else None
+                    # the repaired code, if it was and it parses
+                    result["code"] = mwrapper.last_code or code
+                except Exception as e:
+                    return fail(item, result, e)
+                finish(item, self._finalize(result))
+
+            def ask(item, result, cancel=None):
+                try:
+                    core = self._core(item)
+                    result["timings"]["queued"] = time.time() - result["started"]
+
+                    start = time.perf_counter()
+                    code = core.ask_code(item["prompt"])
+                    result["timings"]["llm"] = time.perf_counter() - start
+                except Exception as e:
+                    return fail(item, result, e)
+
+                if code is None:
+                    result["status"] = "invalid"
+                    return finish(item, self._finalize(result))
+
+                result["code"] = code
+                if cancel is not None and cancel.is_set():
+                    return
+                jobs.submit("render", render, item, result, core, code, description=item["id"])
+
+            try:
+                for item in items:
+                    result = {
+                        "id": item["id"], "prompt": item["prompt"], "status": None,
+                        "code": None, "response": None, "returncode": None, "video": None,
+                        "limit": None, "started": time.time(), "timings": {},
+                    }
+                    jobs.submit("llm", ask, item, result, description=item["id"])
+
+                all_done.wait()
+            finally:
+                # the jobs still running write to `out`, it stays open until they are done
+                jobs.shutdown(cancel=not all_done.is_set(), wait=True)
+
+        return counts
+
+    def _core(self, item: Dict[str, Any]) -> Core:
+        """
+        A fresh conversation with its own directory for the item
+        """
+        item_dir = os.path.join(self.workdir, "items", re.sub(r"[^\w.-]", "_", item["id"]))
+        os.makedirs(item_dir, exist_ok=True)
+
+        return Core(
+            console=rich_console.Console(quiet=True),
+            llm=self.llm_factory(),
+            quality=self.quality,
+            auto_repair=self.auto_repair,
+            response_cache=self.response_cache,
+            cache_sampled=self.cache_sampled,
+            mwrapper=MWrapper(
+                quality=self.quality,
+                preview=False,
+                manim_command=self.manim_command,
+                cwd=item_dir,
+                # items render at the same time, one directory per item with its code,
+                # media and partial movies is enough isolation, and the outputs are kept
+                isolate_jobs=False,
+                scheduler=self.render_scheduler
+            )
+        )
+
+    @staticmethod
+    def _finalize(result: Dict[str, Any]) -> Dict[str, Any]:
+        result["timings"]["total"] = time.time() - result["started"]
+        return result
+
+
+def run_batch(input_path: str, output_path: str, resume: bool = True, **kwargs) -> Dict[str, int]:
+    """
+    Runs a JSONL file of prompts, see BatchRunner
+    """
+    return BatchRunner(**kwargs).run(input_path, output_path, resume=resume)
@@ -1,2 +1,25 @@
-# empty
-from .base import Core
+import sys
+from typing import TYPE_CHECKING
+
+from ..utils.imports import LazyModule
+
+
+_import_structure = {
+    "base": ["Core"],
+    "cache": ["RenderCache"],
+}
+
+
+if TYPE_CHECKING:
+
+    from .base import Core
+    from .cache import RenderCache
+
+else:
+
+    sys.modules[__name__] = LazyModule(
+        __name__,
+        globals()["__file__"],
+        _import_structure,
+        module_spec=__spec__
+    )
@@ -0,0 +1,275 @@
+import ast
+import importlib.util
+from functools import lru_cache
+from dataclasses import dataclass, field
+from typing import *
+
+
+# manim's default durations
+DEFAULT_RUN_TIME = 1.0
+DEFAULT_WAIT_TIME = 1.0
+
+
+@dataclass
+class SceneInfo:
+    """
+    A Scene-derived class found in the code, with a rough cost estimate
+    """
+    name: str
+    bases: List[str]
+    lineno: int
+    num_play: int = 0
+    num_wait: int = 0
+    run_time: float = 0.0
+
+    @property
+    def num_animations(self) -> int:
+        return self.num_play + self.num_wait
+
+
+@dataclass
+class CodeAnalysis:
+    """
+    Result of analyzing the generated code
+    """
+    scenes: List[SceneInfo] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    @property
+    def scene_names(self) -> List[str]:
+        return [scene.name for scene in self.scenes]
+
+    @property
+    def run_time(self) -> float:
+        return sum(scene.run_time for scene in self.scenes)
+
+
+# importable wherever manim renders, even when it isn't installed next to ez-manim
+ALWAYS_AVAILABLE = {"manim"}
+
+
+@lru_cache(maxsize=None)
+def module_exists(name: str) -> bool:
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def _base_name(node: ast.expr) -> str:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    if isinstance(node, ast.Subscript):
+        return _base_name(node.value)
+    return ""
+
+
+def _number(node: ast.expr) -> Optional[float]:
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) \
+            and not isinstance(node.value, bool):
+        return float(node.value)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        value = _number(node.operand)
+        return -value if value is not None else None
+    return None
+
+
+def _loop_count(node: ast.For) -> int:
+    """
+    Iterations of `for ... in range(...)` with constant bounds, 1 when unknown
+    """
+    call = node.iter
+    if not (isinstance(call, ast.Call) and _base_name(call.func) == "range"):
+        if isinstance(call, (ast.List, ast.Tuple)):
+            return len(call.elts)
+        return 1
+
+    args = [_number(arg) for arg in call.args]
+    if not args or any(arg is None for arg in args):
+        return 1
+
+    try:
+        return max(len(range(*(int(arg) for arg in args))), 0)
+    except (ValueError, TypeError, OverflowError):
+        # a zero step or too many arguments, manim reports it
+        return 1
+
+
+def _keyword(call: ast.Call, name: str) -> Optional[ast.expr]:
+    for keyword in call.keywords:
+        if keyword.arg == name:
+            return keyword.value
+    return None
+
+
+def _estimate_cost(scene: SceneInfo, nodes: List[ast.stmt], multiplier: int = 1) -> None:
+    """
+    Counts self.play / self.wait calls and their run time, loops with constant bounds multiply
+    """
+    for node in nodes:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+
+        if isinstance(node, ast.For):
+            _estimate_cost(scene, node.body, multiplier * _loop_count(node))
+            _estimate_cost(scene, node.orelse, multiplier)
+            continue
+
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.stmt):
+                _estimate_cost(scene, [child], multiplier)
+
+        for call in _calls(node):
+            func = call.func
+            if not (isinstance(func, ast.Attribute)
+                    and isinstance(func.value, ast.Name) and func.value.id == "self"):
+                continue
+
+            if func.attr == "play":
+                run_time = _number(_keyword(call, "run_time")) \
+                    if _keyword(call, "run_time") is not None else None
+                scene.num_play += multiplier
+                scene.run_time += multiplier * (run_time if run_time is not None else DEFAULT_RUN_TIME)
+
+            elif func.attr == "wait":
+                arg = call.args[0] if call.args else _keyword(call, "duration")
+                duration = _number(arg) if arg is not None else None
+                scene.num_wait += multiplier
+                scene.run_time += multiplier * (duration if duration is not None else DEFAULT_WAIT_TIME)
+
+
+def _calls(node: ast.stmt) -> Iterator[ast.Call]:
+    """
+    Calls in the statement itself, not in nested statements
+    """
+    stack = [child for child in ast.iter_child_nodes(node) if not isinstance(child, ast.stmt)]
+    while stack:
+        child = stack.pop()
+        if isinstance(child, ast.Call):
+            yield child
+        stack.extend(
+            grandchild for grandchild in ast.iter_child_nodes(child)
+            if not isinstance(grandchild, ast.stmt)
+        )
+
+
+def _find_construct(node: ast.ClassDef, classes: Dict[str, ast.ClassDef]) -> Optional[ast.FunctionDef]:
+    """
+    The construct method of the class or of the first base defined in the same code
+    """
+    seen: Set[str] = set()
+    stack = [node]
+
+    while stack:
+        current = stack.pop(0)
+        if current.name in seen:
+            continue
+        seen.add(current.name)
+
+        for method in current.body:
+            if isinstance(method, ast.FunctionDef) and method.name == "construct":
+                return method
+
+        stack.extend(
+            classes[_base_name(base)] for base in current.bases if _base_name(base) in classes
+        )
+
+    return None
+
+
+def _guarded_imports(tree: ast.AST) -> Set[ast.stmt]:
+    """
+    Imports in the body of a `try` that handles ImportError, optional by intent
+    """
+    guarded: Set[ast.stmt] = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Try):
+            continue
+
+        handled = set()
+        for handler in node.handlers:
+            types = handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+            handled.update(_base_name(kind) if kind is not None else "" for kind in types)
+        if not handled & {"", "ImportError", "ModuleNotFoundError", "Exception", "BaseException"}:
+            continue
+
+        for statement in node.body:
+            guarded.update(
+                child for child in ast.walk(statement)
+                if isinstance(child, (ast.Import, ast.ImportFrom))
+            )
+    return guarded
+
+
+def analyze_code(code: str, check_imports: bool = True) -> CodeAnalysis:
+    """
+    Statically checks the code before rendering:
+    syntax errors, unknown imports and every Scene-derived class whatever its base;
+    imports are looked up in this interpreter, turn `check_imports` off when manim runs in another
+    """
+    analysis = CodeAnalysis()
+
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        analysis.errors.append(f"SyntaxError: {e.msg} (line {e.lineno})")
+        return analysis
+
+    if check_imports:
+        guarded = _guarded_imports(tree)
+        for node in ast.walk(tree):
+            if node in guarded:
+                continue
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names = [node.module]
+            else:
+                continue
+
+            for name in names:
+                top = name.split(".")[0]
+                if top not in ALWAYS_AVAILABLE and not module_exists(top):
+                    analysis.errors.append(f"ImportError: unknown module {name} (line {node.lineno})")
+
+    classes = [node for node in tree.body if isinstance(node, ast.ClassDef)]
+
+    # manim's scenes all end with "Scene", classes deriving from them are scenes too
+    scene_names: Set[str] = set()
+    changed = True
+    while changed:
+        changed = False
+        for node in classes:
+            if node.name in scene_names:
+                continue
+            bases = [_base_name(base) for base in node.bases]
+            if any(base.endswith("Scene") or base in scene_names for base in bases):
+                scene_names.add(node.name)
+                changed = True
+
+    by_name = {node.name: node for node in classes}
+
+    for node in classes:
+        if node.name not in scene_names:
+            continue
+
+        scene = SceneInfo(
+            name=node.name,
+            bases=[_base_name(base) for base in node.bases],
+            lineno=node.lineno
+        )
+        construct = _find_construct(node, by_name)
+        if construct is not None:
+            _estimate_cost(scene, construct.body)
+        analysis.scenes.append(scene)
+
+    if not analysis.scenes:
+        analysis.errors.append("No Scene class found in the code")
+
+    return analysis
@@ -1,7 +1,7 @@
 import sys
+import time
+import threading
 
-from rich.console import Console
-from rich.markdown import Markdown
 from typing import *
 
 from .content import ( 
@@ -9,14 +9,39 @@ from .content import (
     USER_PROMPT, 
     ASSISTANT_SUCCESS_PROMPT, 
     ASSISTANT_ERROR_PROMPT,
-    INVALID_RESPONSE
+    INVALID_RESPONSE,
+    JOBS_HELP
 )
-from .mwrapper import MWrapper
+from .analyzer import analyze_code
+from .cache import RenderCache
+from .jobs import Job, JobQueue
+from .mwrapper import CANCELLED, MWrapper, RenderProgress, RenderResult
+from .patching import PatchError, apply_edits, parse_edit_blocks
+from .repair import REPAIR_PROMPT, summarize_render_error
+from .watchdog import LimitMessage, RenderScheduler
 
 from ..llm import BaseLLM, OpenAIManim
+from ..llm.response_cache import ResponseCache
+from ..llm.session_log import SessionLog
+from ..llm.parser import CODE_PREFIX, EDIT_PREFIX, StreamParser, extract_code
+from ..llm.prompts import EDIT_PROMPT, FULL_CODE_PROMPT
+from ..utils import lazy_import, tracer
 
+if TYPE_CHECKING:
+    from rich.console import Console
+    from rich.markdown import Markdown
 
-def run_with_status(console: Console, func: Callable, *args, **kwargs) -> Any:
+
+# imported when the first Core is created
+rich_console = lazy_import("rich.console")
+rich_live = lazy_import("rich.live")
+rich_markdown = lazy_import("rich.markdown")
+rich_markup = lazy_import("rich.markup")
+rich_progress = lazy_import("rich.progress")
+rich_table = lazy_import("rich.table")
+
+
+def run_with_status(console: "Console", func: Callable, *args, **kwargs) -> Any:
     """
     Runs the function with status
     """
@@ -36,22 +61,105 @@ class Core:
     def __init__(
         self,
         code_file_name: str = "trialCode",
-        console: Console = None,
+        console: "Console" = None,
         llm: BaseLLM = None,
-        quality: str = "h"
+        quality: str = "h",
+        stream: bool = False,
+        render_backend: str = "subprocess",
+        render_cache: RenderCache = None,
+        auto_repair: bool = False,
+        max_repair_attempts: int = 3,
+        repair_time_budget: float = 180.0,
+        repair_token_budget: int = 6000,
+        progressive: bool = False,
+        preview_last_frame: bool = False,
+        render_all_scenes: bool = False,
+        concat_scenes: bool = False,
+        background: bool = False,
+        profile: bool = False,
+        mwrapper: MWrapper = None,
+        compact_history: bool = False,
+        edit_mode: bool = False,
+        candidates: int = 1,
+        response_cache: ResponseCache = None,
+        cache_sampled: bool = False,
+        session_log: SessionLog = None,
+        resume_tokens: int = 8000,
+        render_scheduler: RenderScheduler = None
     ) -> None:
         self.code_file_name = code_file_name
-        self.console = console or Console()
+        self.console = console or rich_console.Console()
         self.llm = llm or OpenAIManim()
+        if compact_history:
+            # only the latest code in full, older requests as a scene spec
+            self.llm.enable_compaction()
+        if response_cache is not None:
+            # identical requests are answered from disk
+            self.llm.enable_response_cache(response_cache, cache_sampled=cache_sampled)
+
+        # ask for SEARCH/REPLACE edits against the last code instead of the whole program
+        self.edit_mode = edit_mode
         self.quality = quality
 
-        self.mwrapper = MWrapper(
+        # ask for this many responses at once and keep the first that renders at low quality
+        self.candidates = candidates
+
+        # show the response while it is generated and render as soon as the code block closes
+        self.stream = stream
+
+        # feed render errors back to the llm until the code renders or a budget runs out
+        self.auto_repair = auto_repair
+        self.max_repair_attempts = max_repair_attempts
+        self.repair_time_budget = repair_time_budget
+        self.repair_token_budget = repair_token_budget
+
+        # number of repair attempts of every turn
+        self.repair_attempts: List[int] = []
+
+        # show a fast low quality preview, then render `quality` in the background
+        self.progressive = progressive
+
+        # render every scene of a response in parallel, optionally joined in one video
+        self.render_all_scenes = render_all_scenes
+        self.concat_scenes = concat_scenes
+
+        self.mwrapper = mwrapper or MWrapper(
             code_file_name=self.code_file_name, 
-            quality=self.quality
+            quality=self.quality,
+            backend=render_backend,
+            cache=render_cache,
+            preview_last_frame=preview_last_frame,
+            scheduler=render_scheduler
         )
 
+        # every message is appended to the log, the tail of a resumed log fills the history first
+        self.session_log = session_log
+        self.resumed_messages: int = 0
+        if session_log is not None:
+            self.resumed_messages = self.llm.enable_session_log(session_log, resume_tokens=resume_tokens)
+            self.mwrapper.last_code = self._resumed_code()
+
+        # run llm calls and renders as background jobs so the prompt stays responsive
+        self.background = background
+        self.jobs = JobQueue(on_done=self._on_job_done) if background else None
+
+        # keeps each user/assistant pair together in the history
+        self._llm_lock = threading.Lock()
+
+        # time every stage of a turn and print the breakdown after it
+        self.profile = profile
+        if profile:
+            tracer.enabled = True
+
     def run(self):
         self._show_markdown(WELCOME_MESSAGE, extra_lines=True)
+        if self.background:
+            self._show_markdown(JOBS_HELP)
+        if self.resumed_messages:
+            self.console.print(
+                f"[bold blue]resumed session {self.session_log.session_id} "
+                f"({self.resumed_messages} messages)"
+            )
         self._main_loop()
     
     def _main_loop(self):
@@ -93,32 +201,418 @@ class Core:
                 user_input = ""
 
                 # TODO: got the user input, now process 
-                if ui:
-                    manim_code, ok = run_with_status(
-                        self.console, 
-                        self.ask_llm, 
-                        ui
-                    )
-                    if not ok:
-                        self._show_success_error_response(INVALID_RESPONSE, error=True, is_md=True)
-                    else:
-                        # run manim code and save/show
-                        self._show_success_error_response(manim_code, error=False, is_md=True, end="\n")
-                        sind, eind = manim_code.find("```python"), manim_code.rfind("```")
-                        mcode = manim_code[sind + len("```python"): eind]
-                        
-                        response, err = run_with_status(
-                            self.console, 
-                            self.mwrapper.render_from_string, 
-                            mcode
-                        )
-                        response = ("[bold green]" if not err else "[bold red]") + response
-                        self.console.print(response)
+                if ui and self.background and ui.startswith("/"):
+                    self._run_command(ui)
+                elif ui and self.background:
+                    self.jobs.submit("llm", self._background_turn, ui, description=ui)
+                elif ui:
+                    self._process_turn(ui)
         
         except KeyboardInterrupt:
             self.console.print("\n\nbye bye!\n")
+            if self.jobs is not None:
+                if self.jobs.jobs(active_only=True):
+                    self.console.print("[bold blue]waiting for the running jobs to stop...")
+                # a running llm job still adds its turn to the history, and to the session log
+                self.jobs.shutdown(wait=True)
+            if self.session_log is not None:
+                # every message is already on disk
+                self.session_log.close()
+                self.console.print(
+                    f"[bold blue]resume with: python -m ez_manim --resume {self.session_log.session_id}\n"
+                )
+            self.mwrapper.close()
             sys.exit(0)
 
+    def run_turn(self, ui: str) -> Tuple[str, int]:
+        """
+        One turn without the input loop, returns the render (response, returncode);
+        the returncode is None when the llm refused the request
+        """
+        return self._process_turn(ui)
+
+    def ask_code(self, ui: str) -> Optional[str]:
+        """
+        The llm half of a turn, returns the code or None if the request was invalid
+        """
+        return self._ask(ui)
+
+    def render_code(self, mcode: str, cancel: threading.Event = None) -> Tuple[str, int]:
+        """
+        The render half of a turn, repaired if enabled
+        """
+        return self._finish_turn(mcode, cancel=cancel)
+
+    def _process_turn(self, ui: str) -> Tuple[str, int]:
+        """
+        Ask the llm for the code and render it
+        """
+        turn = tracer.new_turn()
+        result = (INVALID_RESPONSE, None)
+
+        with tracer.span("turn"):
+            mcode = self._ask(ui)
+            if mcode is not None:
+                result = self._finish_turn(mcode)
+
+        if self.profile:
+            self._show_profile(turn)
+
+        return result
+
+    def _finish_turn(self, mcode: str, cancel: threading.Event = None) -> Tuple[str, int]:
+        """
+        Render the code, repair it if enabled, and show the result
+        """
+        response, err = self._render(mcode, cancel=cancel)
+
+        if self.auto_repair:
+            response, err = self._repair(mcode, response, err, cancel=cancel)
+
+        if err != CANCELLED:
+            self.console.print(("[bold green]" if not err else "[bold red]") + response)
+
+        return response, err
+
+    def _background_turn(self, ui: str, cancel: threading.Event = None):
+        """
+        llm job of the background mode, the render becomes its own job
+        """
+        tracer.new_turn()
+        mcode = self._ask(ui)
+        if mcode is None or cancel.is_set():
+            return
+
+        # a newer render supersedes the one in flight
+        self.jobs.submit(
+            "render", self._finish_turn, mcode, description=ui, key="render"
+        )
+
+    def _run_command(self, ui: str):
+        """
+        Job commands of the background mode
+        """
+        command, _, arg = ui.partition(" ")
+
+        if command == "/jobs":
+            jobs = self.jobs.jobs()
+            if not jobs:
+                self.console.print("[bold blue]no jobs yet")
+            for job in jobs:
+                self.console.print(
+                    f"[bold blue]{job.id:>3}[/] {job.kind:<7} {job.status:<10} "
+                    f"{job.elapsed:>6.1f}s  {rich_markup.escape(job.description[:50])}",
+                    highlight=False
+                )
+
+        elif command == "/cancel":
+            arg = arg.strip()
+            if arg and not arg.isdigit():
+                self.console.print(f"[bold red]{rich_markup.escape(arg)} is not a job id, try /jobs")
+                return
+            ids = [int(arg)] if arg else [job.id for job in self.jobs.jobs(active_only=True)]
+            for job_id in ids:
+                cancelled = self.jobs.cancel(job_id)
+                self.console.print(
+                    f"[bold blue]job {job_id} " + ("cancelled" if cancelled else "is not running")
+                )
+
+        else:
+            self.console.print(f"[bold red]unknown command {command}, try /jobs or /cancel")
+
+    def _on_job_done(self, job: Job):
+        if job.status == Job.FAILED:
+            self.console.print(f"\n[bold red]job {job.id} ({job.kind}) failed: {job.error}")
+        elif job.status == Job.CANCELLED:
+            self.console.print(f"\n[bold blue]job {job.id} ({job.kind}) cancelled")
+        elif job.kind == "render":
+            self.console.print(f"[bold blue]job {job.id} ({job.kind}) done in {job.elapsed:.1f}s")
+
+    def _show_profile(self, turn: int):
+        """
+        Time spent in every stage of the turn
+        """
+        table = rich_table.Table(title=f"turn {turn}", title_justify="left")
+        table.add_column("stage")
+        table.add_column("calls", justify="right")
+        table.add_column("seconds", justify="right")
+        table.add_column("details")
+
+        stages: Dict[str, List[Any]] = {}
+        for span in tracer.turn_spans(turn):
+            calls, seconds, details = stages.setdefault(span.name, [0, 0.0, {}])
+            details.update(span.attrs)
+            stages[span.name] = [calls + 1, seconds + span.seconds, details]
+
+        for name, (calls, seconds, details) in stages.items():
+            table.add_row(
+                name, str(calls), f"{seconds:.3f}",
+                " ".join(f"{key}={value}" for key, value in details.items())
+            )
+
+        self.console.print(table)
+
+    def _status(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Runs the function with a status spinner, without one in background mode
+        """
+        if self.background:
+            return func(*args, **kwargs)
+        return run_with_status(self.console, func, *args, **kwargs)
+
+    def _ask(self, ui: str, prompt: str = None, followup: bool = False) -> Optional[str]:
+        """
+        Shows the llm response, returns its code or None if the request was invalid;
+        `prompt` is sent in place of `ui`, which is what the history keeps.
+        A `followup` answers the user turn already in the history
+        """
+        last_code = self.mwrapper.last_code
+        edit = self.edit_mode and prompt is None and last_code is not None
+        if edit:
+            prompt = EDIT_PROMPT.format(code=last_code.strip("\n"), request=ui)
+
+        if self.candidates > 1:
+            return self._ask_best_of_n(ui, prompt, last_code)
+
+        with self._llm_lock:
+            if self.stream and not self.background:
+                manim_code, ok = self._ask_llm_live(ui, prompt, followup)
+            else:
+                manim_code, ok = self._status(self.ask_llm, ui, prompt, followup)
+
+        if not ok:
+            self._show_success_error_response(INVALID_RESPONSE, error=True, is_md=True)
+            return None
+
+        # run manim code and save/show
+        if not self.stream or self.background:
+            self._show_success_error_response(manim_code, error=False, is_md=True, end="\n")
+
+        if not manim_code.startswith(EDIT_PREFIX):
+            return extract_code(manim_code)
+
+        try:
+            if last_code is None:
+                raise PatchError("there is no code to edit yet")
+            return apply_edits(last_code, parse_edit_blocks(manim_code))
+        except PatchError as e:
+            if not edit:
+                self.console.print(f"[bold red]the edits could not be applied: {e}")
+                return None
+            # fall back to the whole program, as the answer to the same request
+            self.console.print(f"[bold red]{e}\n[bold blue]asking for the full code...")
+            return self._ask(
+                ui,
+                FULL_CODE_PROMPT.format(error=e, code=last_code.strip("\n"), request=ui),
+                followup=True
+            )
+
+    def _ask_best_of_n(self, ui: str, prompt: str, last_code: Optional[str]) -> Optional[str]:
+        """
+        Asks for `candidates` responses, drops the ones that don't parse,
+        and keeps the first that renders cleanly at low quality
+        """
+        with self._llm_lock:
+            responses = self._status(self.ask_llm_candidates, ui, self.candidates, prompt)
+
+            with tracer.span("core.best_of_n", candidates=self.candidates) as span:
+                # (candidate number, response, code) of the ones that parse
+                valid: List[Tuple[int, str, str]] = []
+                for number, (response, ok) in enumerate(responses, 1):
+                    code = self._response_code(response, last_code) if ok else None
+                    if code is not None and analyze_code(code, self.mwrapper.check_imports).ok:
+                        valid.append((number, response, code))
+
+                winner, results = (None, [])
+                if valid:
+                    winner, results = self._status(
+                        self.mwrapper.render_candidates, [code for _, _, code in valid]
+                    )
+                span.set(valid=len(valid), winner=winner)
+
+            self.console.print(
+                f"[bold blue]{len(responses)} candidates, {len(valid)} passed the static check, "
+                + (f"#{valid[winner][0]} rendered first in {results[winner].seconds:.1f}s"
+                   if winner is not None else "none rendered")
+            )
+
+            if valid:
+                _, response, code = valid[winner if winner is not None else 0]
+            else:
+                # nothing parsed, the first valid response shows its error
+                response = next((response for response, ok in responses if ok), responses[0][0])
+                code = None
+
+            self.llm.add_to_history("user", ui)
+            self.llm.add_to_history("assistant", response)
+
+        if not any(ok for _, ok in responses):
+            self._show_success_error_response(INVALID_RESPONSE, error=True, is_md=True)
+            return None
+
+        self._show_success_error_response(
+            response.replace(CODE_PREFIX, "", 1).strip(), error=False, is_md=True, end="\n"
+        )
+        return code if code is not None else self._response_code(response, last_code)
+
+    def _response_code(self, response: str, last_code: Optional[str]) -> Optional[str]:
+        """
+        Code of a valid response, its edits applied to `last_code`
+        """
+        if not response.startswith(EDIT_PREFIX):
+            return extract_code(response)
+        try:
+            if last_code is None:
+                raise PatchError("there is no code to edit yet")
+            return apply_edits(last_code, parse_edit_blocks(response))
+        except PatchError:
+            return None
+
+    def _resumed_code(self) -> Optional[str]:
+        """
+        The latest code of the resumed history, edits replayed onto the code before them
+        """
+        code = None
+        for message in self.llm.chat_history:
+            if message["role"] == "assistant" and \
+                    message["content"].startswith((CODE_PREFIX, EDIT_PREFIX)):
+                code = self._response_code(message["content"], code) or code
+        return code
+
+    def _render(self, mcode: str, cancel: threading.Event = None) -> Tuple[str, int]:
+        if self.render_all_scenes:
+            results, combined = self._status(
+                self.mwrapper.render_all_from_string,
+                mcode,
+                concat=self.concat_scenes
+            )
+            return self._summarize_results(results, combined)
+
+        if self.progressive:
+            return self._status(
+                self.mwrapper.render_progressive,
+                mcode,
+                on_done=self._on_background_render
+            )
+
+        # nothing to show in background mode or behind the server
+        if self.background or self.console.quiet:
+            return self.mwrapper.render_from_string(mcode, cancel=cancel)
+        return self._render_live(mcode, cancel=cancel)
+
+    def _render_live(self, mcode: str, cancel: threading.Event = None) -> Tuple[str, int]:
+        """
+        Renders with a live progress bar: the animation being rendered and the time left
+        """
+        progress = rich_progress.Progress(
+            rich_progress.SpinnerColumn(),
+            rich_progress.TextColumn("[bold blue]{task.description}"),
+            rich_progress.BarColumn(),
+            rich_progress.TimeRemainingColumn(),
+            console=self.console,
+            transient=True
+        )
+
+        with progress:
+            task = progress.add_task("rendering...", total=None)
+
+            def on_progress(render: RenderProgress):
+                progress.update(
+                    task,
+                    total=render.total,
+                    completed=render.completed,
+                    description=f"animation {min(render.animation + 1, render.total)} of {render.total}"
+                )
+
+            result = self.mwrapper.render_from_string(mcode, cancel=cancel, on_progress=on_progress)
+
+        if result[1] == 0:
+            self.console.print("[bold blue]done.")
+        return result
+
+    def _summarize_results(
+            self, results: List[RenderResult], combined: Optional[RenderResult]
+        ) -> Tuple[str, int]:
+        """
+        One line per scene with its timing, errors in full
+        """
+        lines, err, limit = [], 0, None
+
+        for result in results + ([combined] if combined is not None else []):
+            if result.scene_name is None:
+                lines.append(result.response)
+            elif result.ok:
+                lines.append(f"{result.scene_name}: {result.response} ({result.seconds:.1f}s)")
+            else:
+                lines.append(f"{result.scene_name}: failed ({result.seconds:.1f}s)\n{result.response}")
+            if not err:
+                err = result.returncode
+                limit = getattr(result.response, "limit", None)
+
+        # the limit of the scene that failed the turn stays with the response
+        response = "\n".join(lines)
+        return (LimitMessage(limit, response) if limit is not None else response, err)
+
+    def _on_background_render(self, response: str, err: int):
+        quality = f"[bold blue]{self.quality} quality render: "
+        self.console.print(f"\n{quality}" + ("[bold green]" if not err else "[bold red]") + response)
+
+    def _repair(
+            self, mcode: str, response: str, err: int, cancel: threading.Event = None
+        ) -> Tuple[str, int]:
+        """
+        Sends a summary of the render error to the llm and renders the fix,
+        up to `max_repair_attempts` times within the time and token budgets
+        """
+        attempts, tokens = 0, 0
+        start = time.perf_counter()
+
+        while err and err != CANCELLED and attempts < self.max_repair_attempts \
+                and time.perf_counter() - start < self.repair_time_budget \
+                and tokens < self.repair_token_budget:
+
+            attempts += 1
+            summary = summarize_render_error(
+                response, mcode, code_file=f"{self.code_file_name}.py"
+            )
+            self.console.print(
+                f"[bold red]{summary}\n"
+                f"[bold blue]asking for a fix ({attempts}/{self.max_repair_attempts})..."
+            )
+
+            mcode = self._ask(REPAIR_PROMPT.format(summary=summary))
+
+            # the repair prompt and the response
+            tokens += sum(self.llm.chat_history.token_counts[-2:])
+
+            if mcode is None or (cancel is not None and cancel.is_set()):
+                break
+
+            response, err = self._render(mcode, cancel=cancel)
+
+        self.repair_attempts.append(attempts)
+
+        return response, err
+
+    def _ask_llm_live(self, ui: str, prompt: str = None, followup: bool = False) -> Tuple[str, bool]:
+        """
+        Streams the response into a live markdown view
+        """
+        shown = False
+
+        with rich_live.Live(console=self.console, refresh_per_second=8) as live:
+
+            def on_update(parser: StreamParser):
+                nonlocal shown
+                if parser.status not in (StreamParser.CODE, StreamParser.EDIT):
+                    return
+                if not shown:
+                    self.console.print(f"\n{ASSISTANT_SUCCESS_PROMPT}")
+                    shown = True
+                live.update(self._str2md(parser.response.replace(CODE_PREFIX, "", 1).strip()))
+
+            return self.ask_llm_stream(ui, on_update=on_update, prompt=prompt, followup=followup)
+
     def _show_success_error_response(
             self, content: str, error: bool = False, is_md: bool = False, end=""
         ):
@@ -130,26 +624,36 @@ class Core:
         else:
             self.console.print(content)
 
-    def ask_llm(self, user_input: str) -> Tuple[str, bool]:
+    def ask_llm(
+            self, user_input: str, prompt: str = None, followup: bool = False
+        ) -> Tuple[str, bool]:
         """
-        Get a response from the llm
+        Get a response from the llm,
+        `prompt` is sent in place of `user_input` which is what the history keeps;
+        a `followup` doesn't add `user_input` again, it is the latest user turn already
         """
+        with tracer.span("core.ask_llm"):
+            return self._ask_llm(user_input, prompt, followup)
 
+    def _ask_llm(
+            self, user_input: str, prompt: str = None, followup: bool = False
+        ) -> Tuple[str, bool]:
         response: str = ""
-        # 0: invalid, 1: code
+        # 0: invalid, 1: code or edits
         ok: int = False
 
         messages = self.llm.get_windowed_history()
-        messages.append({'role': 'user', 'content': user_input})
+        messages.append({'role': 'user', 'content': prompt or user_input})
 
         # add to history
-        self.llm.add_to_history("user", user_input)
+        if not followup:
+            self.llm.add_to_history("user", user_input)
         
-        response = self.llm.generate(messages)
+        response = self.llm.generate_cached(messages)
 
         if response == "-1":
             ok = False
-        elif response.startswith("Manim code:"):
+        elif response.startswith("Manim code:") or response.startswith(EDIT_PREFIX):
             ok = True
         
         self.llm.add_to_history("assistant", response)
@@ -158,8 +662,74 @@ class Core:
         return (_response, ok)
 
 
-    def _str2md(self, content: str) -> Markdown:
-        _md = Markdown(content)
+    def ask_llm_candidates(
+            self, user_input: str, n: int, prompt: str = None
+        ) -> List[Tuple[str, bool]]:
+        """
+        `n` raw responses from the llm and whether they are valid, nothing is added
+        to the history; `prompt` is sent in place of `user_input`
+        """
+        with tracer.span("core.ask_llm", candidates=n):
+            messages = self.llm.get_windowed_history()
+            messages.append({'role': 'user', 'content': prompt or user_input})
+
+            return [
+                (response, response.startswith(CODE_PREFIX) or response.startswith(EDIT_PREFIX))
+                for response in self.llm.generate_n(messages, n)
+            ]
+
+    def ask_llm_stream(
+            self,
+            user_input: str,
+            on_update: Callable[[StreamParser], None] = None,
+            prompt: str = None,
+            followup: bool = False
+        ) -> Tuple[str, bool]:
+        """
+        Get a response from the llm while it is streamed,
+        stops reading as soon as it is a refusal or the code block is closed
+        """
+        with tracer.span("core.ask_llm", stream=True):
+            return self._ask_llm_stream(user_input, on_update, prompt, followup)
+
+    def _ask_llm_stream(
+            self,
+            user_input: str,
+            on_update: Callable[[StreamParser], None] = None,
+            prompt: str = None,
+            followup: bool = False
+        ) -> Tuple[str, bool]:
+        messages = self.llm.get_windowed_history()
+        messages.append({'role': 'user', 'content': prompt or user_input})
+
+        # add to history
+        if not followup:
+            self.llm.add_to_history("user", user_input)
+
+        parser = StreamParser()
+        chunks = self.llm.stream_cached(messages, done=lambda: parser.done)
+
+        try:
+            for chunk in chunks:
+                parser.feed(chunk)
+                if on_update is not None:
+                    on_update(parser)
+                if parser.done:
+                    break
+        finally:
+            # stops the request early, trailing text is not needed
+            chunks.close()
+
+        ok = parser.finish() in (StreamParser.CODE, StreamParser.EDIT)
+        response = parser.response
+
+        self.llm.add_to_history("assistant", response)
+        _response = response.replace(CODE_PREFIX, "", 1).strip() if ok else response
+
+        return (_response, ok)
+
+    def _str2md(self, content: str) -> "Markdown":
+        _md = rich_markdown.Markdown(content)
         return _md
 
     def _show_markdown(self, content: str, extra_lines=False):
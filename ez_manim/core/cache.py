@@ -0,0 +1,179 @@
+import os
+import ast
+import json
+import time
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import *
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ez_manim", "renders")
+
+
+def manim_version() -> str:
+    # importlib.metadata is slow to import, only pay for it here
+    import importlib.metadata as importlib_metadata
+
+    try:
+        return importlib_metadata.version("manim")
+    except importlib_metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def normalize_code(code: str) -> Optional[str]:
+    """
+    AST dump of the code so whitespace and comments don't change it, None if it doesn't parse
+    """
+    try:
+        return ast.dump(ast.parse(code))
+    except (SyntaxError, ValueError):
+        return None
+
+
+class RenderCache:
+    """
+    Content addressed cache of rendered videos with a size cap and LRU eviction
+
+    keys are hashes of the normalized code, scene name, quality and manim version
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(
+            self,
+            cache_dir: str = DEFAULT_CACHE_DIR,
+            max_bytes: int = 1024 ** 3
+        ) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+        self.hits: int = 0
+        self.misses: int = 0
+
+        self._version = manim_version()
+        self._lock = threading.Lock()
+
+        # key -> {"file": ..., "size": ..., "last_used": ...}, least recently used first
+        self._index: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+        # hits only change the access times, they are written with the next put or on close
+        self._dirty: bool = False
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    @property
+    def size(self) -> int:
+        return sum(entry["size"] for entry in self._index.values())
+
+    def stats(self) -> Dict[str, int]:
+        return dict(
+            hits=self.hits, misses=self.misses, entries=len(self._index), bytes=self.size
+        )
+
+    def key(self, code: str, scene_name: str, quality: str) -> Optional[str]:
+        """
+        Cache key of a render, None if the code doesn't parse
+        """
+        normalized = normalize_code(code)
+        if normalized is None:
+            return None
+
+        digest = hashlib.sha256()
+        for part in (normalized, scene_name, quality, self._version):
+            digest.update(part.encode())
+            digest.update(b"\0")
+
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Path of the cached video, None on a miss
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            path = os.path.join(self.cache_dir, entry["file"]) if entry else None
+
+            if path is None or not os.path.exists(path):
+                if entry is not None:
+                    del self._index[key]
+                    self._save_index()
+                self.misses += 1
+                return None
+
+            entry["last_used"] = time.time()
+            self._index.move_to_end(key)
+            self._dirty = True
+            self.hits += 1
+
+            return path
+
+    def put(self, key: str, video_path: str) -> Optional[str]:
+        """
+        Stores a copy of the video, returns the cached path;
+        None if the video alone is larger than the cache
+        """
+        fname = key + os.path.splitext(video_path)[1]
+        path = os.path.join(self.cache_dir, fname)
+
+        if os.path.getsize(video_path) > self.max_bytes:
+            return None
+
+        with self._lock:
+            shutil.copyfile(video_path, path)
+            self._index[key] = dict(
+                file=fname, size=os.path.getsize(path), last_used=time.time()
+            )
+            self._index.move_to_end(key)
+            self._evict()
+            self._save_index()
+
+        return path
+
+    def clear(self) -> None:
+        with self._lock:
+            for entry in self._index.values():
+                self._remove_file(entry["file"])
+            self._index.clear()
+            self._save_index()
+
+    def close(self) -> None:
+        """
+        Writes the access times of the hits since the last put
+        """
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def _evict(self) -> None:
+        size = self.size
+        while self._index and size > self.max_bytes:
+            _, entry = self._index.popitem(last=False)
+            self._remove_file(entry["file"])
+            size -= entry["size"]
+
+    def _remove_file(self, fname: str) -> None:
+        try:
+            os.remove(os.path.join(self.cache_dir, fname))
+        except FileNotFoundError:
+            pass
+
+    def _load_index(self) -> None:
+        try:
+            with open(os.path.join(self.cache_dir, self.INDEX_FILE)) as fp:
+                entries = json.load(fp)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+
+        for key, entry in sorted(entries.items(), key=lambda item: item[1]["last_used"]):
+            self._index[key] = entry
+
+    def _save_index(self) -> None:
+        # write then rename so a crash never leaves a broken index
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        with open(path + ".tmp", "w") as fp:
+            json.dump(self._index, fp)
+        os.replace(path + ".tmp", path)
+        self._dirty = False
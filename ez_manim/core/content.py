@@ -17,6 +17,15 @@ WELCOME_MESSAGE = """
 you can start now, happy animating!
 """
 
+JOBS_HELP = """
+**background mode**: prompts and renders run in the background, keep typing while they finish
+
+- `/jobs` list the jobs
+- `/cancel <id>` cancel a job, `/cancel` cancels every running job
+
+a new render supersedes the one still running
+"""
+
 USER_PROMPT = "[bold yellow]user: "
 ASSISTANT_SUCCESS_PROMPT = "[bold green]assistant: "
 ASSISTANT_ERROR_PROMPT = "[bold red]assistant: "
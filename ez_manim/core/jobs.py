@@ -0,0 +1,160 @@
+import time
+import itertools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import *
+
+
+class Job:
+    """
+    A task running in the background, cancellable through its `cancel` event
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, job_id: int, kind: str, description: str = "", key: str = None) -> None:
+        self.id = job_id
+        self.kind = kind
+        self.description = description
+
+        # a newer job with the same key supersedes this one
+        self.key = key
+
+        self.status: str = self.QUEUED
+        self.cancel: threading.Event = threading.Event()
+        self.future: Future = None
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+        self.created: float = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in (self.QUEUED, self.RUNNING)
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def __repr__(self) -> str:
+        return f"Job({self.id}, {self.kind}, {self.status})"
+
+
+class JobQueue:
+    """
+    Runs jobs in background thread pools, one pool per kind of job;
+    `on_done(job)` is called from the worker thread when a job finishes
+    """
+
+    def __init__(
+            self,
+            workers: Dict[str, int] = None,
+            on_done: Callable[[Job], None] = None,
+            keep_finished: int = None
+        ) -> None:
+        # llm calls run one at a time to keep the chat history in order
+        workers = workers or {"llm": 1, "render": 1}
+
+        self._pools: Dict[str, ThreadPoolExecutor] = {
+            kind: ThreadPoolExecutor(max_workers=count, thread_name_prefix=f"ez-manim-{kind}")
+            for kind, count in workers.items()
+        }
+        self._jobs: Dict[int, Job] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.on_done = on_done
+
+        # finished jobs are forgotten beyond this many, the oldest first
+        self.keep_finished = keep_finished
+
+    def submit(
+            self,
+            kind: str,
+            func: Callable[..., Any],
+            *args,
+            description: str = "",
+            key: str = None,
+            **kwargs
+        ) -> Job:
+        """
+        Runs `func(*args, cancel=job.cancel, **kwargs)` in the background,
+        cancels the active jobs with the same `key`
+        """
+        with self._lock:
+            job = Job(next(self._ids), kind, description, key)
+            if key is not None:
+                for other in self._jobs.values():
+                    if other.key == key and other.active:
+                        self._cancel(other)
+            self._jobs[job.id] = job
+            if self.keep_finished is not None:
+                self._forget_finished()
+
+        job.future = self._pools[kind].submit(self._run, job, func, *args, **kwargs)
+        return job
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        Cancels the job, returns False if it is unknown or already finished
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not job.active:
+                return False
+            self._cancel(job)
+            return True
+
+    def jobs(self, active_only: bool = False) -> List[Job]:
+        with self._lock:
+            return [job for job in self._jobs.values() if job.active or not active_only]
+
+    def shutdown(self, cancel: bool = True, wait: bool = False) -> None:
+        """
+        Stops the pools, with `wait` returns once the running jobs have finished
+        """
+        if cancel:
+            for job in self.jobs(active_only=True):
+                self.cancel(job.id)
+        for pool in self._pools.values():
+            pool.shutdown(wait=wait, cancel_futures=cancel)
+
+    def _forget_finished(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+    def _cancel(self, job: Job) -> None:
+        job.cancel.set()
+        if job.future is not None and job.future.cancel():
+            # never started
+            job.status = Job.CANCELLED
+
+    def _run(self, job: Job, func: Callable[..., Any], *args, **kwargs) -> Any:
+        if job.cancel.is_set():
+            job.status = Job.CANCELLED
+            return None
+
+        job.status = Job.RUNNING
+        job.started = time.time()
+
+        try:
+            job.result = func(*args, cancel=job.cancel, **kwargs)
+            job.status = Job.CANCELLED if job.cancel.is_set() else Job.DONE
+        except Exception as e:
+            job.error = e
+            job.status = Job.FAILED
+        finally:
+            job.finished = time.time()
+
+        if self.on_done is not None:
+            self.on_done(job)
+
+        return job.result
@@ -1,54 +1,722 @@
 import os
 import re
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import threading
 import subprocess
-from typing import Tuple
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import *
+
+from .analyzer import CodeAnalysis, analyze_code
+from .cache import RenderCache
+from .watchdog import CANCELLED, LIMIT_EXCEEDED, LimitExceeded, LimitMessage, RenderScheduler
+from .workers import QUALITY_DIRS, RenderWorkerPool
+from .workspace import MediaGC, atomic_write, new_workspace, touch
+from ..utils import tracer
+
+
+# manim's log lines for an animation found in, or added to, the partial movie cache
+REUSED_PATTERN = re.compile(r"Animation\s+(\d+)\s*:\s*Using\s+cached\s+data")
+RENDERED_PATTERN = re.compile(r"Animation\s+(\d+)\s*:\s*Partial\s+movie\s+file\s+written")
+
+# manim's progress bar of the animation being rendered, e.g. "Animation 2: Create(Circle):  47%|"
+PROGRESS_PATTERN = re.compile(r"Animation\s+(\d+)\s*:.*?(\d+)%\|")
+
+
+@dataclass
+class SegmentStats:
+    """
+    Which animations of a render came from manim's partial movie cache
+    """
+    reused: List[int]
+    rendered: List[int]
+
+    @property
+    def total(self) -> int:
+        return len(self.reused) + len(self.rendered)
+
+    def __str__(self) -> str:
+        return f"{len(self.reused)}/{self.total} animations reused"
+
+
+@dataclass
+class RenderProgress:
+    """
+    Where a running render is
+    """
+    animation: int      # index of the animation being rendered
+    total: int          # animations of the scene, from the static analysis
+    fraction: float     # of the current animation
+
+    @property
+    def completed(self) -> float:
+        return min(self.animation + self.fraction, self.total)
+
+
+class OutputParser:
+    """
+    Follows manim's output line by line: progress through the animations,
+    and which ones came from the partial movie cache
+    """
+
+    def __init__(self, total: int = 0) -> None:
+        # a loop plays more animations than the code shows, the total grows with them
+        self.total = total
+        self.reused: Set[int] = set()
+        self.rendered: Set[int] = set()
+        self.progress: Optional[RenderProgress] = None
+
+    def feed(self, line: str) -> Optional[RenderProgress]:
+        """
+        The new progress if the line moved it
+        """
+        match = REUSED_PATTERN.search(line)
+        if match is not None:
+            self.reused.add(int(match.group(1)))
+            return self._update(int(match.group(1)) + 1, 0.0)
+
+        match = RENDERED_PATTERN.search(line)
+        if match is not None:
+            self.rendered.add(int(match.group(1)))
+            return self._update(int(match.group(1)) + 1, 0.0)
+
+        match = PROGRESS_PATTERN.search(line)
+        if match is not None:
+            return self._update(int(match.group(1)), int(match.group(2)) / 100)
+
+        return None
+
+    def _update(self, animation: int, fraction: float) -> RenderProgress:
+        self.total = max(self.total, animation + (fraction > 0))
+        self.progress = RenderProgress(animation, self.total, fraction)
+        return self.progress
+
+    def segments(self) -> Optional[SegmentStats]:
+        if not self.reused and not self.rendered:
+            return None
+        return SegmentStats(sorted(self.reused), sorted(self.rendered - self.reused))
+
+
+@dataclass
+class RenderResult:
+    """
+    Result of rendering one scene
+    """
+    scene_name: str
+    response: str
+    returncode: int
+    seconds: float
+    output: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+def media_dir(fpath: str) -> str:
+    """
+    manim's media directory for a code file, next to it
+    """
+    return os.path.join(os.path.dirname(fpath), "media")
+
+
+def uses_this_interpreter(command: List[str]) -> bool:
+    """
+    Whether the command runs in this python, or is a script installed next to it
+    """
+    program = shutil.which(command[0]) or command[0]
+    return os.path.realpath(program) == os.path.realpath(sys.executable) or \
+        os.path.dirname(os.path.abspath(program)) == os.path.dirname(os.path.abspath(sys.executable))
+
+
+def open_media_file(path: str) -> None:
+    """
+    Opens the video with the default player of the platform
+    """
+    if sys.platform == "win32":
+        os.startfile(path)
+    else:
+        opener = "open" if sys.platform == "darwin" else "xdg-open"
+        subprocess.Popen([opener, path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
 
 class MWrapper:
     def __init__(
         self, 
         code_file_name = "trialCode",
-        quality: str = "h"
+        quality: str = "h",
+        preview: bool = True,
+        backend: str = "subprocess",
+        num_workers: int = 1,
+        cache: RenderCache = None,
+        preview_quality: str = "l",
+        preview_last_frame: bool = False,
+        max_parallel: int = None,
+        manim_command: List[str] = None,
+        cwd: str = None,
+        isolate_jobs: bool = False,
+        workspace_root: str = None,
+        media_gc: MediaGC = None,
+        max_media_bytes: int = 2 * 1024 ** 3,
+        max_media_age: float = 7 * 24 * 3600.0,
+        reuse_segments: bool = True,
+        scheduler: RenderScheduler = None
     ) -> None:
         self.code_file_name = code_file_name
         self.quality = quality
+        self.preview = preview
         self.scene_to_render = None
 
-        self.cwd = os.getcwd()
-        self.scene_pattern = re.compile(r"class\s+(.+?)\(Scene\):")
+        # static analysis of the last code, before any render
+        self.analysis: CodeAnalysis = None
+
+        # the last code written for rendering, what edits apply to
+        self.last_code: Optional[str] = None
+
+        # where manim runs, and the code file is written unless `isolate_jobs`
+        self.cwd = cwd or os.getcwd()
 
-    def render_from_string(self, code: str) -> Tuple[str, bool]:
+        # with `isolate_jobs` every render gets its own directory under `workspace_root`
+        # with the code, the media and the logs, so concurrent renders don't overwrite
+        # each other; the server turns it on, the repl keeps everything in `cwd`
+        self.isolate_jobs = isolate_jobs
+        self.workspace_root = workspace_root or os.path.join(self.cwd, "renders")
+
+        # the directory and code file of the last render
+        self.workspace: Optional[str] = None
+        self.code_path: Optional[str] = None
+
+        # keeps the workspaces within a disk quota and a maximum age,
+        # a shared collector is only given our root, an own one is started here
+        self._own_gc = media_gc is None and isolate_jobs
+        self.media_gc = media_gc
+        if self._own_gc:
+            self.media_gc = MediaGC([self.workspace_root], max_media_bytes, max_media_age)
+            self.media_gc.start()
+        elif media_gc is not None:
+            media_gc.add_root(self.workspace_root)
+
+        # manim caches every animation as a partial movie keyed by its hash, in a
+        # directory named after the module and scene; one stable directory per quality
+        # and scene for all the renders of this wrapper lets an edited scene reuse its
+        # unchanged animations, while scenes rendered side by side keep their own files
+        self.reuse_segments = reuse_segments
+        self.partials_dir = os.path.join(
+            self.workspace_root if isolate_jobs else os.path.join(self.cwd, "media"),
+            "partial_movies"
+        )
+        if reuse_segments:
+            self._pin(self.partials_dir)
+
+        # reused and rendered animations of the last manim cli render
+        self.last_segments: Optional[SegmentStats] = None
+
+        # "subprocess" runs the manim cli for every render,
+        # "worker" keeps warm processes with manim imported and falls back to the cli
+        if backend not in ("subprocess", "worker"):
+            raise ValueError(f"Unknown render backend {backend}")
+        self.backend = backend
+        self.workers = RenderWorkerPool(
+            cwd=self.cwd,
+            num_workers=num_workers,
+            partials_dir=self.partials_dir if reuse_segments else None
+        ) if backend == "worker" else None
+
+        # pools that failed while other renders may still be using them, closed with the wrapper
+        self._failed_workers: List[RenderWorkerPool] = []
+        self._workers_lock = threading.Lock()
+
+        # rendered videos by normalized code, scene, quality and manim version
+        self.cache = cache
+
+        # progressive mode: a fast pass at `preview_quality` (or only the last frame),
+        # then `quality` in the background
+        self.preview_quality = preview_quality
+        self.preview_last_frame = preview_last_frame
+        self._background: Optional[threading.Thread] = None
+        self._background_cancel: threading.Event = threading.Event()
+
+        # scenes rendered at once by `render_all_from_string`
+        self.max_parallel = max_parallel or os.cpu_count() or 1
+
+        # the manim cli, replaceable by a stub for benchmarks
+        self.manim_command = manim_command or ["manim"]
+
+        # what manim can import is only known when it runs in this interpreter,
+        # not when it comes from pipx, another venv or a container
+        self.check_imports = uses_this_interpreter(self.manim_command)
+
+        # bounds the manim processes running at once and kills the ones that exceed
+        # their time or memory limits; shared by wrappers that render side by side
+        self.scheduler = scheduler or RenderScheduler()
+
+    def render_from_string(
+            self,
+            code: str,
+            cancel: threading.Event = None,
+            on_progress: Callable[[RenderProgress], None] = None
+        ) -> Tuple[str, bool]:
         """
-        Return 0 if successful, else 1
+        Return 0 if successful, else 1;
+        setting `cancel` kills a manim subprocess, a warm worker finishes its render.
+        `on_progress` is called as a manim subprocess gets through the animations
         """
-        # overwrite the final code file
-        fname = f"{self.code_file_name}.py"
-        fpath: str = os.path.join(self.cwd, fname)
+        self.cancel_background()
 
-        with open(fpath, "w") as fp:
-            fp.write(code)
+        fpath, scene, error = self._prepare(code)
+        if error is not None:
+            return (error, 1)
 
-        # scene to render
-        scene: str = self.scene_pattern.search(code).group(1)
+        key = self.cache.key(code, scene, self.quality) if self.cache is not None else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return self._use_cached(cached, fpath, scene)
         
-        response, err = self._render_from_file(fpath=fpath, scene_name=scene)
+        response, err = self._render_from_file(
+            fpath=fpath, scene_name=scene, cancel=cancel, on_progress=on_progress
+        )
+        self._store(key, fpath, scene, err)
+
         return response, err
+
+    def render_progressive(
+            self, code: str, on_done: Callable[[str, int], None] = None
+        ) -> Tuple[str, bool]:
+        """
+        Renders a fast preview and returns, then renders `quality` in the background;
+        `on_done(response, returncode)` is called when the background render finishes.
+        A newer render cancels the background one.
+        """
+        self.cancel_background()
+
+        fpath, scene, error = self._prepare(code)
+        if error is not None:
+            return (error, 1)
+
+        key = self.cache.key(code, scene, self.quality) if self.cache is not None else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return self._use_cached(cached, fpath, scene)
+
+        if not self.preview_last_frame and self.preview_quality == self.quality:
+            response, err = self._render_from_file(fpath=fpath, scene_name=scene)
+            self._store(key, fpath, scene, err)
+            return response, err
+
+        response, err = self._render_from_file(
+            fpath=fpath,
+            scene_name=scene,
+            quality=self.preview_quality,
+            last_frame=self.preview_last_frame
+        )
+        if err:
+            return response, err
+
+        cancel = threading.Event()
+
+        def background():
+            with tracer.span("render.background", scene=scene, quality=self.quality):
+                response, err = self._render_subprocess(
+                    fpath=fpath, scene_name=scene, preview=False, cancel=cancel
+                )
+            if err == CANCELLED:
+                return
+            self._store(key, fpath, scene, err)
+            if not err:
+                response = f"{response} {self.output_path(fpath, scene)}"
+            if on_done is not None:
+                on_done(response, err)
+
+        self._background_cancel = cancel
+        self._background = threading.Thread(target=background, daemon=True)
+        self._background.start()
+
+        return ("Preview ready!", err)
+
+    def render_all_from_string(
+            self, code: str, concat: bool = False
+        ) -> Tuple[List[RenderResult], Optional[RenderResult]]:
+        """
+        Renders every scene in the code concurrently, at most `max_parallel` at once;
+        returns the results in source order and, with `concat`, the concatenated video
+        """
+        self.cancel_background()
+
+        fpath, _, error = self._prepare(code)
+        if error is not None:
+            return ([RenderResult(None, error, 1, 0.0)], None)
+
+        scenes = self.analysis.scene_names
+
+        def render(scene: str) -> RenderResult:
+            start = time.perf_counter()
+            output = self.output_path(fpath, scene)
+
+            key = self.cache.key(code, scene, self.quality) if self.cache is not None else None
+            cached = self.cache.get(key) if key is not None else None
+
+            if cached is not None:
+                os.makedirs(os.path.dirname(output), exist_ok=True)
+                shutil.copyfile(cached, output)
+                response, err = ("Success! (cached)", 0)
+            else:
+                response, err = self._render_from_file(
+                    fpath=fpath, scene_name=scene, preview=False
+                )
+                self._store(key, fpath, scene, err)
+
+            return RenderResult(
+                scene, response, err, time.perf_counter() - start, None if err else output
+            )
+
+        workers = min(len(scenes), self.max_parallel)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(render, scenes))
+
+        combined = None
+        if concat and all(result.ok for result in results):
+            combined = self._concat(fpath, [result.output for result in results])
+            if combined.ok and self.preview:
+                open_media_file(combined.output)
+        elif self.preview and len(results) == 1 and results[0].ok:
+            open_media_file(results[0].output)
+
+        return (results, combined)
+
+    def render_candidates(
+            self, codes: List[str], quality: str = "l"
+        ) -> Tuple[Optional[int], List[Optional[RenderResult]]]:
+        """
+        Renders the first scene of every candidate concurrently at `quality`, without preview;
+        returns the index of the first one that rendered cleanly, the others are cancelled.
+        The candidate workspaces are removed afterwards.
+        """
+        self.cancel_background()
+
+        cancel = threading.Event()
+        results: List[Optional[RenderResult]] = [None] * len(codes)
+        winner: Optional[int] = None
+
+        fpaths = []
+        for i, code in enumerate(codes):
+            workspace = new_workspace(self.workspace_root) if self.isolate_jobs else self.cwd
+            self._pin(workspace)
+            fpath = os.path.join(workspace, f"{self.code_file_name}_candidate{i}.py")
+            atomic_write(fpath, code)
+            fpaths.append(fpath)
+
+        def render(i: int) -> RenderResult:
+            start = time.perf_counter()
+            scene = analyze_code(codes[i], check_imports=False).scene_names[0]
+            if cancel.is_set():
+                return RenderResult(scene, "Render cancelled", CANCELLED, 0.0)
+
+            with tracer.span("render.candidate", candidate=i, quality=quality):
+                # candidates of one scene render at once, they can't share its partial movies
+                response, err = self._render_subprocess(
+                    fpath=fpaths[i], scene_name=scene, quality=quality, preview=False,
+                    cancel=cancel, reuse_segments=False
+                )
+            output = None if err else self.output_path(fpaths[i], scene, quality)
+            return RenderResult(scene, response, err, time.perf_counter() - start, output)
+
+        try:
+            with ThreadPoolExecutor(max_workers=min(len(codes), self.max_parallel)) as pool:
+                futures = {pool.submit(render, i): i for i in range(len(codes))}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    results[i] = future.result()
+                    if results[i].ok and winner is None:
+                        winner = i
+                        cancel.set()
+        finally:
+            # only the winner matters and it is rendered again at full quality
+            for fpath in fpaths:
+                workspace = os.path.dirname(fpath)
+                self._unpin(workspace)
+                if self.isolate_jobs:
+                    shutil.rmtree(workspace, ignore_errors=True)
+                else:
+                    # manim names its output directories after the module; without
+                    # `reuse_segments` the partial movies are under videos/ as well
+                    module = os.path.splitext(os.path.basename(fpath))[0]
+                    for kind in ("videos", "images"):
+                        shutil.rmtree(os.path.join(media_dir(fpath), kind, module), ignore_errors=True)
+                    os.remove(fpath)
+
+        return (winner, results)
+
+    def _concat(self, fpath: str, videos: List[str]) -> RenderResult:
+        """
+        Joins the videos in order with ffmpeg's concat demuxer
+        """
+        start = time.perf_counter()
+        name = f"{os.path.splitext(os.path.basename(fpath))[0]}_all"
+        output = os.path.join(os.path.dirname(videos[0]), f"{name}.mp4")
+
+        if shutil.which("ffmpeg") is None:
+            return RenderResult(name, "ffmpeg not found, can't concatenate the scenes", 1, 0.0)
+
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as fp:
+            for video in videos:
+                fp.write(f"file '{os.path.abspath(video)}'\n")
+            list_file = fp.name
+
+        try:
+            result = subprocess.run([
+                "ffmpeg", "-y", "-loglevel", "error",
+                "-f", "concat", "-safe", "0", "-i", list_file,
+                "-c", "copy", output,
+            ], capture_output=True, text=True)
+        finally:
+            os.remove(list_file)
+
+        seconds = time.perf_counter() - start
+        if result.returncode != 0:
+            return RenderResult(name, result.stderr, result.returncode, seconds)
+
+        return RenderResult(name, "Success!", 0, seconds, output)
+
+    def cancel_background(self) -> None:
+        """
+        Cancels the background render of the previous code, if any
+        """
+        self._background_cancel.set()
+        if self._background is not None:
+            self._background.join()
+            self._background = None
+
+    def output_path(self, fpath: str, scene_name: str, quality: str = None) -> str:
+        """
+        Where manim writes the video of the scene
+        """
+        module_name = os.path.splitext(os.path.basename(fpath))[0]
+        return os.path.join(
+            media_dir(fpath), "videos", module_name,
+            QUALITY_DIRS[quality or self.quality], f"{scene_name}.mp4"
+        )
+
+    def _prepare(self, code: str) -> Tuple[str, str, Optional[str]]:
+        """
+        Writes the code file and analyzes it, returns (path, scene, error)
+        """
+        # a fresh workspace, or overwrite the code file in cwd
+        workspace = new_workspace(self.workspace_root) if self.isolate_jobs else self.cwd
+        fpath: str = os.path.join(workspace, f"{self.code_file_name}.py")
+
+        atomic_write(fpath, code)
+
+        # the latest output stays until the next render replaces it
+        self._pin(workspace)
+        if self.workspace is not None:
+            self._unpin(self.workspace)
+        self.workspace = workspace
+        self.code_path = fpath
+
+        # fail fast on broken code instead of launching manim
+        self.analysis = analyze_code(code, check_imports=self.check_imports)
+        if not self.analysis.ok:
+            return (fpath, None, "\n".join(self.analysis.errors))
+        # only code that parses is edited by the next request
+        self.last_code = code
+
+        # scene to render
+        scene: str = self.analysis.scene_names[0]
+        self.scene_to_render = scene
+
+        return (fpath, scene, None)
+
+    def _pin(self, workspace: str) -> None:
+        if self.media_gc is not None and self.isolate_jobs:
+            self.media_gc.pin(workspace)
+
+    def _unpin(self, workspace: str) -> None:
+        if self.media_gc is not None and self.isolate_jobs:
+            touch(workspace)
+            self.media_gc.unpin(workspace)
+
+    def _store(self, key: Optional[str], fpath: str, scene_name: str, err: int) -> None:
+        output = self.output_path(fpath, scene_name)
+        if key is not None and not err and os.path.exists(output):
+            self.cache.put(key, output)
+
+    def _use_cached(self, cached: str, fpath: str, scene_name: str) -> Tuple[str, bool]:
+        """
+        Puts the cached video where manim would have written it
+        """
+        output = self.output_path(fpath, scene_name)
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        shutil.copyfile(cached, output)
+
+        if self.preview:
+            open_media_file(output)
+
+        return ("Success! (cached)", 0)
     
-    def _render_from_file(self, fpath="", scene_name="") -> Tuple[str, bool]:
+    def _render_from_file(
+            self,
+            fpath="",
+            scene_name="",
+            quality: str = None,
+            last_frame: bool = False,
+            preview: bool = None,
+            cancel: threading.Event = None,
+            on_progress: Callable[[RenderProgress], None] = None
+        ) -> Tuple[str, bool]:
+        """
+        Render on a warm worker if enabled, else in a manim subprocess
+        """
+        preview = self.preview if preview is None else preview
+        quality = quality or self.quality
+
+        # sibling scene threads may drop the pool meanwhile, keep the one this render uses
+        workers = self.workers
+        if workers is not None and not last_frame:
+            try:
+                start = time.perf_counter()
+                timeout = self.scheduler.limits.wall_seconds
+                with tracer.span("render", backend="worker", scene=scene_name, quality=quality):
+                    response, err = workers.render(
+                        fpath, scene_name, quality, preview, timeout=timeout
+                    )
+                if err == LIMIT_EXCEEDED:
+                    response = LimitMessage(
+                        LimitExceeded("wall", timeout, time.perf_counter() - start)
+                    )
+                return response, err
+            except RuntimeError as e:
+                logging.error(f"{e}, falling back to the manim cli")
+                self._drop_workers(workers)
+
+        with tracer.span("render", backend="subprocess", scene=scene_name, quality=quality):
+            return self._render_subprocess(
+                fpath=fpath,
+                scene_name=scene_name,
+                quality=quality,
+                preview=preview,
+                last_frame=last_frame,
+                cancel=cancel,
+                on_progress=on_progress
+            )
+
+    def _render_subprocess(
+            self,
+            fpath="",
+            scene_name="",
+            quality: str = None,
+            preview: bool = None,
+            last_frame: bool = False,
+            cancel: threading.Event = None,
+            on_progress: Callable[[RenderProgress], None] = None,
+            reuse_segments: bool = True
+        ) -> Tuple[str, bool]:
         """
-        Run subprocess of manim render
+        Run subprocess of manim render through the scheduler,
+        killed as soon as `cancel` is set or it exceeds a limit;
+        its output is parsed as it is written
         """
+        quality = quality or self.quality
+        preview = self.preview if preview is None else preview
+
+        scene = next((info for info in self.analysis.scenes if info.name == scene_name), None) \
+            if self.analysis is not None else None
+        parser = OutputParser(scene.num_animations if scene is not None else 0)
+        start = time.perf_counter()
+
+        def on_line(line: str):
+            first = parser.progress is None
+            progress = parser.feed(line)
+            if progress is None:
+                return
+            if first:
+                # imports, scene setup and latex before the first animation
+                tracer.record("render.startup", time.perf_counter() - start, scene=scene_name)
+            if on_progress is not None:
+                on_progress(progress)
 
-        result = subprocess.run([
-            "manim",
-            f"-pq{self.quality}",
-            # f"--media_dir {self.cwd}",
-            # f"--log_dir {self.cwd}",
+        config = []
+        if self.reuse_segments and reuse_segments and not last_frame:
+            config = ["--config_file", self._partials_config(quality)]
+
+        returncode, stdout, stderr, exceeded = self.scheduler.run([
+            *self.manim_command,
+            f"-{'p' if preview else ''}{'s' if last_frame else ''}q{quality}",
+            "--media_dir", media_dir(fpath),
+            "--log_dir", os.path.join(os.path.dirname(fpath), "logs"),
+            *config,
             f"{fpath}",
             f"{scene_name}",
-        ], capture_output=True, text=True)
+        ],
+            cwd=self.cwd,
+            # manim's rich log wraps at the terminal width, keep its lines whole
+            env={**os.environ, "COLUMNS": "1000"},
+            cancel=cancel,
+            on_line=on_line
+        )
+
+        if returncode == CANCELLED:
+            return ("Render cancelled", CANCELLED)
+        if returncode == LIMIT_EXCEEDED:
+            # the response carries the limit, see `LimitMessage`
+            return (LimitMessage(exceeded), LIMIT_EXCEEDED)
+        if returncode != 0:
+            return (f"{stderr}", returncode)
+
+        # from every line, the returned output is only its tail
+        self.last_segments = parser.segments()
+        if self.last_segments is None:
+            return ("Success!", returncode)
+
+        tracer.record(
+            "render.segments", 0.0,
+            reused=len(self.last_segments.reused), rendered=len(self.last_segments.rendered)
+        )
+        return (f"Success! ({self.last_segments})", returncode)
 
-        if result.returncode == 0:
-            return ("Success!", result.returncode)
-        else:
-            return (f"{result.stderr}", result.returncode)
+    def _partials_config(self, quality: str) -> str:
+        """
+        manim config file pointing the partial movies of `quality` to the stable directory,
+        manim fills in the scene name
+        """
+        path = os.path.join(self.partials_dir, f"{QUALITY_DIRS[quality]}.cfg")
+        if not os.path.exists(path):
+            os.makedirs(self.partials_dir, exist_ok=True)
+            partials = os.path.join(self.partials_dir, QUALITY_DIRS[quality], "{scene_name}")
+            atomic_write(path, f"[CLI]\npartial_movie_dir = {partials}\n")
+        return path
+
+    def _drop_workers(self, workers: RenderWorkerPool) -> None:
+        """
+        Later renders use the manim cli; the pool is only closed with the wrapper,
+        renders of sibling threads may still be running on it
+        """
+        with self._workers_lock:
+            if self.workers is workers:
+                self.workers = None
+                self._failed_workers.append(workers)
+
+    def close(self) -> None:
+        """
+        Stops the background render and the render workers, later renders use the manim cli
+        """
+        self.cancel_background()
+        with self._workers_lock:
+            pools = self._failed_workers + ([self.workers] if self.workers is not None else [])
+            self.workers = None
+            self._failed_workers = []
+        for pool in pools:
+            pool.close()
+        if self.cache is not None:
+            self.cache.close()
+        if self.reuse_segments:
+            self._unpin(self.partials_dir)
+        if self._own_gc:
+            self.media_gc.stop()
+        elif self.media_gc is not None:
+            self.media_gc.remove_root(self.workspace_root)
@@ -0,0 +1,101 @@
+import re
+from typing import *
+
+from .analyzer import analyze_code
+
+
+EDIT_BLOCK_PATTERN = re.compile(
+    r"<{5,9} SEARCH\n(?P<search>.*?)\n?={5,9}\n(?P<replace>.*?)\n?>{5,9} REPLACE",
+    re.DOTALL
+)
+
+
+class PatchError(ValueError):
+    """
+    The edits can't be applied to the code, or the result doesn't validate
+    """
+
+
+def parse_edit_blocks(response: str) -> List[Tuple[str, str]]:
+    """
+    (search, replace) pairs of the SEARCH/REPLACE blocks in the response
+    """
+    blocks = [(match.group("search"), match.group("replace"))
+              for match in EDIT_BLOCK_PATTERN.finditer(response)]
+    if not blocks:
+        raise PatchError("no SEARCH/REPLACE blocks in the response")
+    return blocks
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip())
+
+
+def _find_lines(code: str, search: str) -> Optional[Tuple[int, int, int]]:
+    """
+    Span of the lines matching `search` when surrounding whitespace is ignored,
+    and how much deeper they are indented than in `search`
+    """
+    lines = code.splitlines(keepends=True)
+    wanted = search.splitlines()
+    while wanted and not wanted[-1].strip():
+        wanted.pop()
+    while wanted and not wanted[0].strip():
+        wanted.pop(0)
+    if not wanted:
+        return None
+
+    found = None
+    for start in range(len(lines) - len(wanted) + 1):
+        if all(lines[start + i].strip() == wanted[i].strip() for i in range(len(wanted))):
+            if found is not None:
+                # ambiguous
+                return None
+            found = start
+
+    if found is None:
+        return None
+
+    begin = sum(len(line) for line in lines[:found])
+    end = begin + sum(len(line) for line in lines[found:found + len(wanted)])
+    return begin, end, _indent(lines[found]) - _indent(wanted[0])
+
+
+def _reindent(text: str, delta: int) -> str:
+    lines = []
+    for line in text.splitlines():
+        if delta > 0 and line.strip():
+            line = " " * delta + line
+        elif delta < 0:
+            line = line[min(-delta, _indent(line)):]
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def apply_edits(code: str, blocks: List[Tuple[str, str]], validate: bool = True) -> str:
+    """
+    Applies the (search, replace) blocks in order, every search must match exactly once;
+    with `validate` the result must parse and contain a scene
+    """
+    for search, replace in blocks:
+        if not search.strip():
+            raise PatchError("empty SEARCH block")
+
+        # whole lines, the model often gets their indentation slightly wrong
+        span = _find_lines(code, search)
+        if span is None:
+            raise PatchError(f"SEARCH block not found exactly once in the code:\n{search}")
+
+        begin, end, delta = span
+        replacement = _reindent(replace, delta)
+        if replacement and code[begin:end].endswith("\n"):
+            replacement += "\n"
+        code = code[:begin] + replacement + code[end:]
+
+    if validate:
+        # the imports are checked with the rest of the code before rendering
+        analysis = analyze_code(code, check_imports=False)
+        if not analysis.ok:
+            raise PatchError("patched code is invalid: " + "; ".join(analysis.errors))
+
+    return code
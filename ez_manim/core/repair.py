@@ -0,0 +1,99 @@
+import os
+import re
+from typing import *
+
+from ..utils import num_tokens_from_messages
+
+
+# `File "/path/trialCode.py", line 12, in construct` and rich's `/path/trialCode.py:12 in construct`
+FRAME_PATTERNS = [
+    re.compile(r'File "(?P<file>[^"]+)", line (?P<line>\d+)(?:, in (?P<func>\S+))?'),
+    re.compile(r'(?P<file>[^\s│]+\.py):(?P<line>\d+) in (?P<func>\S+)'),
+]
+EXCEPTION_PATTERN = re.compile(
+    r"^(?P<name>[A-Za-z_][\w.]*(?:Error|Exception|Exit|Interrupt))(?::\s*(?P<message>.*))?$"
+)
+ANALYSIS_LINE_PATTERN = re.compile(r"\(line (?P<line>\d+)\)$")
+
+REPAIR_PROMPT = """\
+The code has an error, fix it and provide the updated code.
+
+{summary}"""
+
+
+def _clean(line: str) -> str:
+    # rich draws tracebacks in boxes
+    return line.strip().strip("│╭╮╰╯─|").strip()
+
+
+def summarize_render_error(
+        error: str,
+        code: str,
+        code_file: str = None,
+        max_tokens: int = 256
+    ) -> str:
+    """
+    Compact summary of a render error for the llm:
+    the last traceback frame, the exception and the offending source line
+    """
+    lines = [_clean(line) for line in error.splitlines()]
+    lines = [line for line in lines if line]
+
+    frame, lineno = None, None
+    for line in lines:
+        for pattern in FRAME_PATTERNS:
+            match = pattern.search(line)
+            if match is None:
+                continue
+            in_code = code_file is None or \
+                os.path.basename(match.group("file")) == os.path.basename(code_file)
+            # prefer the last frame in the generated code
+            if in_code or lineno is None:
+                frame = line
+                lineno = int(match.group("line")) if in_code else None
+            break
+
+    exception = None
+    for line in reversed(lines):
+        if EXCEPTION_PATTERN.match(line):
+            exception = line
+            break
+
+    if exception is not None and lineno is None:
+        # errors from the static analysis carry their line number
+        match = ANALYSIS_LINE_PATTERN.search(exception)
+        if match is not None:
+            lineno = int(match.group("line"))
+
+    parts: List[str] = []
+    if exception is not None:
+        parts.append(exception)
+    if frame is not None:
+        parts.append(f"in {frame}")
+
+    source = code.splitlines()
+    if lineno is not None and 0 < lineno <= len(source):
+        parts.append(f"offending line {lineno}: {source[lineno - 1].strip()}")
+
+    if exception is None:
+        # unknown format, keep the tail of the output
+        parts.extend(lines[-10:])
+
+    return _fit(parts, max_tokens)
+
+
+def _fit(parts: List[str], max_tokens: int) -> str:
+    """
+    Drops parts from the end, then truncates the first, until the summary fits `max_tokens`
+    """
+    def count(text: str) -> int:
+        return num_tokens_from_messages([{"role": "user", "content": text}])
+
+    while len(parts) > 1 and count("\n".join(parts)) > max_tokens:
+        parts = parts[:-1]
+
+    summary = "\n".join(parts)
+    while summary and count(summary) > max_tokens:
+        summary = summary[:len(summary) * 3 // 4]
+
+    return summary
@@ -0,0 +1,320 @@
+import os
+import re
+import time
+import signal
+import logging
+import threading
+import subprocess
+from collections import deque
+from dataclasses import asdict, dataclass
+from multiprocessing.process import BaseProcess
+from typing import *
+
+from ..utils import tracer
+
+try:
+    import resource
+except ImportError:
+    # windows, only the wall clock limit applies
+    resource = None
+
+
+# returncode of a render that was cancelled before it finished
+CANCELLED = -1
+
+# returncode of a render killed for exceeding one of its limits
+LIMIT_EXCEEDED = -2
+
+
+# how long the output of an exited render is read for, shared by both pipes
+PIPE_DRAIN_SECONDS = 0.5
+
+
+# what python and numpy print when RLIMIT_AS refuses an allocation
+MEMORY_ERROR_PATTERN = re.compile(r"MemoryError|Unable to allocate|Cannot allocate memory|std::bad_alloc")
+
+
+@dataclass
+class RenderLimits:
+    """
+    Limits of one render process, None disables a limit;
+    cpu time and address space are rlimits, only enforced on posix
+    """
+    wall_seconds: Optional[float] = 900.0
+    cpu_seconds: Optional[int] = 1800
+    memory_bytes: Optional[int] = 8 * 1024 ** 3
+
+
+@dataclass
+class LimitExceeded:
+    """
+    The limit a killed render ran into
+    """
+    limit: str          # "wall", "cpu" or "memory"
+    value: float        # the limit, in seconds or bytes
+    seconds: float      # wall clock time of the render when it ended
+
+    def __str__(self) -> str:
+        if self.limit == "memory":
+            return (
+                f"Render killed: it used more than the {self.value / 1024 ** 2:.0f} MiB memory limit. "
+                f"Use fewer or simpler mobjects."
+            )
+        what = "wall clock" if self.limit == "wall" else "cpu time"
+        return (
+            f"Render killed: it ran into the {self.value:g}s {what} limit after {self.seconds:.1f}s. "
+            f"Shorten the run_time and wait calls, and make sure every updater stops."
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class LimitMessage(str):
+    """
+    Response of a render killed for a limit: its text, with the `LimitExceeded` attached
+    """
+    limit: LimitExceeded
+
+    def __new__(cls, limit: LimitExceeded, text: str = None) -> "LimitMessage":
+        message = super().__new__(cls, str(limit) if text is None else text)
+        message.limit = limit
+        return message
+
+
+def _set_rlimits(cpu_seconds: Optional[int], memory_bytes: Optional[int], pid: int = 0) -> None:
+    """
+    Applies the limits to the process `pid`, the calling one if 0
+    """
+    limits = []
+    if cpu_seconds is not None:
+        # SIGXCPU at the soft limit, SIGKILL a little later if it is ignored
+        limits.append((resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 5)))
+    if memory_bytes is not None:
+        limits.append((resource.RLIMIT_AS, (memory_bytes, memory_bytes)))
+
+    for which, value in limits:
+        if pid:
+            resource.prlimit(pid, which, value)
+        else:
+            resource.setrlimit(which, value)
+
+
+def kill_group(process: Union[subprocess.Popen, BaseProcess]) -> None:
+    """
+    Kills the process and everything it started (ffmpeg, latex),
+    it must lead its own session or process group
+    """
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class RenderScheduler:
+    """
+    Runs render processes, at most `max_concurrent` at once, each within `limits`;
+    every process leads its own process group, which is killed when a limit is exceeded
+    or the render is cancelled. Share one scheduler to bound the renders of many wrappers.
+    """
+
+    def __init__(
+            self,
+            max_concurrent: int = None,
+            limits: RenderLimits = None,
+            poll_interval: float = 0.2,
+            tail_lines: int = 200
+        ) -> None:
+        self.max_concurrent = max_concurrent or os.cpu_count() or 1
+        self.limits = limits or RenderLimits()
+        self.poll_interval = poll_interval
+
+        # output is read as it is written and only the last lines of each stream are kept,
+        # memory stays the same however much manim logs
+        self.tail_lines = tail_lines
+
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._lock = threading.Lock()
+
+        # renders running and waiting for a slot right now
+        self.running: int = 0
+        self.waiting: int = 0
+
+        # renders killed, by limit
+        self.killed: Dict[str, int] = {}
+
+    def run(
+            self,
+            args: List[str],
+            cwd: str = None,
+            env: Dict[str, str] = None,
+            cancel: threading.Event = None,
+            limits: RenderLimits = None,
+            on_line: Callable[[str], None] = None
+        ) -> Tuple[int, str, str, Optional[LimitExceeded]]:
+        """
+        Runs the command once a slot is free, returns (returncode, stdout, stderr, exceeded limit)
+        with the last `tail_lines` lines of each stream; `on_line` gets every line of both
+        as it is written, one at a time. The returncode is CANCELLED if `cancel` was set,
+        LIMIT_EXCEEDED if a limit was exceeded
+        """
+        limits = limits or self.limits
+
+        if not self._acquire(cancel):
+            return (CANCELLED, "", "", None)
+        try:
+            return self._run(args, cwd, env, cancel, limits, on_line)
+        finally:
+            with self._lock:
+                self.running -= 1
+            self._slots.release()
+
+    def _acquire(self, cancel: Optional[threading.Event]) -> bool:
+        """
+        Waits for a slot, False if cancelled first
+        """
+        with self._lock:
+            self.waiting += 1
+        try:
+            with tracer.span("render.queue"):
+                while not self._slots.acquire(timeout=self.poll_interval):
+                    if cancel is not None and cancel.is_set():
+                        return False
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+        with self._lock:
+            self.running += 1
+        return True
+
+    def _run(
+            self,
+            args: List[str],
+            cwd: Optional[str],
+            env: Optional[Dict[str, str]],
+            cancel: Optional[threading.Event],
+            limits: RenderLimits,
+            on_line: Optional[Callable[[str], None]]
+        ) -> Tuple[int, str, str, Optional[LimitExceeded]]:
+        rlimits = resource is not None and (
+            limits.cpu_seconds is not None or limits.memory_bytes is not None
+        )
+        # prlimit sets the limits from here, preexec_fn is not safe with threads running
+        prlimit = rlimits and hasattr(resource, "prlimit")
+
+        kwargs: Dict[str, Any] = {}
+        if os.name == "posix":
+            kwargs["start_new_session"] = True
+        if rlimits and not prlimit:
+            kwargs["preexec_fn"] = lambda: _set_rlimits(limits.cpu_seconds, limits.memory_bytes)
+
+        start = time.perf_counter()
+        with tracer.span("render.spawn"):
+            process = subprocess.Popen(
+                args, cwd=cwd, env=env,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                **kwargs
+            )
+            if prlimit:
+                try:
+                    _set_rlimits(limits.cpu_seconds, limits.memory_bytes, pid=process.pid)
+                except (OSError, ValueError) as e:
+                    logging.error(f"could not limit the render process: {e}")
+
+        stdout_tail: Deque[str] = deque(maxlen=self.tail_lines)
+        stderr_tail: Deque[str] = deque(maxlen=self.tail_lines)
+
+        # stdout and stderr are read by two threads, `on_line` is called by one at a time;
+        # other renders have their own lock
+        line_lock = threading.Lock()
+        readers = [
+            self._reader(process.stdout, stdout_tail, on_line, line_lock),
+            self._reader(process.stderr, stderr_tail, on_line, line_lock),
+        ]
+
+        exceeded: Optional[LimitExceeded] = None
+        while True:
+            try:
+                process.wait(timeout=self.poll_interval)
+                break
+            except subprocess.TimeoutExpired:
+                elapsed = time.perf_counter() - start
+                if cancel is not None and cancel.is_set():
+                    kill_group(process)
+                    process.wait()
+                    return (CANCELLED, "", "", None)
+                if limits.wall_seconds is not None and elapsed > limits.wall_seconds:
+                    exceeded = LimitExceeded("wall", limits.wall_seconds, elapsed)
+                    kill_group(process)
+                    process.wait()
+                    break
+
+        # what manim wrote is already in the pipes and read at once; a child that
+        # outlives it (the -p video player) holds them open, its reader is left behind
+        deadline = time.perf_counter() + PIPE_DRAIN_SECONDS
+        for reader in readers:
+            reader.join(timeout=max(0.0, deadline - time.perf_counter()))
+        stdout, stderr = "".join(stdout_tail), "".join(stderr_tail)
+
+        seconds = time.perf_counter() - start
+        if exceeded is None:
+            exceeded = self._exceeded(process.returncode, stderr, limits, seconds)
+        if exceeded is None:
+            return (process.returncode, stdout, stderr, None)
+
+        # children of a process killed by an rlimit outlive it
+        kill_group(process)
+        with self._lock:
+            self.killed[exceeded.limit] = self.killed.get(exceeded.limit, 0) + 1
+        tracer.record("render.killed", seconds, limit=exceeded.limit)
+        return (LIMIT_EXCEEDED, stdout, stderr, exceeded)
+
+    def _reader(
+            self,
+            stream: IO[str],
+            tail: Deque[str],
+            on_line: Optional[Callable[[str], None]],
+            line_lock: threading.Lock
+        ) -> threading.Thread:
+        """
+        Reads the stream line by line until it closes, in a daemon thread
+        """
+        def read():
+            with stream:
+                for line in stream:
+                    tail.append(line)
+                    if on_line is not None:
+                        with line_lock:
+                            on_line(line)
+
+        reader = threading.Thread(target=read, daemon=True, name="ez-manim-render-output")
+        reader.start()
+        return reader
+
+    @staticmethod
+    def _exceeded(
+            returncode: int, stderr: str, limits: RenderLimits, seconds: float
+        ) -> Optional[LimitExceeded]:
+        """
+        The rlimit a finished process ran into, if any
+        """
+        if returncode == 0 or resource is None:
+            return None
+        if limits.cpu_seconds is not None and returncode == -signal.SIGXCPU:
+            return LimitExceeded("cpu", limits.cpu_seconds, seconds)
+        if limits.memory_bytes is not None and MEMORY_ERROR_PATTERN.search(stderr or ""):
+            return LimitExceeded("memory", limits.memory_bytes, seconds)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "running": self.running,
+                "waiting": self.waiting,
+                "killed": dict(self.killed),
+            }
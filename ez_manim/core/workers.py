@@ -0,0 +1,252 @@
+import os
+import queue
+import logging
+import threading
+import traceback
+import multiprocessing as mp
+from typing import *
+
+from .watchdog import LIMIT_EXCEEDED, kill_group
+from ..utils import tracer
+
+
+# manim's output folder for every quality flag
+QUALITY_DIRS = {
+    "l": "480p15",
+    "m": "720p30",
+    "h": "1080p60",
+    "p": "1440p60",
+    "k": "2160p60",
+}
+
+# manim cli quality flags to config values
+QUALITIES = {
+    "l": "low_quality",
+    "m": "medium_quality",
+    "h": "high_quality",
+    "p": "production_quality",
+    "k": "fourk_quality",
+}
+
+
+def _worker_main(conn, cwd: str, partials_dir: Optional[str] = None) -> None:
+    """
+    Entry point of a worker process, imports manim once and renders jobs from the pipe
+    """
+    if os.name == "posix":
+        # a worker killed on timeout takes its ffmpeg and latex processes along
+        os.setsid()
+
+    os.chdir(cwd)
+
+    # manim logs to the terminal, keep the parent's console clean
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+
+    try:
+        import manim
+    except Exception as e:
+        conn.send((1, f"{type(e).__name__}: {e}"))
+        return
+
+    conn.send((0, manim.__version__))
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+
+        if job is None:
+            return
+
+        fpath, scene_name, quality, preview = job
+
+        # stable partial movies, like the config file given to the cli
+        partials = {} if partials_dir is None else {
+            "partial_movie_dir": os.path.join(partials_dir, QUALITY_DIRS[quality], "{scene_name}")
+        }
+        try:
+            with open(fpath) as fp:
+                code = fp.read()
+
+            # every job runs in its own namespace
+            module_name = os.path.splitext(os.path.basename(fpath))[0]
+            namespace = {"__name__": module_name, "__file__": fpath}
+            exec(compile(code, fpath, "exec"), namespace)
+
+            # the media and logs go next to the code file, like the cli renders
+            with manim.tempconfig({
+                "quality": QUALITIES[quality],
+                "preview": preview,
+                "input_file": fpath,
+                "media_dir": os.path.join(os.path.dirname(fpath), "media"),
+                "log_dir": os.path.join(os.path.dirname(fpath), "logs"),
+                **partials,
+            }):
+                namespace[scene_name]().render()
+
+            conn.send((0, "Success!"))
+        except BaseException:
+            conn.send((1, traceback.format_exc()))
+
+
+class RenderWorker:
+    """
+    A long lived process with manim already imported
+    """
+
+    def __init__(
+            self, cwd: str, start_timeout: float = 60.0, partials_dir: str = None
+        ) -> None:
+        self.cwd = cwd
+        self.partials_dir = partials_dir
+        self.start_timeout = start_timeout
+        self.jobs_done: int = 0
+
+        self._conn = None
+        self._process = None
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def start(self) -> str:
+        """
+        Starts the process and waits until manim is imported, returns the manim version
+        """
+        with tracer.span("render.worker_start"):
+            return self._start()
+
+    def _start(self) -> str:
+        ctx = mp.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        self._process = ctx.Process(
+            target=_worker_main, args=(child_conn, self.cwd, self.partials_dir), daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+        self.jobs_done = 0
+
+        if not self._conn.poll(self.start_timeout):
+            self.close()
+            raise RuntimeError("render worker did not start in time")
+
+        err, message = self._conn.recv()
+        if err:
+            self.close()
+            raise RuntimeError(f"render worker could not import manim: {message}")
+
+        return message
+
+    def render(
+            self,
+            fpath: str,
+            scene_name: str,
+            quality: str,
+            preview: bool = True,
+            timeout: float = None
+        ) -> Tuple[str, int]:
+        """
+        Renders the scene in the worker, returns (response, returncode);
+        a render still running after `timeout` seconds kills the worker and its children
+        """
+        if not self.alive:
+            self.start()
+
+        try:
+            self._conn.send((fpath, scene_name, quality, preview))
+            if not self._conn.poll(timeout):
+                # restarted on the next job
+                kill_group(self._process)
+                self.close()
+                return ("", LIMIT_EXCEEDED)
+            err, message = self._conn.recv()
+        except (EOFError, OSError, BrokenPipeError):
+            # the worker crashed while rendering, it is restarted on the next job
+            self.close()
+            return ("render worker crashed while rendering the scene", 1)
+
+        self.jobs_done += 1
+        return (message, err)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.send(None)
+            except (OSError, BrokenPipeError):
+                pass
+            self._conn.close()
+            self._conn = None
+
+        if self._process is not None:
+            self._process.join(timeout=1)
+            if self._process.is_alive():
+                kill_group(self._process)
+            self._process = None
+
+
+class RenderWorkerPool:
+    """
+    Pool of warm render workers, a worker is restarted after a crash or after `max_jobs` jobs
+    """
+
+    def __init__(
+            self,
+            cwd: str = None,
+            num_workers: int = 1,
+            max_jobs: int = 50,
+            partials_dir: str = None
+        ) -> None:
+        self.cwd = cwd or os.getcwd()
+        self.partials_dir = partials_dir
+        self.num_workers = num_workers
+        self.max_jobs = max_jobs
+
+        self._idle: "queue.Queue[RenderWorker]" = queue.Queue()
+        self._workers: List[RenderWorker] = []
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """
+        Starts all the workers, raises RuntimeError if manim can not be imported
+        """
+        with self._lock:
+            while len(self._workers) < self.num_workers:
+                worker = RenderWorker(self.cwd, partials_dir=self.partials_dir)
+                worker.start()
+                self._workers.append(worker)
+                self._idle.put(worker)
+
+    def render(
+            self,
+            fpath: str,
+            scene_name: str,
+            quality: str,
+            preview: bool = True,
+            timeout: float = None
+        ) -> Tuple[str, int]:
+        """
+        Renders on the next idle worker, returns (response, returncode)
+        """
+        if not self._workers:
+            self.start()
+
+        worker = self._idle.get()
+        try:
+            if worker.alive and worker.jobs_done >= self.max_jobs:
+                worker.close()
+            return worker.render(fpath, scene_name, quality, preview, timeout=timeout)
+        finally:
+            self._idle.put(worker)
+
+    def close(self) -> None:
+        with self._lock:
+            for worker in self._workers:
+                try:
+                    worker.close()
+                except Exception as e:
+                    logging.error(f"Failed to close render worker: {e}")
+            self._workers = []
+            self._idle = queue.Queue()
@@ -0,0 +1,189 @@
+import os
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from typing import *
+
+from ..utils import tracer
+
+
+def atomic_write(path: str, text: str) -> None:
+    """
+    Writes a temporary file next to `path` and renames it,
+    a reader never sees a partially written file
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as fp:
+            fp.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+# file in every workspace, the media gc only removes directories that have it
+WORKSPACE_MARKER = ".ez_manim_workspace"
+
+
+def new_workspace(root: str) -> str:
+    """
+    Creates an empty, uniquely named render workspace under `root`
+    """
+    os.makedirs(root, exist_ok=True)
+    workspace = tempfile.mkdtemp(prefix=time.strftime("%Y%m%d-%H%M%S-"), dir=root)
+    open(os.path.join(workspace, WORKSPACE_MARKER), "w").close()
+    return workspace
+
+
+def is_workspace(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, WORKSPACE_MARKER))
+
+
+def touch(path: str) -> None:
+    """
+    Marks the workspace as recently used
+    """
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def dir_size(path: str) -> int:
+    size = 0
+    for dirpath, _, fnames in os.walk(path):
+        for fname in fnames:
+            try:
+                size += os.lstat(os.path.join(dirpath, fname)).st_size
+            except FileNotFoundError:
+                pass
+    return size
+
+
+class MediaGC:
+    """
+    Keeps the render workspaces under its roots within a disk quota and a maximum age;
+    expired workspaces go first, then the least recently used until the total fits.
+    Pinned workspaces (renders in flight, the latest output) are never removed, nor is
+    anything `new_workspace` didn't create.
+    """
+
+    def __init__(
+            self,
+            roots: List[str] = None,
+            max_bytes: int = 2 * 1024 ** 3,
+            max_age: float = 7 * 24 * 3600.0,
+            interval: float = 60.0
+        ) -> None:
+        self.roots: List[str] = list(roots or [])
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.interval = interval
+
+        # workspace -> number of users
+        self._pinned: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        # totals of the last collection
+        self.total_bytes: int = 0
+        self.removed: int = 0
+        self.freed_bytes: int = 0
+
+    def add_root(self, root: str) -> None:
+        with self._lock:
+            if root not in self.roots:
+                self.roots.append(root)
+
+    def remove_root(self, root: str) -> None:
+        with self._lock:
+            if root in self.roots:
+                self.roots.remove(root)
+
+    def pin(self, workspace: str) -> None:
+        with self._lock:
+            self._pinned[workspace] = self._pinned.get(workspace, 0) + 1
+
+    def unpin(self, workspace: str) -> None:
+        with self._lock:
+            count = self._pinned.get(workspace, 0) - 1
+            if count > 0:
+                self._pinned[workspace] = count
+            else:
+                self._pinned.pop(workspace, None)
+
+    def collect(self) -> Tuple[int, int]:
+        """
+        One pass over the roots, returns (workspaces removed, bytes freed)
+        """
+        with tracer.span("media.gc") as span:
+            now = time.time()
+            with self._lock:
+                roots = list(self.roots)
+
+            # (last used, size, path), least recently used first
+            entries: List[Tuple[float, int, str]] = []
+            for root in roots:
+                try:
+                    names = os.listdir(root)
+                except FileNotFoundError:
+                    continue
+                for name in names:
+                    path = os.path.join(root, name)
+                    try:
+                        if is_workspace(path):
+                            entries.append((os.stat(path).st_mtime, dir_size(path), path))
+                    except FileNotFoundError:
+                        pass
+            entries.sort()
+
+            total = sum(size for _, size, _ in entries)
+            removed, freed = 0, 0
+
+            for last_used, size, path in entries:
+                if total <= self.max_bytes and now - last_used <= self.max_age:
+                    continue
+                with self._lock:
+                    if path in self._pinned:
+                        continue
+                    shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                removed += 1
+                freed += size
+
+            self.total_bytes = total
+            self.removed += removed
+            self.freed_bytes += freed
+            span.set(removed=removed, freed_bytes=freed, total_bytes=total)
+
+        return (removed, freed)
+
+    def start(self) -> None:
+        """
+        Collects every `interval` seconds in a daemon thread
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="ez-manim-media-gc")
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.collect()
+            except Exception as e:
+                logging.error(f"media gc failed: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -1,2 +1,29 @@
-from .base import BaseLLM
-from .openai import OpenAIManim
\ No newline at end of file
+import sys
+from typing import TYPE_CHECKING
+
+from ..utils.imports import LazyModule
+
+
+_import_structure = {
+    "base": ["BaseLLM"],
+    "history": ["ChatHistory"],
+    "openai": ["OpenAIManim"],
+    "replay": ["ReplayLLM"],
+}
+
+
+if TYPE_CHECKING:
+
+    from .base import BaseLLM
+    from .history import ChatHistory
+    from .openai import OpenAIManim
+    from .replay import ReplayLLM
+
+else:
+
+    sys.modules[__name__] = LazyModule(
+        __name__,
+        globals()["__file__"],
+        _import_structure,
+        module_spec=__spec__
+    )
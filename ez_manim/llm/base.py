@@ -1,7 +1,13 @@
+import time
 from typing import *
 from abc import ABC
+from concurrent.futures import ThreadPoolExecutor
 
-from ..utils import num_tokens_from_messages
+from .compaction import HistoryCompactor
+from .history import ChatHistory
+from .response_cache import ResponseCache, cache_key
+from .session_log import SessionLog
+from ..utils import tracer
 
 
 class BaseLLM(ABC):
@@ -12,21 +18,34 @@ class BaseLLM(ABC):
     def __init__(
             self,
             system_prompt: str = None,
-            generation_params: Dict[str, Any] = None
+            generation_params: Dict[str, Any] = None,
+            token_model: str = "gpt-3.5-turbo-0613",
+            approximate_tokens: bool = False
         ) -> None:
         
         # every llm can have a system prompt to steer conversations
         self.system_prompt: str = system_prompt
 
         # every llm has access to a chat history
-        # list of messages of format [{"role": "...", "content": "..."}]
-        self.chat_history: List[Dict[str, str]] = [
-            {"role": "system", "content": self.system_prompt}
-        ]
+        # messages of format {"role": "...", "content": "..."} with cached token counts,
+        # counted with the tokenizer of `token_model`, or estimated from their size
+        self.chat_history: ChatHistory = ChatHistory(
+            self.system_prompt, model=token_model, approximate=approximate_tokens
+        )
+
+        # shrinks stale code versions out of the window when set, see `enable_compaction`
+        self.compactor: Optional[HistoryCompactor] = None
 
         # text generation params
         self.generation_params: Dict[str, Any] = generation_params
 
+        # responses to identical requests are reused when set, see `enable_response_cache`
+        self.response_cache: Optional[ResponseCache] = None
+        self.cache_sampled: bool = False
+
+        # every message is appended to it when set, see `enable_session_log`
+        self.session_log: Optional[SessionLog] = None
+
         # the generation engine
         self._core: Any = None
 
@@ -36,55 +55,144 @@ class BaseLLM(ABC):
         """
         self.system_prompt = value
 
-    def clear_chat_history(self) -> None:
+    def enable_compaction(self, keep_turns: int = 3) -> None:
         """
-        Resets the history
+        Keep only the latest code in full in the windowed history,
+        older requests are condensed into a scene spec
         """
-        self.chat_history = [
-            {"role": "system", "content": self.system_prompt}
-        ]
+        self.compactor = HistoryCompactor(self.chat_history, keep_turns=keep_turns)
 
-    def add_to_history(self, role: str, content: str):
+    def enable_response_cache(self, cache: ResponseCache, cache_sampled: bool = False) -> None:
         """
-        Add the message to chat history
+        Reuse the responses of identical requests; with a temperature above zero
+        the response is random and the cache is bypassed unless `cache_sampled`
         """
-        self.chat_history.append(dict(role=role, content=content))
+        self.response_cache = cache
+        self.cache_sampled = cache_sampled
 
-    def update_generation_params(self, value: Dict[str, Any]):
-        self.generation_params = value
+    def enable_session_log(self, log: SessionLog, resume_tokens: int = 8000) -> int:
+        """
+        Appends every message to the log; the latest logged messages that fit in
+        `resume_tokens` are loaded into the history first, returns how many were
+        """
+        messages = log.tail(resume_tokens)
 
-    def get_windowed_history(self, num_tokens: int = 1500) -> List[Dict[str, str]]:
+        if log.counter_name == self.chat_history.counter_name:
+            for role, content, num_tokens in messages:
+                self.chat_history.append(role, content, num_tokens)
+        else:
+            # counted with another tokenizer
+            self.chat_history.extend([dict(role=role, content=content) for role, content, _ in messages])
+
+        log.start(self.chat_history.counter_name)
+        self.session_log = log
+        return len(messages)
+
+    @property
+    def model_name(self) -> str:
+        return type(self).__name__
+
+    def _cache_key(self, messages: List[Dict[str, str]]) -> Optional[str]:
         """
-        returns a windowed chat history with a limit of `num_tokens` tokens
+        Key of the request in the response cache, None if it must not be cached
         """
-        selected_messages: List[Dict[str, str]] = []
-        total_length = 0
+        if self.response_cache is None:
+            return None
 
-        # Iterate through messages in reverse order
-        for message in reversed(self.chat_history):
-            role = message['role']
-            content = message['content']
+        params = self.generation_params or {}
+        # the apis sample with temperature 1 when it isn't given, or given as None
+        temperature = params.get("temperature")
+        if (1.0 if temperature is None else temperature) > 0 and not self.cache_sampled:
+            self.response_cache.bypass()
+            return None
 
-            if role == "system":
-                continue
+        return cache_key(self.model_name, messages, params)
 
-            # Calculate the token length of the content
-            content_length = num_tokens_from_messages([message])
+    def generate_cached(self, messages: List[Dict[str, str]]) -> Any:
+        """
+        `generate` through the response cache, if enabled
+        """
+        key = self._cache_key(messages)
+        if key is None:
+            return self.generate(messages)
+
+        with tracer.span("llm.cache") as span:
+            response = self.response_cache.get(key)
+            span.set(hit=response is not None)
+        if response is not None:
+            return response
+
+        start = time.perf_counter()
+        response = self.generate(messages)
+        self.response_cache.put(key, response, time.perf_counter() - start)
+        return response
+
+    def stream_cached(
+            self, messages: List[Dict[str, str]], done: Callable[[], bool] = None
+        ) -> Iterator[str]:
+        """
+        `stream` through the response cache, if enabled; a hit is yielded at once,
+        a streamed response is stored when it was read to the end, or closed early
+        once the reader's `done()` says it has all it needs
+        """
+        key = self._cache_key(messages)
+        if key is None:
+            yield from self.stream(messages)
+            return
+
+        with tracer.span("llm.cache") as span:
+            response = self.response_cache.get(key)
+            span.set(hit=response is not None)
+        if response is not None:
+            yield response
+            return
+
+        start = time.perf_counter()
+        chunks = []
+        try:
+            for chunk in self.stream(messages):
+                chunks.append(chunk)
+                yield chunk
+        except GeneratorExit:
+            # a reader stops at the end of the code block, not when it gives up
+            if done is not None and done():
+                self.response_cache.put(key, "".join(chunks), time.perf_counter() - start)
+            raise
+        self.response_cache.put(key, "".join(chunks), time.perf_counter() - start)
 
-            # Check if adding this message exceeds the maximum length
-            if total_length + content_length <= num_tokens:
-                # Add the message to the selected list
-                selected_messages.append({'role': role, 'content': content})
+    def clear_chat_history(self) -> None:
+        """
+        Resets the history
+        """
+        self.chat_history.clear(self.system_prompt)
+        if self.session_log is not None:
+            self.session_log.clear()
 
-                # Update the total length
-                total_length += content_length
+    def add_to_history(self, role: str, content: str):
+        """
+        Add the message to chat history, and to the session log if enabled
+        """
+        num_tokens = self.chat_history.append(role, content)
+        if self.session_log is not None:
+            self.session_log.append(role, content, num_tokens)
 
+    def update_generation_params(self, value: Dict[str, Any]):
+        self.generation_params = value
 
-        selected_messages.append({'role': 'system', 'content': self.system_prompt})
-        selected_messages.reverse()
+    def get_windowed_history(self, num_tokens: int = 1500) -> List[Dict[str, str]]:
+        """
+        returns a windowed chat history with a limit of `num_tokens` tokens
+        """
+        # contiguous run of the latest messages, older ones are dropped
+        with tracer.span("llm.windowed_history") as span:
+            if self.compactor is not None:
+                selected_messages = self.compactor.window(num_tokens)
+                span.set(saved_tokens=self.compactor.last_stats.saved_tokens)
+            else:
+                selected_messages = self.chat_history.window(num_tokens)
+            selected_messages.insert(0, {'role': 'system', 'content': self.system_prompt})
 
         return selected_messages
-            
 
     def generate(self, messages: List[Dict[str, str]]) -> Any:
         """
@@ -95,3 +203,25 @@ class BaseLLM(ABC):
         messages
         """
         pass
+
+    def generate_n(self, messages: List[Dict[str, str]], n: int) -> List[str]:
+        """
+        `n` independent responses to the same messages,
+        parallel `generate` calls unless the llm can sample several at once
+
+        Args:
+        messages
+        n
+        """
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            return list(pool.map(lambda _: self.generate(messages), range(n)))
+
+    def stream(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """
+        llm classes that support streaming override this method;
+        yields the response in chunks, the full response by default
+
+        Args:
+        messages
+        """
+        yield self.generate(messages)
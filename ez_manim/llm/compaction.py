@@ -0,0 +1,237 @@
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import *
+
+from .history import ChatHistory
+from .parser import CODE_PREFIX
+
+
+CODE_PLACEHOLDER = f"{CODE_PREFIX} [earlier version, replaced by the latest code below]"
+SCENE_SPEC_HEADER = "Scene spec so far, from the user's earlier requests (oldest first):"
+
+
+@dataclass
+class CompactionStats:
+    """
+    Tokens of the plain window against the compacted one
+    """
+    original_tokens: int
+    compacted_tokens: int
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.compacted_tokens
+
+
+class HistoryCompactor:
+    """
+    Shrinks the windowed history of a code generating chat:
+    only the latest code is kept in full, the `keep_turns` turns before it keep the
+    user request with a short placeholder for the code, and older user requests are
+    condensed into a running scene spec message
+
+    the spec and its token counts are updated as messages are added, so a window costs
+    what it selects rather than the length of the history. The latest turn has priority,
+    then the spec (its oldest items dropped first), then the placeholder turns
+    """
+
+    def __init__(
+            self,
+            history: ChatHistory,
+            keep_turns: int = 3,
+            max_spec_item_chars: int = 300
+        ) -> None:
+        self.history = history
+        self.keep_turns = keep_turns
+        self.max_spec_item_chars = max_spec_item_chars
+
+        # one entry per windowed request
+        self.stats: List[CompactionStats] = []
+        self.last_stats: Optional[CompactionStats] = None
+        self._placeholder_tokens: Optional[int] = None
+        self._item_overhead: Optional[int] = None
+        self._header_tokens: Optional[int] = None
+
+        self._reset()
+
+    def _reset(self) -> None:
+        # the message list that was scanned, and how far
+        self._messages: List[Dict[str, str]] = self.history.messages
+        self._seen: int = 0
+
+        # indices of the user messages, in order
+        self._requests: List[int] = []
+
+        # the latest code response and the request it answered
+        self._latest_code: Optional[int] = None
+        self._latest_request: int = 0
+
+        # (line, estimated tokens) of the requests condensed so far, oldest first,
+        # and how many of `_requests` have been considered for it
+        self._spec_items: List[Tuple[str, int]] = []
+        self._spec_upto: int = 0
+
+    def _sync(self) -> None:
+        """
+        Scans the messages added since the last window
+        """
+        messages = self.history.messages
+        if messages is not self._messages or len(messages) < self._seen:
+            # the history was cleared
+            self._reset()
+
+        for index in range(self._seen, len(messages)):
+            message = messages[index]
+            if message["role"] == "user":
+                self._requests.append(index)
+            elif message["role"] == "assistant" and message["content"].startswith(CODE_PREFIX):
+                self._latest_code = index
+                self._latest_request = self._requests[-1] if self._requests else index
+        self._seen = len(messages)
+
+        # requests older than the kept turns only ever join the spec, never leave it
+        keep_from = self._keep_from()
+        earlier = bisect_left(self._requests, keep_from)
+        for position in range(self._spec_upto, earlier - self.keep_turns):
+            index = self._requests[position]
+            if self._produced_code(index):
+                line = self._spec_line(messages[index]["content"])
+                self._spec_items.append((line, self._line_tokens(line)))
+        self._spec_upto = max(self._spec_upto, earlier - self.keep_turns)
+
+    def _keep_from(self) -> int:
+        """
+        Everything from the request that produced the latest code is kept as is
+        """
+        return self._latest_request if self._latest_code is not None else 0
+
+    def window(self, num_tokens: int) -> List[Dict[str, str]]:
+        """
+        Compacted messages that fit in `num_tokens`, scene spec first
+        """
+        self._sync()
+
+        messages = self.history.messages
+        counts = self.history.token_counts
+        keep_from = self._keep_from()
+
+        # the latest turn in full, newest messages first
+        latest, total = self._suffix(
+            [(dict(messages[index]), counts[index]) for index in range(keep_from, len(messages))
+             if messages[index]["role"] != "system"],
+            num_tokens
+        )
+        fits = len(latest) == sum(1 for message in messages[keep_from:] if message["role"] != "system")
+
+        spec, spec_tokens, earlier = None, 0, []
+        if fits:
+            spec, spec_tokens = self._spec_message(num_tokens - total)
+            total += spec_tokens
+
+            # earlier turns keep their request and a placeholder for the code
+            position = bisect_left(self._requests, keep_from)
+            first = position - self.keep_turns
+            if first < 0:
+                start = 0
+            elif first < position:
+                start = self._requests[first]
+            else:
+                start = keep_from
+            recent = []
+            for index in range(start, keep_from):
+                message = messages[index]
+                if message["role"] == "system":
+                    continue
+                if message["role"] == "assistant" and message["content"].startswith(CODE_PREFIX):
+                    recent.append(({"role": "assistant", "content": CODE_PLACEHOLDER}, self.placeholder_tokens))
+                else:
+                    recent.append((dict(message), counts[index]))
+            earlier, earlier_tokens = self._suffix(recent, num_tokens - total)
+            total += earlier_tokens
+
+        selected = ([spec] if spec is not None else []) + earlier + latest
+
+        self.last_stats = CompactionStats(
+            original_tokens=self.history.window_tokens(num_tokens),
+            compacted_tokens=total
+        )
+        self.stats.append(self.last_stats)
+
+        return selected
+
+    @staticmethod
+    def _suffix(
+            messages: List[Tuple[Dict[str, str], int]], num_tokens: int
+        ) -> Tuple[List[Dict[str, str]], int]:
+        """
+        Longest suffix of the messages that fits in `num_tokens`, and its tokens
+        """
+        selected: List[Dict[str, str]] = []
+        total = 0
+        for message, num in reversed(messages):
+            if total + num > num_tokens:
+                break
+            selected.append(message)
+            total += num
+        selected.reverse()
+        return selected, total
+
+    @property
+    def placeholder_tokens(self) -> int:
+        if self._placeholder_tokens is None:
+            self._placeholder_tokens = self.history.count(
+                [{"role": "assistant", "content": CODE_PLACEHOLDER}]
+            )
+        return self._placeholder_tokens
+
+    def _produced_code(self, index: int) -> bool:
+        """
+        Requests that were refused don't belong in the spec
+        """
+        following = self.history.messages[index + 1:index + 2]
+        return not following or following[0]["content"].startswith(CODE_PREFIX)
+
+    def _spec_line(self, request: str) -> str:
+        item = " ".join(request.split())
+        if len(item) > self.max_spec_item_chars:
+            item = item[:self.max_spec_item_chars] + "..."
+        return f"- {item}"
+
+    def _line_tokens(self, line: str) -> int:
+        """
+        Tokens a line adds to the spec message, counted once when it joins
+        """
+        if self._item_overhead is None:
+            self._item_overhead = self.history.count([{"role": "system", "content": ""}])
+        # and one for the newline
+        return self.history.count([{"role": "system", "content": line}]) - self._item_overhead + 1
+
+    def _spec_message(self, num_tokens: int) -> Tuple[Optional[Dict[str, str]], int]:
+        """
+        The spec with as many of the latest items as fit in `num_tokens`, and its tokens
+        """
+        if not self._spec_items:
+            return None, 0
+
+        if self._header_tokens is None:
+            self._header_tokens = self.history.count(
+                [{"role": "system", "content": SCENE_SPEC_HEADER}]
+            )
+
+        # estimated from the item counts, newest items first
+        first = len(self._spec_items)
+        estimate = self._header_tokens
+        while first > 0 and estimate + self._spec_items[first - 1][1] <= num_tokens:
+            first -= 1
+            estimate += self._spec_items[first][1]
+
+        # the exact count of what was picked, dropping the oldest items until it fits
+        while first < len(self._spec_items):
+            lines = [SCENE_SPEC_HEADER] + [line for line, _ in self._spec_items[first:]]
+            spec = {"role": "system", "content": "\n".join(lines)}
+            tokens = self.history.count([spec])
+            if tokens <= num_tokens:
+                return spec, tokens
+            first += 1
+
+        return None, 0
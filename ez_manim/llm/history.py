@@ -0,0 +1,142 @@
+from bisect import bisect_left
+from typing import *
+
+from ..utils import tracer
+from ..utils.tokens import get_tokenizer
+
+
+class ChatHistory:
+    """
+    chat history that caches the token count of every message when it is added
+
+    keeps prefix sums of the cached counts so the token window over the latest
+    messages is found with a binary search instead of re-encoding the history
+    """
+
+    def __init__(
+            self,
+            system_prompt: str = None,
+            token_counter: Callable[[List[Dict[str, str]]], int] = None,
+            model: str = "gpt-3.5-turbo-0613",
+            approximate: bool = False
+        ) -> None:
+
+        # exact counts, or byte length estimates that are good enough for windowing
+        self._tokenizer = get_tokenizer(model)
+        self._token_counter = token_counter or (
+            self._tokenizer.approx_count if approximate else self._tokenizer.count
+        )
+        self._batch = token_counter is None and not approximate
+
+        # what the cached counts were made with, None for a custom counter
+        self.counter_name: Optional[str] = None if token_counter is not None else (
+            self._tokenizer.encoding_name + ("~" if approximate else "")
+        )
+
+        # list of messages of format [{"role": "...", "content": "..."}]
+        self.messages: List[Dict[str, str]] = []
+
+        # token count of every message, system messages count as 0
+        self.token_counts: List[int] = []
+
+        # _prefix[i] is the sum of token_counts[:i]
+        self._prefix: List[int] = [0]
+
+        self.append("system", system_prompt)
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        return iter(self.messages)
+
+    def __getitem__(self, index):
+        return self.messages[index]
+
+    def __repr__(self) -> str:
+        return f"ChatHistory({self.messages!r})"
+
+    @property
+    def total_tokens(self) -> int:
+        """
+        Tokens used by all the non-system messages
+        """
+        return self._prefix[-1]
+
+    def count(self, messages: List[Dict[str, str]]) -> int:
+        """
+        Tokens of messages that are not in the history, with the history's counter
+        """
+        return self._token_counter(messages)
+
+    def append(self, role: str, content: str, num_tokens: int = None) -> int:
+        """
+        Add a message and cache its token count, returns the count
+        """
+        message = dict(role=role, content=content)
+
+        if role == "system":
+            num_tokens = 0
+        elif num_tokens is None:
+            with tracer.span("tokens.count"):
+                num_tokens = self._token_counter([message])
+
+        self.messages.append(message)
+        self.token_counts.append(num_tokens)
+        self._prefix.append(self._prefix[-1] + num_tokens)
+
+        return num_tokens
+
+    def extend(self, messages: List[Dict[str, str]]) -> List[int]:
+        """
+        Add many messages, counted with one batch encoding, returns the counts
+        """
+        counted = [message for message in messages if message["role"] != "system"]
+
+        with tracer.span("tokens.count", messages=len(counted)):
+            if self._batch:
+                counts = iter(self._tokenizer.count_each(counted))
+            else:
+                counts = iter(self._token_counter([message]) for message in counted)
+
+            return [
+                self.append(
+                    message["role"], message["content"],
+                    None if message["role"] == "system" else next(counts)
+                )
+                for message in messages
+            ]
+
+    def clear(self, system_prompt: str = None) -> None:
+        """
+        Resets the history to the system prompt only
+        """
+        self.messages = []
+        self.token_counts = []
+        self._prefix = [0]
+
+        self.append("system", system_prompt)
+
+    def window_start(self, num_tokens: int) -> int:
+        """
+        Index of the oldest message of the longest suffix that fits in `num_tokens`
+        """
+        # smallest i such that total - _prefix[i] <= num_tokens
+        start = bisect_left(self._prefix, self.total_tokens - num_tokens)
+        return min(start, len(self.messages))
+
+    def window_tokens(self, num_tokens: int) -> int:
+        """
+        Tokens of the messages in `window(num_tokens)`
+        """
+        return self.total_tokens - self._prefix[self.window_start(num_tokens)]
+
+    def window(self, num_tokens: int) -> List[Dict[str, str]]:
+        """
+        returns the latest non-system messages that fit in `num_tokens` tokens
+        """
+        return [
+            dict(message)
+            for message in self.messages[self.window_start(num_tokens):]
+            if message["role"] != "system"
+        ]
@@ -1,8 +1,22 @@
-from typing import Any, Dict, List
-from openai import OpenAI
+import threading
+from contextlib import closing
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, TypeVar
 
 from .base import BaseLLM
 from .prompts import DEFAULT_SYSTEM_PROMPT
+from .resilience import RetryPolicy, call_with_retries, hedged
+from ..utils import lazy_import, tracer
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+
+# imported when the first client is created
+openai = lazy_import("openai")
+httpx = lazy_import("httpx")
+
+
+T = TypeVar("T")
 
 
 DEFAULT_GENERATION_PARAMS = dict(
@@ -12,28 +26,174 @@ DEFAULT_GENERATION_PARAMS = dict(
 )
 
 
+def retryable(error: BaseException) -> Optional[float]:
+    """
+    None if retrying can't help, else the seconds the server asked to wait (0 if it didn't)
+    """
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return 0.0
+
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code != 429 and error.status_code < 500:
+            return None
+        try:
+            return float(error.response.headers.get("retry-after", 0))
+        except ValueError:
+            return 0.0
+
+    return None
+
+
 class OpenAIManim(BaseLLM):
     def __init__(
             self, 
             system_prompt: str = DEFAULT_SYSTEM_PROMPT, 
             generation_params: Dict[str, Any] = DEFAULT_GENERATION_PARAMS,
             openai_api_key: str = None,
-            model: str = "gpt-3.5-turbo"
+            model: str = "gpt-3.5-turbo",
+            approximate_tokens: bool = False,
+            base_url: str = None,
+            timeout: float = 60.0,
+            connect_timeout: float = 5.0,
+            max_retries: int = 3,
+            hedge_after: Optional[float] = None,
+            max_connections: int = 10,
+            client: "OpenAI" = None
         ) -> None:
 
-        super().__init__(system_prompt, generation_params)
+        super().__init__(
+            system_prompt, generation_params,
+            token_model=model, approximate_tokens=approximate_tokens
+        )
 
-        self._core: OpenAI = OpenAI(api_key=openai_api_key)
+        # one pooled client for every request, the sdk's own retries are replaced
+        # by `retry_policy` which also covers the hedged requests;
+        # llms passed the same `client` share its connections
+        self._core: "OpenAI" = client or openai.OpenAI(
+            api_key=openai_api_key,
+            base_url=base_url,
+            timeout=openai.Timeout(timeout, connect=connect_timeout),
+            max_retries=0,
+            http_client=openai.DefaultHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections
+                )
+            )
+        )
         self._model = model
 
+        # jittered exponential backoff on 429, 5xx, timeouts and connection errors
+        self.retry_policy = RetryPolicy(max_retries=max_retries)
+
+        # when set, a second request is sent if the first hasn't answered
+        # (or streamed its first token) after this many seconds
+        self.hedge_after = hedge_after
+
+    @property
+    def model_name(self) -> str:
+        return self._model
+
+    @classmethod
+    def factory(cls, **kwargs) -> Callable[[], "OpenAIManim"]:
+        """
+        Makes llms with their own history that share the first one's http client
+        """
+        shared: List[OpenAIManim] = []
+        lock = threading.Lock()
+
+        def make() -> OpenAIManim:
+            with lock:
+                llm = cls(client=shared[0]._core if shared else None, **kwargs)
+                if not shared:
+                    shared.append(llm)
+            return llm
+
+        return make
+
     def generate(self, messages: List[Dict[str, str]]) -> str:
-        completion = self._core.chat.completions.create(
-            model=self._model,
-            messages=messages,
-            **self.generation_params
-        )
+        with tracer.span("llm.generate", model=self._model) as span:
+            # closing cancels the retries of the hedged request that lost,
+            # its completion already in flight is answered and dropped
+            with closing(self._requests(lambda cancel: iter([
+                self._create(messages, cancel)
+            ]))) as requests:
+                completion = next(requests)
+            if completion.usage is not None:
+                span.set(
+                    prompt_tokens=completion.usage.prompt_tokens,
+                    completion_tokens=completion.usage.completion_tokens
+                )
 
         return completion.choices[0].message.content
+
+    def generate_n(self, messages: List[Dict[str, str]], n: int) -> List[str]:
+        """
+        `n` choices of one request, the prompt is only paid once
+        """
+        with tracer.span("llm.generate", model=self._model, n=n) as span:
+            with closing(self._requests(lambda cancel: iter([
+                self._create(messages, cancel, n=n)
+            ]))) as requests:
+                completion = next(requests)
+            if completion.usage is not None:
+                span.set(
+                    prompt_tokens=completion.usage.prompt_tokens,
+                    completion_tokens=completion.usage.completion_tokens
+                )
+
+        return [choice.message.content for choice in completion.choices]
+
+    def stream(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """
+        Yields the completion as it arrives, closing the generator stops the request
+        """
+        with tracer.span("llm.generate", model=self._model, stream=True) as span:
+            def chunks(cancel: threading.Event) -> Iterator[str]:
+                # the last chunk carries the token usage; only asked for when it is traced,
+                # not every compatible backend accepts the option
+                options = {"stream_options": {"include_usage": True}} if tracer.enabled else {}
+                completion = self._create(messages, cancel, stream=True, **options)
+                try:
+                    for chunk in completion:
+                        if getattr(chunk, "usage", None) is not None:
+                            span.set(
+                                prompt_tokens=chunk.usage.prompt_tokens,
+                                completion_tokens=chunk.usage.completion_tokens
+                            )
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            yield chunk.choices[0].delta.content
+                finally:
+                    completion.close()
+
+            requests = self._requests(chunks)
+            try:
+                yield from requests
+            finally:
+                requests.close()
+
+    def _requests(self, start: Callable[[threading.Event], Iterator[T]]) -> Iterator[T]:
+        """
+        The items of one request, or of the fastest one when hedging;
+        closing it stops the streams and retries still running
+        """
+        if self.hedge_after is None:
+            yield from start(threading.Event())
+        else:
+            yield from hedged(start, self.hedge_after)
+
+    def _create(self, messages: List[Dict[str, str]], cancel: threading.Event, **kwargs) -> Any:
+        return call_with_retries(
+            lambda: self._core.chat.completions.create(
+                model=self._model,
+                messages=messages,
+                **kwargs,
+                **self.generation_params
+            ),
+            self.retry_policy,
+            retryable,
+            cancel=cancel
+        )
     
     def _parse_output(self, response: str) -> str:
         """
@@ -0,0 +1,129 @@
+from typing import *
+
+
+CODE_PREFIX = "Manim code:"
+EDIT_PREFIX = "Manim edit:"
+REFUSAL = "-1"
+FENCE_OPEN = "```python"
+FENCE_CLOSE = "\n```"
+
+
+class StreamParser:
+    """
+    Incrementally parses an llm response while it is being streamed
+
+    the status is known from the first few tokens ("Manim code:" or "-1") and
+    the code is complete as soon as the closing fence of the python block arrives;
+    edits ("Manim edit:") are complete when the stream ends
+    """
+
+    PENDING = "pending"
+    CODE = "code"
+    EDIT = "edit"
+    REFUSAL = "refusal"
+
+    def __init__(self) -> None:
+        self.text: str = ""
+        self.status: str = self.PENDING
+
+        # start and end of the code inside the fenced block, in `self.text`
+        self._code_start: int = -1
+        self._code_end: int = -1
+
+    @property
+    def code_complete(self) -> bool:
+        return self._code_end != -1
+
+    @property
+    def done(self) -> bool:
+        """
+        True when the rest of the stream is not needed
+        """
+        return self.status == self.REFUSAL or self.code_complete
+
+    @property
+    def response(self) -> str:
+        """
+        The text received so far, cut after the closing fence once the code is complete
+        """
+        if self._code_end == -1:
+            return self.text
+        return self.text[:self._code_end + len(FENCE_CLOSE) - 1]
+
+    @property
+    def code(self) -> str:
+        """
+        The code received so far, everything in the fenced block once complete
+        """
+        if self._code_start == -1:
+            return ""
+        if self._code_end == -1:
+            return self.text[self._code_start:]
+        return self.text[self._code_start:self._code_end]
+
+    def feed(self, chunk: str) -> str:
+        """
+        Add a chunk of the response, returns the status
+        """
+        if not chunk or self.done:
+            return self.status
+
+        search_from = max(len(self.text) - len(FENCE_CLOSE), 0)
+        self.text += chunk
+
+        if self.status == self.PENDING:
+            self._update_status()
+
+        if self.status == self.CODE:
+            if self._code_start == -1:
+                fence = self.text.find(FENCE_OPEN)
+                if fence != -1:
+                    self._code_start = fence + len(FENCE_OPEN)
+                    search_from = self._code_start
+            if self._code_start != -1:
+                end = self.text.find(FENCE_CLOSE, max(search_from, self._code_start))
+                if end != -1:
+                    self._code_end = end + 1
+
+        return self.status
+
+    def finish(self) -> str:
+        """
+        Call when the stream has ended, returns the status
+        """
+        if self.status == self.PENDING:
+            # too short to tell, and not the code prefix
+            self.status = self.REFUSAL
+
+        if self.status == self.CODE and self._code_start == -1:
+            # no fenced block, take everything after the prefix
+            self._code_start = self.text.find(CODE_PREFIX) + len(CODE_PREFIX)
+
+        return self.status
+
+    def _update_status(self) -> None:
+        head = self.text.lstrip()
+
+        if head.startswith(CODE_PREFIX):
+            self.status = self.CODE
+        elif head.startswith(EDIT_PREFIX):
+            self.status = self.EDIT
+        elif head.startswith(REFUSAL):
+            self.status = self.REFUSAL
+        elif head and not CODE_PREFIX.startswith(head) and not EDIT_PREFIX.startswith(head):
+            # neither the code prefix nor a refusal
+            self.status = self.REFUSAL
+
+
+def extract_code(response: str) -> str:
+    """
+    Returns the code in the fenced python block of a full response
+    """
+    start = response.find(FENCE_OPEN)
+    if start == -1:
+        return response.replace(CODE_PREFIX, "", 1).strip()
+
+    start += len(FENCE_OPEN)
+    end = response.find(FENCE_CLOSE, start)
+
+    return response[start:] if end == -1 else response[start:end + 1]
@@ -11,3 +11,34 @@ Your task is to quietly think step by step and respond with the appropriate mani
 
 Begin!
 """
+
+EDIT_PROMPT = """\
+Current code:
+```python
+{code}
+```
+
+Change request: {request}
+
+Respond with "Manim edit:" followed by SEARCH/REPLACE blocks that turn the current code into the updated code, and nothing else:
+<<<<<<< SEARCH
+exact lines from the current code
+=======
+the lines that replace them
+>>>>>>> REPLACE
+
+Keep every SEARCH block short and unique in the code. If the change can't be done with edits, respond with "Manim code:" and the full code instead. If the request is not related to manim, respond with "-1".
+"""
+
+FULL_CODE_PROMPT = """\
+Your edits could not be applied to the current code ({error}).
+
+Current code:
+```python
+{code}
+```
+
+Change request: {request}
+
+Respond with "Manim code:" and the full updated code.
+"""
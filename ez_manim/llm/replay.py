@@ -0,0 +1,74 @@
+import json
+import time
+from typing import *
+
+from .base import BaseLLM
+from ..utils import tracer
+
+
+class ReplayLLM(BaseLLM):
+    """
+    Deterministic llm that replays recorded (prompt, response) transcripts,
+    for benchmarks and tests without network access
+
+    a prompt that was recorded gets its response, others get the transcripts in order
+    """
+
+    def __init__(
+            self,
+            transcripts: List[Dict[str, str]],
+            system_prompt: str = None,
+            generation_params: Dict[str, Any] = None,
+            latency: float = 0.0,
+            chunk_latency: float = 0.0,
+            chunk_size: int = 16
+        ) -> None:
+
+        super().__init__(system_prompt, generation_params or {})
+
+        self.transcripts = transcripts
+        self._by_prompt: Dict[str, str] = {
+            transcript["prompt"]: transcript["response"] for transcript in transcripts
+        }
+        self._next: int = 0
+
+        # seconds before the first token, and between streamed chunks
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+        self.chunk_size = chunk_size
+
+    @classmethod
+    def from_jsonl(cls, path: str, **kwargs) -> "ReplayLLM":
+        """
+        Loads transcripts with one {"prompt": ..., "response": ...} per line
+        """
+        with open(path) as fp:
+            transcripts = [json.loads(line) for line in fp if line.strip()]
+        return cls(transcripts, **kwargs)
+
+    def _response(self, messages: List[Dict[str, str]]) -> str:
+        prompt = messages[-1]["content"] if messages else ""
+        if prompt in self._by_prompt:
+            return self._by_prompt[prompt]
+
+        response = self.transcripts[self._next % len(self.transcripts)]["response"]
+        self._next += 1
+        return response
+
+    def generate(self, messages: List[Dict[str, str]]) -> str:
+        with tracer.span("llm.generate", model="replay"):
+            time.sleep(self.latency)
+            response = self._response(messages)
+            time.sleep(self.chunk_latency * (len(response) // self.chunk_size))
+
+        return response
+
+    def stream(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        with tracer.span("llm.generate", model="replay", stream=True):
+            time.sleep(self.latency)
+            response = self._response(messages)
+
+            for start in range(0, len(response), self.chunk_size):
+                if start:
+                    time.sleep(self.chunk_latency)
+                yield response[start:start + self.chunk_size]
@@ -0,0 +1,133 @@
+import time
+import queue
+import random
+import logging
+import threading
+from dataclasses import dataclass
+from typing import *
+
+from ..utils import tracer
+
+
+T = TypeVar("T")
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Jittered exponential backoff: attempt `n` waits a random time
+    in [0, min(max_delay, base_delay * 2 ** n)], at least what the server asked for
+    """
+    max_retries: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+
+    def delay(self, attempt: int, retry_after: float = None) -> float:
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            return max(backoff, min(retry_after, self.max_delay))
+        return backoff
+
+
+def call_with_retries(
+        func: Callable[[], T],
+        policy: RetryPolicy,
+        retryable: Callable[[BaseException], Optional[float]],
+        cancel: threading.Event = None
+    ) -> T:
+    """
+    Calls `func` until it succeeds or fails with an error that isn't retryable;
+    `retryable(error)` returns None for fatal errors, else the server's retry-after (or 0)
+    """
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except Exception as e:
+            retry_after = retryable(e)
+            if retry_after is None or attempt >= policy.max_retries:
+                raise
+
+            delay = policy.delay(attempt, retry_after or None)
+            logging.warning(f"{type(e).__name__}: {e}, retrying in {delay:.2f}s")
+            with tracer.span("llm.retry", attempt=attempt + 1, error=type(e).__name__):
+                if cancel is None:
+                    time.sleep(delay)
+                elif cancel.wait(delay):
+                    raise
+            attempt += 1
+
+
+def hedged(
+        start: Callable[[threading.Event], Iterator[T]],
+        hedge_after: float,
+        max_requests: int = 2
+    ) -> Iterator[T]:
+    """
+    Iterates `start(cancel)`, and when nothing arrived after `hedge_after` seconds
+    starts another request, up to `max_requests`. Yields the items of whichever
+    request produces first, the others are cancelled: `cancel` is checked between
+    items and retries, a call already blocked on the server (a non-streaming
+    completion) finishes in its daemon thread and its result is dropped.
+    """
+    events: "queue.Queue[Tuple[int, str, Any]]" = queue.Queue()
+    cancels: List[threading.Event] = []
+
+    def run(index: int, cancel: threading.Event) -> None:
+        try:
+            items = start(cancel)
+            try:
+                for item in items:
+                    if cancel.is_set():
+                        break
+                    events.put((index, "item", item))
+            finally:
+                close = getattr(items, "close", None)
+                if close is not None:
+                    close()
+        except Exception as e:
+            events.put((index, "error", e))
+        else:
+            events.put((index, "end", None))
+
+    def launch() -> None:
+        cancel = threading.Event()
+        cancels.append(cancel)
+        threading.Thread(target=run, args=(len(cancels) - 1, cancel), daemon=True).start()
+
+    winner: Optional[int] = None
+    failed: Set[int] = set()
+    launch()
+
+    try:
+        while True:
+            hedging = winner is None and len(cancels) < max_requests
+            try:
+                index, kind, value = events.get(timeout=hedge_after if hedging else None)
+            except queue.Empty:
+                with tracer.span("llm.hedge", requests=len(cancels) + 1):
+                    launch()
+                continue
+
+            if winner is not None and index != winner:
+                continue
+
+            if kind == "error":
+                failed.add(index)
+                # the others may still answer
+                if winner is None and len(failed) < len(cancels):
+                    continue
+                raise value
+
+            if winner is None:
+                winner = index
+                for i, cancel in enumerate(cancels):
+                    if i != winner:
+                        cancel.set()
+
+            if kind == "end":
+                return
+            yield value
+    finally:
+        for cancel in cancels:
+            cancel.set()
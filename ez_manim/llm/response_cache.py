@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from typing import *
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "ez_manim", "responses.sqlite")
+
+
+def cache_key(model: str, messages: List[Dict[str, str]], params: Dict[str, Any]) -> str:
+    """
+    Hash of the canonical JSON of everything the response depends on
+    """
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params or {}},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    llm responses in a single sqlite file, compressed, with a size cap (least recently
+    used first) and a time to live; also counts hits and the generation time they saved
+    """
+
+    def __init__(
+            self,
+            path: str = DEFAULT_CACHE_PATH,
+            max_bytes: int = 64 * 1024 ** 2,
+            ttl: float = 7 * 24 * 3600.0
+        ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.bypassed: int = 0
+        self.saved_seconds: float = 0.0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        # one connection shared by the threads, serialized by the lock
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response BLOB, size INTEGER, "
+            "seconds REAL, created REAL, last_used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+
+        # size of all the entries, summed once here and kept up to date by every change;
+        # entries other processes add to the same file are counted at the next open
+        self._total_bytes: int = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, seconds, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is not None and now - row[2] > self.ttl:
+                self._delete(key)
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            self.saved_seconds += row[1]
+
+        return zlib.decompress(row[0]).decode()
+
+    def put(self, key: str, response: str, seconds: float = 0.0) -> None:
+        """
+        Stores the response and how long it took to generate, then evicts down to `max_bytes`
+        """
+        blob = zlib.compress(response.encode())
+        size = len(blob) + len(key)
+        now = time.time()
+        with self._lock:
+            self._delete(key)
+            self._db.execute(
+                "INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, blob, size, seconds, now, now)
+            )
+            self._total_bytes += size
+            self._evict()
+
+    def _delete(self, key: str) -> None:
+        row = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._total_bytes -= row[0]
+
+    def _evict(self) -> None:
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        # least recently used first, until the rest fits
+        removed = []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if self._total_bytes <= self.max_bytes:
+                break
+            removed.append((key,))
+            self._total_bytes -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", removed)
+
+    def bypass(self) -> None:
+        """
+        Counts a request that was not cacheable
+        """
+        with self._lock:
+            self.bypassed += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.execute("VACUUM")
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_seconds": self.saved_seconds,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
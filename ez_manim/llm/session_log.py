@@ -0,0 +1,220 @@
+import os
+import json
+import mmap
+import time
+import secrets
+import threading
+from dataclasses import dataclass
+from typing import *
+
+
+DEFAULT_SESSIONS_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ez_manim", "sessions")
+
+
+@dataclass
+class SessionInfo:
+    """
+    A session log on disk
+    """
+    session_id: str
+    path: str
+    size: int
+    modified: float
+    first_prompt: Optional[str] = None
+
+
+class SessionLog:
+    """
+    Append-only JSONL log of a chat history, one record per message with its token count;
+    a turn appends a few hundred bytes whatever the length of the session.
+    Resuming reads the log backwards through mmap and stops once the token budget is met.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.session_id = os.path.splitext(os.path.basename(path))[0]
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            _drop_partial_line(path)
+        self._fp = open(path, "a", encoding="utf-8")
+
+    @classmethod
+    def create(cls, sessions_dir: str = DEFAULT_SESSIONS_DIR) -> "SessionLog":
+        session_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+        return cls(os.path.join(sessions_dir, f"{session_id}.jsonl"))
+
+    @classmethod
+    def open(cls, session_id: str, sessions_dir: str = DEFAULT_SESSIONS_DIR) -> "SessionLog":
+        """
+        An existing session by id, "last" for the most recent one
+        """
+        if session_id == "last":
+            sessions = list_sessions(sessions_dir)
+            if not sessions:
+                raise FileNotFoundError(f"no sessions in {sessions_dir}")
+            session_id = sessions[0].session_id
+
+        path = os.path.join(sessions_dir, f"{session_id}.jsonl")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"no session {session_id} in {sessions_dir}")
+        return cls(path)
+
+    @property
+    def counter_name(self) -> Optional[str]:
+        """
+        What counted the tokens of the logged messages, see `ChatHistory.counter_name`
+        """
+        with self._lock:
+            self._fp.flush()
+        with open(self.path, "rb") as fp:
+            try:
+                header = json.loads(fp.readline())
+            except ValueError:
+                return None
+        return header.get("counter") if header.get("event") == "start" else None
+
+    def start(self, counter_name: str = None) -> None:
+        """
+        Writes the header of a new log, the token counts are only reused with the same counter
+        """
+        with self._lock:
+            if self._fp.tell() > 0:
+                return
+        self._write({"event": "start", "counter": counter_name, "time": time.time()})
+
+    def append(self, role: str, content: str, num_tokens: int) -> None:
+        self._write({"role": role, "content": content, "tokens": num_tokens})
+
+    def clear(self) -> None:
+        """
+        The history was reset, resuming stops here
+        """
+        self._write({"event": "clear", "time": time.time()})
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._fp.write(line)
+            # one flush per record, a crash loses at most the message being written
+            self._fp.flush()
+
+    def tail(self, num_tokens: int) -> List[Tuple[str, str, int]]:
+        """
+        (role, content, tokens) of the latest messages that fit in `num_tokens`,
+        oldest first; only the end of the file is read
+        """
+        with self._lock:
+            self._fp.flush()
+
+        messages: List[Tuple[str, str, int]] = []
+        total = 0
+
+        with open(self.path, "rb") as fp:
+            size = os.fstat(fp.fileno()).st_size
+            if size == 0:
+                return messages
+
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                end = size
+                while end > 0:
+                    start = mm.rfind(b"\n", 0, end - 1) + 1
+                    line = mm[start:end]
+                    end = start
+
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # a line cut short by a crash
+                        continue
+
+                    if "event" in record:
+                        if record["event"] in ("clear", "start"):
+                            break
+                        continue
+
+                    if record["role"] == "system":
+                        continue
+                    if total + record["tokens"] > num_tokens:
+                        break
+                    total += record["tokens"]
+                    messages.append((record["role"], record["content"], record["tokens"]))
+
+        messages.reverse()
+        return messages
+
+    def close(self) -> None:
+        with self._lock:
+            self._fp.close()
+
+
+def _drop_partial_line(path: str) -> None:
+    """
+    Truncates a record cut short by a crash, the next append starts on its own line
+    """
+    with open(path, "r+b") as fp:
+        size = os.fstat(fp.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[size - 1:size] == b"\n":
+                return
+            end = mm.rfind(b"\n") + 1
+        fp.truncate(end)
+
+
+def _first_prompt(path: str, max_bytes: int = 4096) -> Optional[str]:
+    with open(path, "rb") as fp:
+        head = fp.read(max_bytes)
+    for line in head.splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get("role") == "user":
+            return record["content"]
+    return None
+
+
+def list_sessions(sessions_dir: str = DEFAULT_SESSIONS_DIR) -> List[SessionInfo]:
+    """
+    Session logs in the directory, the most recently used first
+    """
+    sessions = []
+    try:
+        names = os.listdir(sessions_dir)
+    except FileNotFoundError:
+        return sessions
+
+    for name in names:
+        if not name.endswith(".jsonl"):
+            continue
+        path = os.path.join(sessions_dir, name)
+        stat = os.stat(path)
+        sessions.append(SessionInfo(
+            os.path.splitext(name)[0], path, stat.st_size, stat.st_mtime, _first_prompt(path)
+        ))
+
+    sessions.sort(key=lambda session: session.modified, reverse=True)
+    return sessions
+
+
+def prune_sessions(
+        sessions_dir: str = DEFAULT_SESSIONS_DIR,
+        max_age: float = None,
+        keep: int = None
+    ) -> List[SessionInfo]:
+    """
+    Removes the sessions unused for `max_age` seconds, and all but the `keep` most recent;
+    returns the removed ones
+    """
+    now = time.time()
+    removed = []
+    for i, session in enumerate(list_sessions(sessions_dir)):
+        if (max_age is not None and now - session.modified > max_age) or \
+                (keep is not None and i >= keep):
+            os.remove(session.path)
+            removed.append(session)
+    return removed
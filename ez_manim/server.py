@@ -0,0 +1,638 @@
+import os
+import json
+import time
+import shutil
+import asyncio
+import secrets
+import logging
+import itertools
+from urllib.parse import parse_qs, urlsplit
+from typing import *
+
+from .core import Core
+from .core.jobs import Job, JobQueue
+from .core.mwrapper import CANCELLED, MWrapper
+from .core.watchdog import LIMIT_EXCEEDED, LimitExceeded, RenderLimits, RenderScheduler
+from .core.workspace import MediaGC
+from .llm import BaseLLM, OpenAIManim
+from .utils import lazy_import
+
+rich_console = lazy_import("rich.console")
+
+
+# request bodies are prompts, anything bigger is a mistake
+MAX_BODY_BYTES = 1 << 20
+
+# video downloads are streamed in chunks of this size
+CHUNK_SIZE = 1 << 16
+
+STATUS_TEXT = {
+    200: "OK", 201: "Created", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 409: "Conflict", 410: "Gone", 413: "Payload Too Large",
+    429: "Too Many Requests", 500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, headers: Dict[str, str] = None) -> None:
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class SessionJob:
+    """
+    One prompt of a session: the llm call, then the render of its code
+    """
+
+    QUEUED = "queued"
+    GENERATING = "generating"
+    RENDERING = "rendering"
+    DONE = "done"
+    FAILED = "failed"
+    INVALID = "invalid"
+    CANCELLED = "cancelled"
+
+    FINISHED = (DONE, FAILED, INVALID, CANCELLED)
+
+    def __init__(self, job_id: int, prompt: str) -> None:
+        self.id = job_id
+        self.prompt = prompt
+        self.status: str = self.QUEUED
+
+        self.code: Optional[str] = None
+        self.response: Optional[str] = None
+        self.returncode: Optional[int] = None
+        self.video: Optional[str] = None
+
+        # the limit the render was killed for
+        self.limit: Optional[LimitExceeded] = None
+
+        self.created: float = time.time()
+        self.finished: Optional[float] = None
+
+        # set by `cancel`, the running pool job is cancelled through it
+        self.cancelled: bool = False
+        self.pool_job: Optional[Job] = None
+
+        # replaced on every status change, waiters hold the previous one
+        self._changed: asyncio.Event = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in self.FINISHED
+
+    def set_status(self, status: str) -> None:
+        self.status = status
+        if self.done:
+            self.finished = time.time()
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait_change(self, timeout: float) -> bool:
+        """
+        Waits for the next status change, returns False on timeout
+        """
+        changed = self._changed
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        if self.pool_job is not None:
+            self.pool_job.cancel.set()
+        if self.status == self.QUEUED:
+            self.set_status(self.CANCELLED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(
+            id=self.id,
+            prompt=self.prompt,
+            status=self.status,
+            code=self.code,
+            response=self.response,
+            returncode=self.returncode,
+            video=self.video is not None,
+            limit=self.limit.to_dict() if self.limit is not None else None,
+            created=self.created,
+            finished=self.finished,
+        )
+
+
+class Session:
+    """
+    A user of the server: its own history, working directory and job queue;
+    its jobs run one at a time, in order
+    """
+
+    def __init__(self, session_id: str, core: Core, workdir: str, max_pending: int) -> None:
+        self.id = session_id
+        self.core = core
+        self.workdir = workdir
+
+        self.jobs: Dict[int, SessionJob] = {}
+        self._ids = itertools.count(1)
+
+        # backpressure: prompts beyond `max_pending` are rejected instead of queued
+        self.queue: "asyncio.Queue[SessionJob]" = asyncio.Queue(maxsize=max_pending)
+        self.task: Optional[asyncio.Task] = None
+
+        self.created: float = time.time()
+        # of the last request, idle sessions are deleted
+        self.last_used: float = self.created
+
+    @property
+    def busy(self) -> bool:
+        return any(not job.done for job in self.jobs.values())
+
+    def new_job(self, prompt: str) -> SessionJob:
+        job = SessionJob(next(self._ids), prompt)
+        self.queue.put_nowait(job)
+        self.jobs[job.id] = job
+        return job
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(
+            id=self.id,
+            quality=self.core.quality,
+            created=self.created,
+            pending=self.queue.qsize(),
+            jobs=[job.to_dict() for job in self.jobs.values()],
+        )
+
+
+class ManimServer:
+    """
+    Headless HTTP/JSON front of Core for many sessions on one event loop;
+    llm calls and renders run in shared, bounded thread pools
+
+    POST   /sessions                        {"quality": "l"} -> session
+    GET    /sessions/<id>                   session and its jobs
+    DELETE /sessions/<id>                   cancels its jobs, removes its files,
+                                            done after `session_timeout` idle seconds
+    POST   /sessions/<id>/jobs              {"prompt": "..."} -> job, 429 when the session is busy
+    GET    /sessions/<id>/jobs/<job>        job, `?wait=<seconds>` waits until it finishes
+    GET    /sessions/<id>/jobs/<job>/events one JSON line per status change
+    GET    /sessions/<id>/jobs/<job>/video  the rendered video, 410 once collected
+    POST   /sessions/<id>/jobs/<job>/cancel
+    """
+
+    def __init__(
+            self,
+            workdir: str = None,
+            llm_factory: Callable[[], BaseLLM] = None,
+            quality: str = "l",
+            llm_workers: int = 8,
+            render_workers: int = None,
+            max_sessions: int = 1000,
+            max_pending: int = 4,
+            session_timeout: float = 3600.0,
+            manim_command: List[str] = None,
+            max_media_bytes: int = 10 * 1024 ** 3,
+            max_media_age: float = 24 * 3600.0,
+            render_limits: RenderLimits = None
+        ) -> None:
+        self.workdir = os.path.abspath(workdir or os.path.join(os.getcwd(), "ez_manim_sessions"))
+        self.quality = quality
+        self.manim_command = manim_command
+
+        # every session gets its own llm (its own history), sharing one http client
+        self.llm_factory = llm_factory or OpenAIManim.factory()
+
+        # shared by all the sessions, bounds the threads whatever the number of users
+        self.pool = JobQueue(workers={
+            "llm": llm_workers,
+            "render": render_workers or os.cpu_count() or 1,
+        }, keep_finished=1000)
+
+        # every manim process of every session, within its time and memory limits
+        self.render_scheduler = RenderScheduler(render_workers, render_limits)
+
+        # one collector thread for the render workspaces of every session
+        self.media_gc = MediaGC(max_bytes=max_media_bytes, max_age=max_media_age)
+
+        self.max_sessions = max_sessions
+        self.max_pending = max_pending
+        self.sessions: Dict[str, Session] = {}
+
+        # sessions without requests nor running jobs for this long are deleted
+        self.session_timeout = session_timeout
+        self._reaper: Optional[asyncio.Task] = None
+
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8000) -> asyncio.AbstractServer:
+        os.makedirs(self.workdir, exist_ok=True)
+        self.media_gc.start()
+        self._reaper = asyncio.get_running_loop().create_task(self._reap_sessions())
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server
+
+    async def serve_forever(self, host: str = "127.0.0.1", port: int = 8000) -> None:
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._reaper is not None:
+            self._reaper.cancel()
+        for session_id in list(self.sessions):
+            await self.delete_session(session_id)
+        self.pool.shutdown()
+        self.media_gc.stop()
+
+    # sessions
+
+    async def create_session(self, quality: str = None) -> Session:
+        if len(self.sessions) >= self.max_sessions:
+            raise HTTPError(503, "too many sessions", {"Retry-After": "30"})
+
+        session_id = secrets.token_hex(8)
+        workdir = os.path.join(self.workdir, session_id)
+        os.makedirs(workdir)
+
+        quality = quality or self.quality
+        core = Core(
+            console=rich_console.Console(quiet=True),
+            llm=self.llm_factory(),
+            quality=quality,
+            mwrapper=MWrapper(
+                quality=quality,
+                preview=False,
+                manim_command=self.manim_command,
+                cwd=workdir,
+                isolate_jobs=True,
+                media_gc=self.media_gc,
+                scheduler=self.render_scheduler
+            )
+        )
+
+        session = Session(session_id, core, workdir, self.max_pending)
+        session.task = asyncio.get_running_loop().create_task(self._run_session(session))
+        self.sessions[session_id] = session
+        return session
+
+    async def delete_session(self, session_id: str) -> None:
+        session = self._session(session_id)
+        del self.sessions[session_id]
+
+        running = []
+        for job in session.jobs.values():
+            if not job.done:
+                job.cancel()
+                if job.pool_job is not None and not job.pool_job.future.done():
+                    running.append(asyncio.wrap_future(job.pool_job.future))
+        session.task.cancel()
+        try:
+            await session.task
+        except asyncio.CancelledError:
+            pass
+
+        # a cancelled render stops within a poll interval, its files go with the workdir
+        if running:
+            await asyncio.wait(running, timeout=10.0)
+
+        session.core.mwrapper.close()
+        await asyncio.get_running_loop().run_in_executor(
+            None, shutil.rmtree, session.workdir, True
+        )
+
+    async def _reap_sessions(self) -> None:
+        """
+        Deletes the sessions idle for longer than `session_timeout`
+        """
+        while True:
+            await asyncio.sleep(min(self.session_timeout / 4, 60.0))
+            expired = time.time() - self.session_timeout
+            for session in list(self.sessions.values()):
+                if session.last_used < expired and not session.busy and session.id in self.sessions:
+                    logging.info(f"session {session.id} expired")
+                    try:
+                        await self.delete_session(session.id)
+                    except Exception as e:
+                        logging.error(f"could not delete session {session.id}: {e}")
+
+    async def _run_session(self, session: Session) -> None:
+        """
+        Runs the jobs of the session in order, the llm and render steps in the shared pools
+        """
+        while True:
+            job = await session.queue.get()
+            if job.cancelled:
+                continue
+            try:
+                await self._run_job(session, job)
+            except asyncio.CancelledError:
+                job.cancel()
+                raise
+            except Exception as e:
+                logging.error(f"session {session.id} job {job.id} failed: {e}")
+                job.response = f"{type(e).__name__}: {e}"
+                job.set_status(SessionJob.FAILED)
+
+    async def _run_job(self, session: Session, job: SessionJob) -> None:
+        core = session.core
+
+        job.set_status(SessionJob.GENERATING)
+        job.pool_job = self.pool.submit(
+            "llm", lambda ui, cancel: core.ask_code(ui), job.prompt, description=job.prompt
+        )
+        job.code = await asyncio.wrap_future(job.pool_job.future)
+
+        if self._pool_failed(job):
+            return
+        if job.cancelled:
+            return job.set_status(SessionJob.CANCELLED)
+        if job.code is None:
+            return job.set_status(SessionJob.INVALID)
+
+        job.set_status(SessionJob.RENDERING)
+        job.pool_job = self.pool.submit(
+            "render", core.render_code, job.code, description=job.prompt
+        )
+        result = await asyncio.wrap_future(job.pool_job.future)
+
+        if self._pool_failed(job):
+            return
+        if job.cancelled or result is None or result[1] == CANCELLED:
+            return job.set_status(SessionJob.CANCELLED)
+
+        job.response, job.returncode = result
+        mwrapper = core.mwrapper
+        if job.returncode == LIMIT_EXCEEDED:
+            job.limit = getattr(job.response, "limit", None)
+        if not job.returncode and mwrapper.scene_to_render is not None:
+            video = mwrapper.output_path(mwrapper.code_path, mwrapper.scene_to_render)
+            if os.path.exists(video):
+                # a name of its own in the render workspace, later renders can't replace it
+                job.video = os.path.join(mwrapper.workspace, f"job-{job.id}.mp4")
+                os.replace(video, job.video)
+
+        job.set_status(SessionJob.FAILED if job.returncode else SessionJob.DONE)
+
+    @staticmethod
+    def _pool_failed(job: SessionJob) -> bool:
+        """
+        The pool keeps the error of a job that raised and resolves it to None,
+        the session job fails with it
+        """
+        pool_job = job.pool_job
+        if pool_job.status != Job.FAILED:
+            return False
+        logging.error(f"job {job.id} failed: {pool_job.error}")
+        job.response = str(pool_job.error)
+        job.set_status(SessionJob.FAILED)
+        return True
+
+    def _session(self, session_id: str) -> Session:
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HTTPError(404, f"unknown session {session_id}")
+        session.last_used = time.time()
+        return session
+
+    def _job(self, session: Session, job_id: str) -> SessionJob:
+        job = session.jobs.get(int(job_id)) if job_id.isdigit() else None
+        if job is None:
+            raise HTTPError(404, f"unknown job {job_id}")
+        return job
+
+    # http
+
+    async def _handle_connection(
+            self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+        ) -> None:
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, query, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                try:
+                    await self._dispatch(writer, method, path, query, body)
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": str(e)}, e.headers)
+                except Exception as e:
+                    logging.error(f"{method} {path} failed: {e}")
+                    await self._send_json(writer, 500, {"error": f"{type(e).__name__}: {e}"})
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except HTTPError as e:
+            # malformed request, the connection can't be reused
+            await self._send_json(writer, e.status, {"error": str(e)})
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        line = await reader.readline()
+        if not line:
+            return None
+
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "malformed request line")
+
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise HTTPError(400, "invalid content-length")
+        if length < 0:
+            raise HTTPError(400, "invalid content-length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, "request body too large")
+        body = await reader.readexactly(length) if length else b""
+
+        url = urlsplit(target)
+        return method.upper(), url.path.rstrip("/") or "/", parse_qs(url.query), headers, body
+
+    async def _dispatch(
+            self,
+            writer: asyncio.StreamWriter,
+            method: str,
+            path: str,
+            query: Dict[str, List[str]],
+            body: bytes
+        ) -> None:
+        parts = path.strip("/").split("/")
+
+        if parts == ["health"] and method == "GET":
+            return await self._send_json(writer, 200, {
+                "sessions": len(self.sessions),
+                "jobs": len(self.pool.jobs(active_only=True)),
+                "renders": self.render_scheduler.stats(),
+            })
+
+        if parts[0] != "sessions":
+            raise HTTPError(404, f"unknown path {path}")
+
+        if len(parts) == 1:
+            if method != "POST":
+                raise HTTPError(405, "use POST to create a session")
+            data = self._json_body(body)
+            quality = data.get("quality")
+            if quality is not None and quality not in ("l", "m", "h", "p", "k"):
+                raise HTTPError(400, f"unknown quality {quality}")
+            session = await self.create_session(quality)
+            return await self._send_json(writer, 201, session.to_dict())
+
+        session = self._session(parts[1])
+
+        if len(parts) == 2:
+            if method == "GET":
+                return await self._send_json(writer, 200, session.to_dict())
+            if method == "DELETE":
+                await self.delete_session(session.id)
+                return await self._send_json(writer, 200, {"deleted": session.id})
+            raise HTTPError(405, f"{method} not allowed on a session")
+
+        if parts[2] != "jobs":
+            raise HTTPError(404, f"unknown path {path}")
+
+        if len(parts) == 3:
+            if method != "POST":
+                raise HTTPError(405, "use POST to send a prompt")
+            prompt = str(self._json_body(body).get("prompt", "")).strip()
+            if not prompt:
+                raise HTTPError(400, "missing prompt")
+            try:
+                job = session.new_job(prompt)
+            except asyncio.QueueFull:
+                raise HTTPError(429, "too many pending prompts in this session", {"Retry-After": "5"})
+            return await self._send_json(writer, 202, job.to_dict())
+
+        job = self._job(session, parts[3])
+        action = parts[4] if len(parts) > 4 else None
+
+        if action is None and method == "GET":
+            try:
+                wait = float(query.get("wait", ["0"])[0])
+            except ValueError:
+                raise HTTPError(400, "wait must be a number of seconds")
+            deadline = time.monotonic() + min(wait, 300.0)
+            while not job.done and time.monotonic() < deadline:
+                await job.wait_change(deadline - time.monotonic())
+            return await self._send_json(writer, 200, job.to_dict())
+
+        if action == "events" and method == "GET":
+            return await self._send_events(writer, job)
+
+        if action == "video" and method == "GET":
+            if job.video is None:
+                raise HTTPError(409 if not job.done else 404, f"job {job.id} has no video")
+            return await self._send_file(writer, job.video, "video/mp4")
+
+        if action == "cancel" and method == "POST":
+            job.cancel()
+            return await self._send_json(writer, 200, job.to_dict())
+
+        raise HTTPError(404, f"unknown path {path}")
+
+    @staticmethod
+    def _json_body(body: bytes) -> Dict[str, Any]:
+        if not body:
+            return {}
+        try:
+            data = json.loads(body)
+        except ValueError:
+            raise HTTPError(400, "body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "body must be a JSON object")
+        return data
+
+    def _write_head(
+            self, writer: asyncio.StreamWriter, status: int, headers: Dict[str, str]
+        ) -> None:
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+    async def _send_json(
+            self,
+            writer: asyncio.StreamWriter,
+            status: int,
+            data: Any,
+            headers: Dict[str, str] = None
+        ) -> None:
+        raw = json.dumps(data).encode()
+        self._write_head(writer, status, {
+            "Content-Type": "application/json",
+            "Content-Length": str(len(raw)),
+            **(headers or {}),
+        })
+        writer.write(raw)
+        await writer.drain()
+
+    async def _send_chunk(self, writer: asyncio.StreamWriter, data: bytes) -> None:
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        await writer.drain()
+
+    async def _send_events(self, writer: asyncio.StreamWriter, job: SessionJob) -> None:
+        """
+        One JSON line per status change until the job finishes
+        """
+        self._write_head(writer, 200, {
+            "Content-Type": "application/x-ndjson",
+            "Transfer-Encoding": "chunked",
+        })
+
+        while True:
+            status = job.status
+            await self._send_chunk(writer, (json.dumps(job.to_dict()) + "\n").encode())
+            if job.done:
+                break
+            while job.status == status:
+                await job.wait_change(30.0)
+
+        await self._send_chunk(writer, b"")
+
+    async def _send_file(self, writer: asyncio.StreamWriter, path: str, content_type: str) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            fp = open(path, "rb")
+        except FileNotFoundError:
+            # the media gc removed the workspace
+            raise HTTPError(410, f"{os.path.basename(path)} was removed, render it again")
+        with fp:
+            self._write_head(writer, 200, {
+                "Content-Type": content_type,
+                "Content-Length": str(os.fstat(fp.fileno()).st_size),
+                "Content-Disposition": f'attachment; filename="{os.path.basename(path)}"',
+            })
+            while True:
+                # disk reads off the event loop
+                chunk = await loop.run_in_executor(None, fp.read, CHUNK_SIZE)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000, **kwargs) -> None:
+    """
+    Runs a ManimServer until interrupted
+    """
+    server = ManimServer(**kwargs)
+    try:
+        asyncio.run(server.serve_forever(host, port))
+    except KeyboardInterrupt:
+        pass
@@ -1,4 +1,11 @@
 # empty
 
-from .imports import LazyModule
-from .tokens import num_tokens_from_messages
+from .imports import LazyModule, lazy_import
+from .tokens import (
+    Tokenizer,
+    approx_num_tokens_from_messages,
+    get_tokenizer,
+    num_tokens_from_messages,
+    register_tokenizer
+)
+from .profiling import Tracer, tracer
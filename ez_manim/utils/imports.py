@@ -1,16 +1,18 @@
 import os
+import sys
 import logging
 import importlib
 from typing import Any
 from types import ModuleType
-import importlib.metadata as importlib_metadata
 
 
 def check_import(package: str) -> bool:
     """
     Check if a package is available.
     """
-    
+    # importlib.metadata is slow to import, only pay for it here
+    import importlib.metadata as importlib_metadata
+
     try:
         importlib_metadata.version(package)
         return True
@@ -21,6 +23,37 @@ def check_import(package: str) -> bool:
         return False
     
 
+class LazyImport(ModuleType):
+    """
+    Stands in for a heavy third party module and only imports it when one of its attributes is used.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._module = None
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            self._module = importlib.import_module(self.__name__)
+        return self._module
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._load(), name)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    The module if it is already imported, else a proxy that imports it on first use.
+    """
+
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyImport(name)
+
+
 def build_all_paths(structure, current_path: list = None, result: dict = None):
     """
     Recursively build a dictionary of paths from a nested dictionary.
@@ -0,0 +1,142 @@
+import json
+import time
+import threading
+from collections import defaultdict
+from typing import *
+
+
+class Span:
+    """
+    A timed section of a turn
+    """
+
+    __slots__ = ("name", "turn", "start", "end", "attrs")
+
+    def __init__(self, name: str, turn: int, attrs: Dict[str, Any]) -> None:
+        self.name = name
+        self.turn = turn
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attrs = attrs
+
+    @property
+    def seconds(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(name=self.name, turn=self.turn, seconds=self.seconds, **self.attrs)
+
+
+class _SpanContext:
+    def __init__(self, tracer: "Tracer", span: Span) -> None:
+        self._tracer = tracer
+        self._span = span
+
+    def __enter__(self) -> Span:
+        return self._span
+
+    def __exit__(self, *exc) -> None:
+        self._span.end = time.perf_counter()
+        self._tracer._add(self._span)
+
+
+class _NoopSpan:
+    """
+    Returned when tracing is disabled, costs one attribute lookup
+    """
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Tracer:
+    """
+    Collects timing spans per turn, exports them as JSONL or a prometheus text snapshot
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.turn: int = 0
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **attrs):
+        """
+        with tracer.span("llm.generate") as span: ...
+        """
+        if not self.enabled:
+            return _NOOP
+        return _SpanContext(self, Span(name, self.turn, attrs))
+
+    def record(self, name: str, seconds: float, **attrs) -> None:
+        """
+        Adds a span measured elsewhere
+        """
+        if not self.enabled:
+            return
+        span = Span(name, self.turn, attrs)
+        span.start -= seconds
+        span.end = span.start + seconds
+        self._add(span)
+
+    def new_turn(self) -> int:
+        self.turn += 1
+        return self.turn
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans = []
+
+    def turn_spans(self, turn: int = None) -> List[Span]:
+        turn = self.turn if turn is None else turn
+        with self._lock:
+            return [span for span in self.spans if span.turn == turn]
+
+    def export_jsonl(self, path: str) -> None:
+        with self._lock:
+            spans = list(self.spans)
+        with open(path, "a") as fp:
+            for span in spans:
+                fp.write(json.dumps(span.to_dict()) + "\n")
+
+    def prometheus(self) -> str:
+        """
+        Count and total seconds of every span name, in the prometheus text format
+        """
+        counts: Dict[str, int] = defaultdict(int)
+        totals: Dict[str, float] = defaultdict(float)
+
+        with self._lock:
+            for span in self.spans:
+                counts[span.name] += 1
+                totals[span.name] += span.seconds
+
+        lines = [
+            "# HELP ez_manim_span_seconds Time spent in each stage of a turn",
+            "# TYPE ez_manim_span_seconds summary",
+        ]
+        for name in sorted(counts):
+            lines.append(f'ez_manim_span_seconds_count{{span="{name}"}} {counts[name]}')
+            lines.append(f'ez_manim_span_seconds_sum{{span="{name}"}} {totals[name]:.6f}')
+
+        return "\n".join(lines) + "\n"
+
+    def _add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+
+# process wide tracer, disabled until profiling is switched on
+tracer = Tracer()
@@ -1,28 +1,180 @@
-import tiktoken
-from typing import List, Dict
+import os
+import math
+from functools import lru_cache
+from typing import List, Dict, Tuple
+
+from .imports import lazy_import
+
+
+tiktoken = lazy_import("tiktoken")
+
+# tiktoken downloads the BPE files on first use, keep them so offline startup works
+TIKTOKEN_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ez_manim", "tiktoken")
+
+# message lists at least this long are encoded with tiktoken's threaded batch encoder
+BATCH_THRESHOLD = 16
+
+
+@lru_cache(maxsize=None)
+def get_encoding_by_name(encoding_name: str):
+    """
+    A tiktoken encoding by name, loaded once per process
+    """
+    os.environ.setdefault("TIKTOKEN_CACHE_DIR", TIKTOKEN_CACHE_DIR)
+
+    return tiktoken.get_encoding(encoding_name)
+
+
+class Tokenizer:
+    """
+    How a family of models encodes chat messages:
+    the tiktoken encoding plus the per-message overhead of the chat format
+    """
+
+    def __init__(
+            self,
+            encoding_name: str,
+            tokens_per_message: int = 3,
+            tokens_per_name: int = 1,
+            reply_tokens: int = 3,
+            bytes_per_token: float = 3.6,
+            num_threads: int = 8
+        ) -> None:
+        self.encoding_name = encoding_name
+        self.tokens_per_message = tokens_per_message
+        self.tokens_per_name = tokens_per_name
+        self.reply_tokens = reply_tokens
+
+        # used by the approximate counter, see `calibrate`
+        self.bytes_per_token = bytes_per_token
+        self.num_threads = num_threads
+
+    @property
+    def encoding(self):
+        return get_encoding_by_name(self.encoding_name)
+
+    def count_each(self, messages: List[Dict[str, str]]) -> List[int]:
+        """
+        Exact token count of every message on its own, reply priming included
+        """
+        values = [value for message in messages for value in message.values()]
+
+        # ordinary encoding in both paths: the counts don't depend on the batch size,
+        # and special token text like <|endoftext|> in a message is counted, not refused
+        if len(messages) >= BATCH_THRESHOLD:
+            lengths = iter(
+                len(tokens) for tokens in
+                self.encoding.encode_ordinary_batch(values, num_threads=self.num_threads)
+            )
+        else:
+            lengths = iter(len(self.encoding.encode_ordinary(value)) for value in values)
+
+        counts = []
+        for message in messages:
+            num_tokens = self.tokens_per_message + self.reply_tokens
+            for key in message:
+                num_tokens += next(lengths)
+                if key == "name":
+                    num_tokens += self.tokens_per_name
+            counts.append(num_tokens)
+
+        return counts
+
+    def count(self, messages: List[Dict[str, str]]) -> int:
+        """
+        Exact number of tokens used by a list of messages
+        """
+        if not messages:
+            return self.reply_tokens
+        # every message counted the reply priming once
+        return sum(self.count_each(messages)) - self.reply_tokens * (len(messages) - 1)
+
+    def approx_count(self, messages: List[Dict[str, str]]) -> int:
+        """
+        Cheap estimate from the byte length of the messages, no encoding
+        """
+        num_tokens = self.reply_tokens
+        for message in messages:
+            num_tokens += self.tokens_per_message
+            for key, value in message.items():
+                num_tokens += math.ceil(len(value.encode()) / self.bytes_per_token)
+                if key == "name":
+                    num_tokens += self.tokens_per_name
+        return num_tokens
+
+    def calibrate(self, texts: List[str]) -> float:
+        """
+        Sets `bytes_per_token` from the real encoder on sample texts, returns it
+        """
+        num_bytes = sum(len(text.encode()) for text in texts)
+        num_tokens = sum(
+            len(tokens) for tokens in
+            self.encoding.encode_ordinary_batch(texts, num_threads=self.num_threads)
+        )
+        if num_tokens:
+            self.bytes_per_token = num_bytes / num_tokens
+        return self.bytes_per_token
+
+
+# (model name prefix, tokenizer), the longest matching prefix wins
+_TOKENIZERS: List[Tuple[str, Tokenizer]] = []
+
+
+def register_tokenizer(model_prefix: str, tokenizer: Tokenizer) -> None:
+    """
+    Use `tokenizer` for every model whose name starts with `model_prefix`
+    """
+    _TOKENIZERS[:] = [entry for entry in _TOKENIZERS if entry[0] != model_prefix]
+    _TOKENIZERS.append((model_prefix, tokenizer))
+    _TOKENIZERS.sort(key=lambda entry: -len(entry[0]))
+    get_tokenizer.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(model: str) -> Tokenizer:
+    """
+    The registered tokenizer of the model, cl100k_base for unknown models
+    """
+    for prefix, tokenizer in _TOKENIZERS:
+        if model.startswith(prefix):
+            return tokenizer
+    return DEFAULT_TOKENIZER
+
+
+DEFAULT_TOKENIZER = Tokenizer("cl100k_base")
+
+# counts of the original gpt-3.5-turbo-0613 helper, which counted every gpt-3.5-turbo
+# request whatever the model name; kept so the windows of existing setups don't shift
+register_tokenizer(
+    "gpt-3.5-turbo",
+    Tokenizer("cl100k_base", tokens_per_message=4, tokens_per_name=-1, reply_tokens=2)
+)
+register_tokenizer(
+    "gpt-3.5-turbo-0301",
+    Tokenizer("cl100k_base", tokens_per_message=4, tokens_per_name=-1, reply_tokens=3)
+)
+register_tokenizer("gpt-3.5", Tokenizer("cl100k_base"))
+register_tokenizer("gpt-4", Tokenizer("cl100k_base"))
+for _prefix in ("gpt-4o", "gpt-4.1", "gpt-4.5", "gpt-5", "o1", "o3", "o4"):
+    register_tokenizer(_prefix, Tokenizer("o200k_base"))
 
 
 # based on https://platform.openai.com/docs/guides/text-generation/managing-tokens
 def num_tokens_from_messages(
-        messages: List[Dict[str, str]], 
+        messages: List[Dict[str, str]],
         model: str = "gpt-3.5-turbo-0613"
     ):
     """
     Returns the number of tokens used by a list of messages.
     """
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-    except KeyError:
-        encoding = tiktoken.get_encoding("cl100k_base")
-    if model == "gpt-3.5-turbo-0613":  # note: future models may deviate from this
-        num_tokens = 0
-        for message in messages:
-            num_tokens += 4  # every message follows <im_start>{role/name}\n{content}<im_end>\n
-            for key, value in message.items():
-                num_tokens += len(encoding.encode(value))
-                if key == "name":  # if there's a name, the role is omitted
-                    num_tokens += -1  # role is always required and always 1 token
-        num_tokens += 2  # every reply is primed with <im_start>assistant
-        return num_tokens
-    else:
-        raise NotImplementedError(f"""num_tokens_from_messages() is not presently implemented for model {model}. See https://github.com/openai/openai-python/blob/main/chatml.md for information on how messages are converted to tokens.""")
\ No newline at end of file
+    return get_tokenizer(model).count(messages)
+
+
+def approx_num_tokens_from_messages(
+        messages: List[Dict[str, str]],
+        model: str = "gpt-3.5-turbo-0613"
+    ):
+    """
+    Returns an estimate of the number of tokens used by a list of messages, without encoding them.
+    """
+    return get_tokenizer(model).approx_count(messages)
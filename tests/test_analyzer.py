@@ -0,0 +1,71 @@
+import pytest
+
+from ez_manim.core.analyzer import analyze_code
+
+
+def scene(body, header="import math\n"):
+    lines = "\n".join("        " + line for line in body.splitlines())
+    return f"{header}\nclass A(Scene):\n    def construct(self):\n{lines}\n"
+
+
+def test_counts_play_and_wait_with_run_times():
+    analysis = analyze_code(scene("self.play(x, run_time=2)\nself.wait(0.5)\nself.play(y)"))
+    assert analysis.ok
+    info = analysis.scenes[0]
+    assert (info.num_play, info.num_wait, info.num_animations) == (2, 1, 3)
+    assert info.run_time == pytest.approx(3.5)
+
+
+def test_constant_loops_multiply():
+    analysis = analyze_code(scene("for i in range(2, 8, 2):\n    self.play(x)\nfor c in [1, 2]:\n    self.wait()"))
+    info = analysis.scenes[0]
+    assert (info.num_play, info.num_wait) == (3, 2)
+
+
+@pytest.mark.parametrize("loop", [
+    "range(0, 10, 0)",
+    "range(1, 2, 3, 4)",
+    "range(10 ** 100)",
+    "range(n)",
+])
+def test_odd_loops_count_once_and_never_raise(loop):
+    analysis = analyze_code(scene(f"for i in {loop}:\n    self.play(x)"))
+    assert analysis.ok
+    assert analysis.scenes[0].num_play == 1
+
+
+def test_syntax_error():
+    analysis = analyze_code("class A(Scene:\n")
+    assert not analysis.ok
+    assert analysis.errors[0].startswith("SyntaxError")
+
+
+def test_unknown_import():
+    analysis = analyze_code(scene("pass", header="import surely_not_a_module_xyz"))
+    assert analysis.errors == ["ImportError: unknown module surely_not_a_module_xyz (line 1)"]
+
+
+@pytest.mark.parametrize("handler", ["ImportError", "(ImportError, OSError)", "ModuleNotFoundError", ""])
+def test_optional_imports_are_not_flagged(handler):
+    header = f"try:\n    import surely_not_a_module_xyz\nexcept {handler}:\n    pass"
+    assert analyze_code(scene("pass", header=header)).ok
+
+
+def test_import_guarded_by_another_exception_is_flagged():
+    header = "try:\n    import surely_not_a_module_xyz\nexcept KeyError:\n    pass"
+    assert not analyze_code(scene("pass", header=header)).ok
+
+
+def test_scenes_deriving_from_scenes():
+    code = "class Base(MovingCameraScene):\n    def construct(self):\n        self.play(x)\n\nclass Child(Base):\n    pass\n\nclass Helper:\n    pass\n"
+    analysis = analyze_code(code, check_imports=False)
+    assert analysis.scene_names == ["Base", "Child"]
+    assert analysis.scenes[1].num_play == 1
+
+
+def test_no_scene():
+    assert analyze_code("x = 1").errors == ["No Scene class found in the code"]
+
+
+def test_manim_is_always_importable():
+    assert analyze_code(scene("pass", header="from manim import *\nimport manim.utils.color")).ok
@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+from ez_manim.core.cache import RenderCache, normalize_code
+
+
+CODE = "from manim import *\n\nclass A(Scene):\n    def construct(self):\n        pass\n"
+
+
+@pytest.fixture
+def video(tmp_path):
+    def make(name, size):
+        path = tmp_path / name
+        path.write_bytes(b"x" * size)
+        return str(path)
+    return make
+
+
+def test_key_ignores_comments_and_whitespace(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"))
+    reformatted = "# a comment\n" + CODE.replace("pass", "pass  # nothing")
+    assert cache.key(CODE, "A", "l") == cache.key(reformatted, "A", "l")
+    assert cache.key(CODE, "A", "l") != cache.key(CODE, "A", "h")
+    assert cache.key(CODE, "A", "l") != cache.key(CODE, "B", "l")
+
+
+def test_key_of_broken_code_is_none(tmp_path):
+    assert normalize_code("def (") is None
+    assert RenderCache(str(tmp_path / "cache")).key("def (", "A", "l") is None
+
+
+def test_put_and_get(tmp_path, video):
+    cache = RenderCache(str(tmp_path / "cache"))
+    key = cache.key(CODE, "A", "l")
+    assert cache.get(key) is None
+
+    cached = cache.put(key, video("A.mp4", 10))
+    assert cache.get(key) == cached
+    assert cache.stats() == dict(hits=1, misses=1, entries=1, bytes=10)
+
+
+def test_evicts_the_least_recently_used(tmp_path, video):
+    cache = RenderCache(str(tmp_path / "cache"), max_bytes=25)
+    cache.put("a", video("a.mp4", 10))
+    cache.put("b", video("b.mp4", 10))
+    cache.get("a")
+    cache.put("c", video("c.mp4", 10))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.size == 20
+
+
+def test_index_survives_a_restart(tmp_path, video):
+    cache = RenderCache(str(tmp_path / "cache"))
+    cache.put("a", video("a.mp4", 10))
+
+    reopened = RenderCache(str(tmp_path / "cache"))
+    assert reopened.get("a") is not None
+
+
+def test_missing_file_is_a_miss(tmp_path, video):
+    cache = RenderCache(str(tmp_path / "cache"))
+    os.remove(cache.put("a", video("a.mp4", 10)))
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_video_larger_than_the_cache_is_not_stored(tmp_path, video):
+    cache = RenderCache(str(tmp_path / "cache"), max_bytes=5)
+    assert cache.put("a", video("a.mp4", 10)) is None
+    assert cache.stats()["entries"] == 0
+    assert not os.path.exists(tmp_path / "cache" / "a.mp4")
+
+
+def test_hits_are_written_on_close(tmp_path, video):
+    cache = RenderCache(str(tmp_path / "cache"))
+    cache.put("a", video("a.mp4", 10))
+    cache.put("b", video("b.mp4", 10))
+    index = tmp_path / "cache" / RenderCache.INDEX_FILE
+    written = index.read_text()
+
+    cache.get("a")
+    assert index.read_text() == written
+    cache.close()
+
+    reopened = RenderCache(str(tmp_path / "cache"))
+    assert list(reopened._index) == ["b", "a"]
@@ -0,0 +1,76 @@
+from ez_manim.llm.compaction import CODE_PLACEHOLDER, SCENE_SPEC_HEADER, HistoryCompactor
+from ez_manim.llm.history import ChatHistory
+from ez_manim.llm.parser import CODE_PREFIX
+
+
+def words(messages):
+    return sum(len(message["content"].split()) for message in messages)
+
+
+def make_history(num_turns):
+    history = ChatHistory("system prompt", token_counter=words)
+    for i in range(num_turns):
+        history.append("user", f"request {i}")
+        history.append("assistant", f"{CODE_PREFIX} code {i} " + "x " * 20)
+    return history
+
+
+def test_latest_code_in_full_and_placeholders_before():
+    history = make_history(3)
+    window = HistoryCompactor(history, keep_turns=3).window(1000)
+    assert [m["content"] for m in window[::2]] == ["request 0", "request 1", "request 2"]
+    assert window[1]["content"] == CODE_PLACEHOLDER
+    assert window[-1] == history[-1]
+
+
+def test_older_requests_go_to_the_spec():
+    history = make_history(6)
+    window = HistoryCompactor(history, keep_turns=2).window(1000)
+    assert window[0]["role"] == "system"
+    assert window[0]["content"].splitlines() == [
+        SCENE_SPEC_HEADER, "- request 0", "- request 1", "- request 2"
+    ]
+    assert window[1]["content"] == "request 3"
+
+
+def test_refused_requests_are_not_in_the_spec():
+    history = make_history(1)
+    history.append("user", "not manim")
+    history.append("assistant", "-1")
+    for i in range(1, 4):
+        history.append("user", f"request {i}")
+        history.append("assistant", f"{CODE_PREFIX} code {i}")
+    window = HistoryCompactor(history, keep_turns=1).window(1000)
+    assert "not manim" not in window[0]["content"]
+
+
+def test_window_fits_and_drops_the_oldest_spec_items_first():
+    history = make_history(10)
+    compactor = HistoryCompactor(history, keep_turns=1)
+    latest = history.count(history.messages[-2:])
+    for num_tokens in range(0, 200):
+        window = compactor.window(num_tokens)
+        assert history.count(window) <= num_tokens
+        assert compactor.last_stats.compacted_tokens == history.count(window)
+
+    window = compactor.window(latest + words([{"content": SCENE_SPEC_HEADER}]) + 8)
+    assert window[0]["content"].splitlines()[1:] == ["- request 6", "- request 7"]
+
+
+def test_spec_is_kept_as_messages_are_added():
+    history = make_history(4)
+    compactor = HistoryCompactor(history, keep_turns=1)
+    compactor.window(1000)
+    for i in range(4, 8):
+        history.append("user", f"request {i}")
+        history.append("assistant", f"{CODE_PREFIX} code {i}")
+        assert compactor.window(1000) == HistoryCompactor(history, keep_turns=1).window(1000)
+
+
+def test_clearing_the_history_resets_the_spec():
+    history = make_history(6)
+    compactor = HistoryCompactor(history, keep_turns=1)
+    assert compactor.window(1000)[0]["role"] == "system"
+    history.clear()
+    history.append("user", "request")
+    assert compactor.window(1000) == [{"role": "user", "content": "request"}]
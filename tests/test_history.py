@@ -0,0 +1,71 @@
+from ez_manim.llm.history import ChatHistory
+
+
+def words(messages):
+    return sum(len(message["content"].split()) for message in messages)
+
+
+def make_history(*contents):
+    history = ChatHistory("system prompt", token_counter=words)
+    for i, content in enumerate(contents):
+        history.append("user" if i % 2 == 0 else "assistant", content)
+    return history
+
+
+def test_system_prompt_counts_zero():
+    history = ChatHistory("a long system prompt", token_counter=words)
+    assert history.token_counts == [0]
+    assert history.total_tokens == 0
+
+
+def test_append_caches_the_count():
+    history = make_history("one two", "three")
+    assert history.token_counts == [0, 2, 1]
+    assert history.total_tokens == 3
+
+
+def test_append_uses_a_given_count():
+    history = ChatHistory("system", token_counter=words)
+    assert history.append("user", "one two three", num_tokens=7) == 7
+    assert history.total_tokens == 7
+
+
+def test_window_keeps_the_latest_messages_that_fit():
+    history = make_history("a b c", "d e", "f", "g h")
+    assert [m["content"] for m in history.window(3)] == ["f", "g h"]
+    assert history.window_tokens(3) == 3
+    assert [m["content"] for m in history.window(100)] == ["a b c", "d e", "f", "g h"]
+    assert history.window(0) == []
+
+
+def test_window_excludes_system_messages_and_copies():
+    history = make_history("a", "b")
+    window = history.window(10)
+    assert all(message["role"] != "system" for message in window)
+    window[0]["content"] = "changed"
+    assert history[1]["content"] == "a"
+
+
+def test_extend_matches_append():
+    appended = make_history("a b", "c", "d e f")
+    extended = ChatHistory("system prompt", token_counter=words)
+    extended.extend([
+        {"role": "user", "content": "a b"},
+        {"role": "assistant", "content": "c"},
+        {"role": "user", "content": "d e f"},
+    ])
+    assert extended.token_counts == appended.token_counts
+    assert extended.window(4) == appended.window(4)
+
+
+def test_clear_resets_to_the_system_prompt():
+    history = make_history("a b", "c")
+    history.clear("new prompt")
+    assert len(history) == 1
+    assert history[0] == {"role": "system", "content": "new prompt"}
+    assert history.total_tokens == 0
+
+
+def test_approximate_counter_does_not_encode():
+    history = ChatHistory("system", approximate=True)
+    assert history.append("user", "x" * 360) > 0
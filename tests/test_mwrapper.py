@@ -0,0 +1,131 @@
+import os
+import sys
+
+import pytest
+
+from ez_manim.core.mwrapper import LIMIT_EXCEEDED, MWrapper, OutputParser, uses_this_interpreter
+from ez_manim.core.watchdog import RenderLimits, RenderScheduler
+from ez_manim.core.workers import RenderWorkerPool
+
+
+FAKE_MANIM = os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks", "fake_manim.py")
+
+
+def scenes(*names):
+    return "".join(
+        f"class {name}(Scene):\n    def construct(self):\n        self.play(Create(Circle()))\n\n"
+        for name in names
+    )
+
+
+@pytest.fixture
+def mwrapper(tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_MANIM_SECONDS", "0")
+    wrappers = []
+
+    def make(**kwargs):
+        kwargs.setdefault("preview", False)
+        kwargs.setdefault("quality", "l")
+        wrapper = MWrapper(cwd=str(tmp_path), manim_command=[sys.executable, FAKE_MANIM], **kwargs)
+        wrappers.append(wrapper)
+        return wrapper
+
+    yield make
+    for wrapper in wrappers:
+        wrapper.close()
+
+
+def test_render_from_string(mwrapper):
+    wrapper = mwrapper()
+    response, err = wrapper.render_from_string(scenes("A"))
+    assert err == 0, response
+    assert os.path.exists(wrapper.output_path(wrapper.code_path, "A"))
+
+
+def test_failed_worker_pool_falls_back_without_closing_shared_state(mwrapper, monkeypatch):
+    closed = []
+
+    def fail(self, *args, **kwargs):
+        raise RuntimeError("render worker could not import manim")
+
+    monkeypatch.setattr(RenderWorkerPool, "render", fail)
+    monkeypatch.setattr(RenderWorkerPool, "close", lambda self: closed.append(self))
+
+    wrapper = mwrapper(backend="worker")
+    pool = wrapper.workers
+    results, _ = wrapper.render_all_from_string(scenes("A", "B", "C"))
+
+    assert [result.ok for result in results] == [True, True, True]
+    assert wrapper.workers is None
+    # closed with the wrapper, not while sibling scenes were rendering
+    assert closed == []
+    wrapper.close()
+    assert closed == [pool]
+
+
+def test_edit_reuses_the_unchanged_animations(mwrapper):
+    wrapper = mwrapper()
+    wrapper.render_from_string(scenes("A"))
+    assert len(wrapper.last_segments.rendered) == 1
+
+    response, err = wrapper.render_from_string(scenes("A") + "        self.play(FadeOut(Circle()))\n")
+    assert err == 0, response
+    assert (len(wrapper.last_segments.reused), len(wrapper.last_segments.rendered)) == (1, 1)
+
+
+def test_scenes_rendered_together_keep_their_own_partial_movies(mwrapper, tmp_path):
+    wrapper = mwrapper()
+    results, _ = wrapper.render_all_from_string(scenes("A", "B"))
+    assert all(result.ok for result in results)
+
+    partials = tmp_path / "media" / "partial_movies" / "480p15"
+    assert sorted(os.listdir(partials)) == ["A", "B"]
+    assert not (tmp_path / "renders").exists()
+
+
+def test_killed_render_carries_its_limit(mwrapper, monkeypatch):
+    monkeypatch.setenv("FAKE_MANIM_SECONDS", "5")
+    scheduler = RenderScheduler(limits=RenderLimits(wall_seconds=0.3), poll_interval=0.05)
+    wrapper = mwrapper(scheduler=scheduler)
+
+    response, err = wrapper.render_from_string(scenes("A"))
+    assert err == LIMIT_EXCEEDED
+    assert response.limit.limit == "wall"
+    assert response == str(response.limit)
+    assert scheduler.stats()["killed"] == {"wall": 1}
+
+
+def test_output_parser_follows_progress_and_segments():
+    parser = OutputParser(total=2)
+    assert parser.feed("Manim Community v0.18.0") is None
+
+    progress = parser.feed("Animation 0 : Using cached data (hash : 1234)")
+    assert (progress.animation, progress.total, progress.completed) == (1, 2, 1)
+
+    progress = parser.feed("\rAnimation 1: Create(Circle):  50%|#####     |")
+    assert progress.completed == 1.5
+    parser.feed("Animation 1 : Partial movie file written in '/tmp/1.mp4'")
+
+    segments = parser.segments()
+    assert (segments.reused, segments.rendered) == ([0], [1])
+    assert str(segments) == "1/2 animations reused"
+
+
+def test_output_parser_grows_the_total_with_loops():
+    parser = OutputParser(total=1)
+    parser.feed("Animation 3: Write(Text):  10%|#")
+    assert parser.progress.total == 4
+    assert parser.segments() is None
+
+
+def test_imports_are_only_checked_in_this_interpreter():
+    assert uses_this_interpreter([sys.executable, "-m", "manim"])
+    assert not uses_this_interpreter(["docker", "run", "manimcommunity/manim", "manim"])
+
+
+def test_candidates_leave_no_media_behind(mwrapper, tmp_path):
+    wrapper = mwrapper()
+    winner, results = wrapper.render_candidates([scenes("A"), scenes("A")])
+
+    assert winner is not None and results[winner].ok
+    assert not os.listdir(tmp_path / "media" / "videos")
@@ -0,0 +1,67 @@
+import pytest
+
+from ez_manim.llm.parser import StreamParser, extract_code
+
+
+RESPONSE = "Manim code:\n```python\nfrom manim import *\n\nclass A(Scene):\n    pass\n```\nsome trailing text"
+CODE = "\nfrom manim import *\n\nclass A(Scene):\n    pass\n"
+
+
+def feed_all(chunks):
+    parser = StreamParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        if parser.done:
+            break
+    parser.finish()
+    return parser
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, len(RESPONSE)])
+def test_code_is_complete_at_the_closing_fence(size):
+    parser = feed_all(RESPONSE[i:i + size] for i in range(0, len(RESPONSE), size))
+    assert parser.status == StreamParser.CODE
+    assert parser.code_complete
+    assert parser.code == CODE
+    assert parser.response.endswith("```")
+    assert "trailing" not in parser.response
+
+
+def test_refusal_is_known_early():
+    parser = StreamParser()
+    assert parser.feed("-1") == StreamParser.REFUSAL
+    assert parser.done
+
+
+def test_pending_until_the_prefix_is_known():
+    parser = StreamParser()
+    assert parser.feed("Man") == StreamParser.PENDING
+    assert parser.feed("im code:") == StreamParser.CODE
+
+
+def test_other_text_is_a_refusal():
+    assert StreamParser().feed("Sorry, I can't") == StreamParser.REFUSAL
+
+
+def test_short_stream_is_a_refusal():
+    parser = StreamParser()
+    parser.feed("Man")
+    assert parser.finish() == StreamParser.REFUSAL
+
+
+def test_edit_waits_for_the_end_of_the_stream():
+    parser = feed_all(["Manim edit:\n", "<<<<<<< SEARCH\n", "a\n=======\nb\n>>>>>>> REPLACE\n"])
+    assert parser.status == StreamParser.EDIT
+    assert not parser.done
+
+
+def test_code_without_a_fence():
+    parser = feed_all(["Manim code: x = 1"])
+    assert parser.status == StreamParser.CODE
+    assert parser.code.strip() == "x = 1"
+
+
+def test_extract_code():
+    assert extract_code(RESPONSE) == CODE
+    assert extract_code("Manim code: x = 1") == "x = 1"
+    assert extract_code("Manim code:\n```python\nx = 1") == "\nx = 1"
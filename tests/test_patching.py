@@ -0,0 +1,60 @@
+import pytest
+
+from ez_manim.core.patching import PatchError, apply_edits, parse_edit_blocks
+
+
+CODE = """\
+import math
+
+
+class Demo(Scene):
+    def construct(self):
+        circle = Circle(color=RED)
+        self.play(Create(circle))
+"""
+
+
+def edit(search, replace):
+    return f"<<<<<<< SEARCH\n{search}\n=======\n{replace}\n>>>>>>> REPLACE"
+
+
+def test_parse_edit_blocks():
+    response = "Manim edit:\n" + edit("a", "b") + "\n" + edit("c\nd", "")
+    assert parse_edit_blocks(response) == [("a", "b"), ("c\nd", "")]
+
+
+def test_parse_without_blocks():
+    with pytest.raises(PatchError):
+        parse_edit_blocks("Manim edit: nothing")
+
+
+def test_apply_keeps_the_code_indentation():
+    patched = apply_edits(CODE, [("circle = Circle(color=RED)", "circle = Circle(color=BLUE)")])
+    assert "        circle = Circle(color=BLUE)\n" in patched
+    assert "RED" not in patched
+
+
+def test_apply_multiline_replace_is_reindented():
+    patched = apply_edits(CODE, [(
+        "self.play(Create(circle))",
+        "self.play(Create(circle))\nself.wait()"
+    )])
+    assert patched.endswith("        self.play(Create(circle))\n        self.wait()\n")
+
+
+def test_search_must_match_exactly_once():
+    with pytest.raises(PatchError, match="not found"):
+        apply_edits(CODE, [("square = Square()", "")])
+    with pytest.raises(PatchError, match="not found"):
+        apply_edits(CODE + "        circle = Circle(color=RED)\n", [("circle = Circle(color=RED)", "")])
+
+
+def test_empty_search():
+    with pytest.raises(PatchError, match="empty"):
+        apply_edits(CODE, [("  \n", "x")])
+
+
+def test_invalid_result():
+    with pytest.raises(PatchError, match="invalid"):
+        apply_edits(CODE, [("self.play(Create(circle))", "self.play(Create(circle)")])
+    assert apply_edits(CODE, [("self.play(Create(circle))", "self.play(")], validate=False)
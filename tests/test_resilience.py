@@ -0,0 +1,149 @@
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from ez_manim.llm.resilience import RetryPolicy, call_with_retries, hedged
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+from mock_openai_server import serve
+
+
+# fast backoff, the retry-after of the server still applies
+POLICY = RetryPolicy(max_retries=3, base_delay=0.01, max_delay=1.0)
+
+
+def retryable(error):
+    if isinstance(error, urllib.error.HTTPError):
+        if error.code != 429 and error.code < 500:
+            return None
+        return float(error.headers.get("Retry-After", 0))
+    if isinstance(error, (socket.timeout, urllib.error.URLError)):
+        return 0.0
+    return None
+
+
+@pytest.fixture
+def mock_server():
+    servers = []
+
+    def start(**options):
+        server = serve(latency=0.0, chunk_delay=0.0, **options)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def complete(server, timeout=5.0):
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{server.server_port}/v1/chat/completions",
+        data=json.dumps({"model": "mock", "messages": []}).encode(),
+        headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())["choices"][0]["message"]["content"]
+
+
+def requests(server):
+    return server.RequestHandlerClass.options.requests
+
+
+def test_delay_is_bounded_and_honours_retry_after():
+    policy = RetryPolicy(base_delay=1.0, max_delay=4.0)
+    assert all(0 <= policy.delay(attempt) <= 4.0 for attempt in range(10))
+    assert policy.delay(0, retry_after=3.0) >= 3.0
+    assert policy.delay(0, retry_after=60.0) <= 4.0
+
+
+def test_429_waits_for_retry_after(mock_server):
+    server = mock_server(error_first=2, error_status=429, retry_after=0.2)
+    start = time.perf_counter()
+    assert call_with_retries(lambda: complete(server), POLICY, retryable).startswith("Manim code:")
+    assert time.perf_counter() - start >= 0.4
+    assert requests(server) == 3
+
+
+def test_5xx_is_retried(mock_server):
+    server = mock_server(error_first=1, error_status=503)
+    assert call_with_retries(lambda: complete(server), POLICY, retryable)
+    assert requests(server) == 2
+
+
+def test_gives_up_after_max_retries(mock_server):
+    server = mock_server(error_first=10, error_status=500)
+    with pytest.raises(urllib.error.HTTPError):
+        call_with_retries(lambda: complete(server), POLICY, retryable)
+    assert requests(server) == POLICY.max_retries + 1
+
+
+def test_client_errors_are_not_retried(mock_server):
+    server = mock_server(error_first=1, error_status=400)
+    with pytest.raises(urllib.error.HTTPError):
+        call_with_retries(lambda: complete(server), POLICY, retryable)
+    assert requests(server) == 1
+
+
+def test_timeout_is_retried(mock_server):
+    server = mock_server(slow_first=1, slow_latency=2.0)
+    start = time.perf_counter()
+    assert call_with_retries(lambda: complete(server, timeout=0.3), POLICY, retryable)
+    assert time.perf_counter() - start < 1.5
+    assert requests(server) == 2
+
+
+def test_cancel_stops_the_backoff(mock_server):
+    server = mock_server(error_first=10, error_status=429, retry_after=5.0)
+    cancel = threading.Event()
+    threading.Timer(0.2, cancel.set).start()
+    start = time.perf_counter()
+    with pytest.raises(urllib.error.HTTPError):
+        call_with_retries(lambda: complete(server), RetryPolicy(max_delay=10.0), retryable, cancel)
+    assert time.perf_counter() - start < 2.0
+
+
+def test_hedge_wins_over_a_stalled_request(mock_server):
+    server = mock_server(slow_first=1, slow_latency=3.0)
+    cancels = []
+
+    def start(cancel):
+        cancels.append(cancel)
+        return iter([complete(server)])
+
+    begin = time.perf_counter()
+    responses = hedged(start, hedge_after=0.1)
+    assert next(responses).startswith("Manim code:")
+    responses.close()
+
+    assert time.perf_counter() - begin < 2.0
+    assert requests(server) == 2
+    # the stalled request was told to stop
+    assert all(cancel.is_set() for cancel in cancels)
+
+
+def test_hedged_raises_once_every_request_failed():
+    def start(cancel):
+        raise ValueError("down")
+
+    with pytest.raises(ValueError, match="down"):
+        list(hedged(start, hedge_after=0.01))
+
+
+def test_no_hedge_for_a_fast_request():
+    calls = []
+
+    def start(cancel):
+        calls.append(cancel)
+        return iter([1, 2, 3])
+
+    assert list(hedged(start, hedge_after=1.0)) == [1, 2, 3]
+    assert len(calls) == 1
@@ -0,0 +1,101 @@
+import pytest
+
+from ez_manim.llm.base import BaseLLM
+from ez_manim.llm.response_cache import ResponseCache, cache_key
+
+
+MESSAGES = [{"role": "user", "content": "a blue square"}]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"))
+    yield cache
+    cache.close()
+
+
+def test_key_depends_on_everything():
+    key = cache_key("gpt", MESSAGES, {"temperature": 0})
+    assert key == cache_key("gpt", [dict(MESSAGES[0])], {"temperature": 0})
+    assert key != cache_key("gpt-4", MESSAGES, {"temperature": 0})
+    assert key != cache_key("gpt", MESSAGES, {"temperature": 0.1})
+
+
+def test_hit_and_miss(cache):
+    assert cache.get("k") is None
+    cache.put("k", "Manim code: x", seconds=1.5)
+    assert cache.get("k") == "Manim code: x"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["saved_seconds"]) == (1, 1, 1.5)
+
+
+def test_expired_entries_are_dropped(cache):
+    cache.put("k", "response")
+    cache.ttl = -1
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+    assert cache._total_bytes == 0
+
+
+def test_least_recently_used_are_evicted(cache):
+    cache.put("a", "x" * 100)
+    cache.put("b", "y" * 100)
+    cache.get("a")
+    cache.max_bytes = cache.stats()["bytes"] + 10
+    cache.put("c", "z" * 100)
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 100 and cache.get("c") == "z" * 100
+
+
+def test_running_total_matches_the_table(cache, tmp_path):
+    cache.max_bytes = 200
+    for i in range(20):
+        cache.put(f"k{i % 7}", "response " * i)
+        assert cache._total_bytes == cache.stats()["bytes"] <= 200
+
+    reopened = ResponseCache(cache.path)
+    assert reopened._total_bytes == cache._total_bytes
+    reopened.close()
+
+    cache.clear()
+    assert cache._total_bytes == 0
+
+
+class EchoLLM(BaseLLM):
+    def generate(self, messages):
+        return "Manim code: " + messages[-1]["content"]
+
+
+@pytest.mark.parametrize("params, cached", [
+    ({"temperature": 0}, True),
+    ({"temperature": 0.5}, False),
+    ({"temperature": None}, False),
+    ({}, False),
+])
+def test_only_greedy_requests_are_cached(cache, params, cached):
+    llm = EchoLLM("system", params, approximate_tokens=True)
+    llm.enable_response_cache(cache)
+    assert llm.generate_cached(MESSAGES) == llm.generate_cached(MESSAGES)
+    assert cache.hits == (1 if cached else 0)
+    assert cache.bypassed == (0 if cached else 2)
+
+
+class ChunkedLLM(EchoLLM):
+    def stream(self, messages):
+        self.streamed = getattr(self, "streamed", 0) + 1
+        yield from ["Manim code: ", "done", " and some trailing text"]
+
+
+@pytest.mark.parametrize("done, stored", [(True, True), (False, False)])
+def test_stream_closed_early_is_stored_when_done(cache, done, stored):
+    llm = ChunkedLLM("system", {"temperature": 0}, approximate_tokens=True)
+    llm.enable_response_cache(cache)
+
+    chunks = llm.stream_cached(MESSAGES, done=lambda: done)
+    assert [next(chunks), next(chunks)] == ["Manim code: ", "done"]
+    chunks.close()
+
+    assert list(llm.stream_cached(MESSAGES)) == (["Manim code: done"] if stored else [
+        "Manim code: ", "done", " and some trailing text"
+    ])
+    assert llm.streamed == (1 if stored else 2)
@@ -0,0 +1,73 @@
+import os
+
+from ez_manim.llm.session_log import SessionLog, list_sessions, prune_sessions
+
+
+def make_log(tmp_path, num_messages=4):
+    log = SessionLog.create(str(tmp_path))
+    log.start("cl100k_base")
+    for i in range(num_messages):
+        log.append("user" if i % 2 == 0 else "assistant", f"message {i}", 10)
+    return log
+
+
+def test_tail_keeps_the_latest_messages_that_fit(tmp_path):
+    log = make_log(tmp_path)
+    assert log.tail(25) == [("user", "message 2", 10), ("assistant", "message 3", 10)]
+    assert len(log.tail(1000)) == 4
+    assert log.counter_name == "cl100k_base"
+    log.close()
+
+
+def test_tail_stops_at_a_clear(tmp_path):
+    log = make_log(tmp_path)
+    log.clear()
+    log.append("user", "after", 5)
+    assert log.tail(1000) == [("user", "after", 5)]
+    log.close()
+
+
+def test_start_is_only_written_once(tmp_path):
+    log = make_log(tmp_path)
+    log.start("o200k_base")
+    assert log.counter_name == "cl100k_base"
+    log.close()
+
+
+def test_partial_line_of_a_crash_is_dropped_on_open(tmp_path):
+    log = make_log(tmp_path)
+    log.close()
+    with open(log.path, "a") as fp:
+        fp.write('{"role": "user", "content": "cut sh')
+
+    reopened = SessionLog.open(log.session_id, str(tmp_path))
+    reopened.append("user", "next", 3)
+    assert reopened.tail(1000)[-2:] == [("assistant", "message 3", 10), ("user", "next", 3)]
+    reopened.close()
+
+
+def test_open_last_and_list(tmp_path):
+    first = make_log(tmp_path)
+    first.close()
+    os.utime(first.path, (1, 1))
+    second = make_log(tmp_path, num_messages=0)
+    second.append("user", "latest prompt", 2)
+    second.close()
+
+    sessions = list_sessions(str(tmp_path))
+    assert [session.session_id for session in sessions] == [second.session_id, first.session_id]
+    assert sessions[0].first_prompt == "latest prompt"
+    last = SessionLog.open("last", str(tmp_path))
+    assert last.session_id == second.session_id
+    last.close()
+
+
+def test_prune_keeps_the_most_recent(tmp_path):
+    first = make_log(tmp_path)
+    first.close()
+    os.utime(first.path, (1, 1))
+    make_log(tmp_path).close()
+
+    removed = prune_sessions(str(tmp_path), keep=1)
+    assert [session.session_id for session in removed] == [first.session_id]
+    assert len(list_sessions(str(tmp_path))) == 1
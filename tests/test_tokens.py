@@ -0,0 +1,36 @@
+import pytest
+
+from ez_manim.utils.tokens import get_tokenizer
+
+
+@pytest.mark.parametrize("model", ["gpt-3.5-turbo", "gpt-3.5-turbo-0613", "gpt-3.5-turbo-1106"])
+def test_gpt_35_turbo_keeps_the_original_overheads(model):
+    tokenizer = get_tokenizer(model)
+    assert (tokenizer.tokens_per_message, tokenizer.tokens_per_name, tokenizer.reply_tokens) == (4, -1, 2)
+
+
+@pytest.mark.parametrize("model, encoding", [
+    ("gpt-4", "cl100k_base"),
+    ("gpt-4o-mini", "o200k_base"),
+    ("some-local-model", "cl100k_base"),
+])
+def test_longest_prefix_wins(model, encoding):
+    assert get_tokenizer(model).encoding_name == encoding
+
+
+def test_approximate_count_grows_with_the_text():
+    tokenizer = get_tokenizer("gpt-4")
+    short = tokenizer.approx_count([{"role": "user", "content": "x" * 36}])
+    long = tokenizer.approx_count([{"role": "user", "content": "x" * 360}])
+    assert long - short == 90
+
+
+def test_exact_counts_do_not_depend_on_the_batch_size():
+    pytest.importorskip("tiktoken")
+    tokenizer = get_tokenizer("gpt-4")
+    messages = [{"role": "user", "content": f"message {i} <|endoftext|>"} for i in range(20)]
+    try:
+        batched = tokenizer.count_each(messages)
+    except Exception as e:
+        pytest.skip(f"encoding unavailable: {e}")
+    assert batched[:3] == tokenizer.count_each(messages[:3])
@@ -0,0 +1,85 @@
+import sys
+import threading
+import time
+
+from ez_manim.core.watchdog import (
+    CANCELLED, LIMIT_EXCEEDED, LimitExceeded, LimitMessage, RenderLimits, RenderScheduler
+)
+
+
+def python(code):
+    return [sys.executable, "-c", code]
+
+
+def test_output_tail_is_bounded():
+    scheduler = RenderScheduler(tail_lines=5, poll_interval=0.05)
+    lines = []
+    returncode, stdout, stderr, exceeded = scheduler.run(
+        python("import sys\nfor i in range(1000): print(i)\nsys.stderr.write('oops\\n')"),
+        on_line=lines.append
+    )
+    assert (returncode, exceeded) == (0, None)
+    assert stdout.split() == ["995", "996", "997", "998", "999"]
+    assert stderr == "oops\n"
+    assert len(lines) == 1001
+
+
+def test_wall_limit_kills_the_render():
+    scheduler = RenderScheduler(limits=RenderLimits(wall_seconds=0.2), poll_interval=0.05)
+    start = time.perf_counter()
+    returncode, _, _, exceeded = scheduler.run(python("import time; time.sleep(10)"))
+    assert returncode == LIMIT_EXCEEDED
+    assert exceeded.limit == "wall"
+    assert time.perf_counter() - start < 5
+    assert scheduler.stats()["killed"] == {"wall": 1}
+
+
+def test_cancel():
+    scheduler = RenderScheduler(poll_interval=0.05)
+    cancel = threading.Event()
+    threading.Timer(0.1, cancel.set).start()
+    assert scheduler.run(python("import time; time.sleep(10)"), cancel=cancel)[0] == CANCELLED
+
+
+def test_renders_call_on_line_independently():
+    # each render's callback waits for the other one's, a scheduler wide lock would deadlock
+    scheduler = RenderScheduler(max_concurrent=2, poll_interval=0.05)
+    seen = [threading.Event(), threading.Event()]
+    waited, results = [], []
+
+    def render(i):
+        def on_line(line):
+            seen[i].set()
+            waited.append(seen[1 - i].wait(timeout=2))
+        results.append(scheduler.run(python("print('line')"), on_line=on_line))
+
+    threads = [threading.Thread(target=render, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert waited == [True, True]
+    assert [result[0] for result in results] == [0, 0]
+
+
+def test_limit_message():
+    limit = LimitExceeded("memory", 512 * 1024 ** 2, 1.0)
+    assert "512 MiB" in str(limit)
+    assert limit.to_dict() == {"limit": "memory", "value": 512 * 1024 ** 2, "seconds": 1.0}
+
+    message = LimitMessage(limit, "A: failed")
+    assert message == "A: failed" and message.limit is limit
+    assert LimitMessage(limit) == str(limit)
+
+
+def test_child_holding_the_pipes_does_not_block():
+    # like the video player manim opens with -p
+    scheduler = RenderScheduler(poll_interval=0.05)
+    start = time.perf_counter()
+    returncode, stdout, _, _ = scheduler.run(python(
+        "import subprocess, sys\n"
+        "subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(3)'])\n"
+        "print('rendered')"
+    ))
+    assert (returncode, stdout) == (0, "rendered\n")
+    assert time.perf_counter() - start < 2
@@ -0,0 +1,47 @@
+import os
+import time
+
+from ez_manim.core.workspace import MediaGC, atomic_write, new_workspace
+
+
+def make_workspace(root, size, age=0.0):
+    workspace = new_workspace(str(root))
+    atomic_write(os.path.join(workspace, "video.mp4"), "x" * size)
+    used = time.time() - age
+    os.utime(workspace, (used, used))
+    return workspace
+
+
+def test_least_recently_used_go_first(tmp_path):
+    old = make_workspace(tmp_path, 600, age=30)
+    new = make_workspace(tmp_path, 600)
+    gc = MediaGC([str(tmp_path)], max_bytes=1000)
+    assert gc.collect() == (1, 600)
+    assert not os.path.exists(old) and os.path.exists(new)
+
+
+def test_expired_workspaces_are_removed(tmp_path):
+    old = make_workspace(tmp_path, 10, age=120)
+    make_workspace(tmp_path, 10)
+    gc = MediaGC([str(tmp_path)], max_age=60)
+    assert gc.collect() == (1, 10)
+    assert not os.path.exists(old)
+
+
+def test_pinned_workspaces_are_kept(tmp_path):
+    old = make_workspace(tmp_path, 10, age=120)
+    gc = MediaGC([str(tmp_path)], max_age=60)
+    gc.pin(old)
+    assert gc.collect() == (0, 0)
+    gc.unpin(old)
+    assert gc.collect() == (1, 10)
+
+
+def test_only_workspaces_are_collected(tmp_path):
+    other = tmp_path / "partial_movies"
+    other.mkdir()
+    (other / "segment.mp4").write_text("x" * 100)
+    os.utime(other, (0, 0))
+    gc = MediaGC([str(tmp_path)], max_bytes=0, max_age=0)
+    assert gc.collect() == (0, 0)
+    assert other.exists()